@@ -0,0 +1,12 @@
+from starlette.responses import JSONResponse as StarletteJSONResponse
+
+from app.tools.encoder import encode_json_bytes
+
+
+class JSONResponse(StarletteJSONResponse):
+    """
+    returning it directly from an endpoint skips fastapi's jsonable_encoder walk
+    """
+
+    def render(self, content) -> bytes:
+        return encode_json_bytes(content)
@@ -1,173 +1,343 @@
-import json
+import asyncio
 import logging
 import os
+import time
+from typing import Optional, Union
 
-from fastapi import FastAPI, WebSocket, HTTPException, Query, Header
+from fastapi import APIRouter, Depends, FastAPI, WebSocket, HTTPException, Query, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import constr, BaseModel
 from fastapi.websockets import WebSocketDisconnect
 
+from app.api.responses import JSONResponse
 from app.game import exceptions
+from app.game.core.cache import SerializationCache
+from app.game.backplane import RedisBackplane
 from app.game.core.game import GameSession
-from app.game.events import dict_to_event
+from app.game.rooms import RoomManager
 from app.game.exceptions import PlayerNotFound
+from app.game.persistence.base import BasePersistentStorage
 from app.game.persistence.redis import RedisPersistentStorage
+from app.game.protocol import (
+    AIRPORT_CATALOG,
+    BATCHED_EVENTS,
+    BINARY_POSITIONS,
+    DELTA_UPDATES,
+    REFUELING_EVENTS,
+    PROTOCOL_FEATURES,
+    PlayerIndex,
+    message_to_event,
+)
+from app.tools.encoder import encode_json
 from app.tools.timestamp import timestamp_now
 from app.tools.websocket_server import StarletteWebsocketConnectionHandler, WebSocketSession
 
 
 logging.getLogger().setLevel(logging.INFO)
 
+SHUTDOWN_TIMEOUT = 5  # seconds, for stopping the game, recording the games and closing the connections
 
-redis_host = os.environ.get('GAME_REDIS_HOST') or "game_redis"
-storage = RedisPersistentStorage(host=redis_host)
+router = APIRouter()
 
-game_session = GameSession(storage=storage)
-app = FastAPI()
 
-origins = ["*"]  # todo
+def get_rooms(request: Request) -> RoomManager:
+    return request.app.state.rooms
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+
+def get_storage(request: Request) -> BasePersistentStorage:
+    return request.app.state.storage
+
+
+def create_app() -> FastAPI:
+    """
+    the game is created on startup, not on import, so that creating the app is cheap and every worker has its own
+    """
+    app = FastAPI(default_response_class=JSONResponse)
+
+    origins = ["*"]  # todo
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+
+    @app.on_event("startup")
+    def startup():
+        start = time.perf_counter()
+        redis_host = os.environ.get('GAME_REDIS_HOST') or "game_redis"
+        app.state.storage = RedisPersistentStorage(host=redis_host)
+        backplane = None
+        if os.environ.get('GAME_BACKPLANE'):
+            backplane = RedisBackplane(client=app.state.storage.client)
+        SerializationCache.count_stats = bool(os.environ.get('GAME_CACHE_STATS'))
+        app.state.rooms = RoomManager(storage=app.state.storage, backplane=backplane)
+        app.state.startup_duration = (time.perf_counter() - start) * 1000
+        logging.info("game started in %.1f ms", app.state.startup_duration)
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        start = time.perf_counter()
+        rooms: RoomManager = app.state.rooms
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SHUTDOWN_TIMEOUT
+        try:
+            await asyncio.wait_for(loop.run_in_executor(None, rooms.shutdown), timeout=SHUTDOWN_TIMEOUT)
+            writers = [ws_session.wait_closed() for ws_session in rooms.websocket_sessions()]
+            if writers:
+                await asyncio.wait(writers, timeout=max(deadline - loop.time(), 0))
+            GameWebsocketConnectionHandler.heartbeat.stop()
+            await loop.run_in_executor(
+                None, GameWebsocketConnectionHandler.dispatcher.wait_idle, max(deadline - loop.time(), 0)
+            )
+        except asyncio.TimeoutError:
+            logging.warning("game not stopped within %s s", SHUTDOWN_TIMEOUT)
+        logging.info("game stopped in %.1f ms", (time.perf_counter() - start) * 1000)
+
+    return app
+
+
+async def close_websockets(app: FastAPI):
+    """
+    sends the close frames and waits till they're written, uvicorn drops the websocket connections
+    without one when it shuts down (see run.py)
+    """
+    ws_sessions = app.state.rooms.websocket_sessions()
+    for ws_session in ws_sessions:
+        ws_session.close_connection(code=1001, reason="server shutting down")
+    if ws_sessions:
+        await asyncio.wait([ws_session.wait_closed() for ws_session in ws_sessions], timeout=SHUTDOWN_TIMEOUT)
+
+
+@router.get("/api/game/config/")
+def get_config(rooms: RoomManager = Depends(get_rooms)):
+    return JSONResponse(rooms.config.serialized())
+
+
+def airport_catalog_response(rooms: RoomManager, cache_control: str) -> Response:
+    catalog = rooms.airport_catalog
+    return Response(
+        content=catalog.content,
+        media_type="application/json",
+        headers={"ETag": catalog.etag, "Cache-Control": cache_control},
+    )
+
+
+@router.get("/api/game/airports/")
+def get_airport_catalog(
+    if_none_match: str = Header(default=""),
+    rooms: RoomManager = Depends(get_rooms),
+):
+    catalog = rooms.airport_catalog
+    if catalog.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": catalog.etag})
+    return airport_catalog_response(rooms, cache_control="no-cache")
 
 
-@app.get("/api/game/config/")
-def get_config():
-    return game_session.config.serialized()
+@router.get("/api/game/airports/{version}/")
+def get_airport_catalog_version(version: str, rooms: RoomManager = Depends(get_rooms)):
+    if version != rooms.airport_catalog.version:
+        raise HTTPException(status_code=404, detail="Airport catalog version not found")
+    return airport_catalog_response(rooms, cache_control="public, max-age=31536000, immutable")
 
 
 class RegisterPlayerRequestBody(BaseModel):
     nickname: constr(min_length=1)
 
 
-@app.post("/api/game/players/")
-def register_player(body: RegisterPlayerRequestBody):
+@router.post("/api/game/players/")
+def register_player(body: RegisterPlayerRequestBody, storage: BasePersistentStorage = Depends(get_storage)):
     nickname = body.nickname
     if ":" in nickname:
         raise HTTPException(status_code=400, detail="Invalid nickname")
 
     player = storage.add_new_player(nickname=body.nickname)
 
-    return {
+    return JSONResponse({
         "nickname": player.full_nickname,
         "token": player.token,
-    }
+    })
 
 
-@app.post("/api/game/join/")
-def join_game_session(token: str = Header(default="")):
+@router.post("/api/game/join/")
+def join_game_session(
+    token: str = Header(default=""),
+    rooms: RoomManager = Depends(get_rooms),
+    storage: BasePersistentStorage = Depends(get_storage),
+):
     persistent_player = storage.get_player_by_token(token=token)
 
     if not persistent_player:
         raise HTTPException(status_code=400, detail="Invalid token")
 
     try:
-        player = game_session.add_player(nickname=persistent_player.full_nickname, token=token)
+        room_id, player = rooms.add_player(nickname=persistent_player.full_nickname, token=token)
     except exceptions.PlayerLimitExceeded:
         raise HTTPException(status_code=409, detail="Lobby is full")
     except exceptions.DuplicatedGameSession:
         raise HTTPException(status_code=403, detail="Already in the game")
 
-    return {**player.serialized, "token": player.token}
+    return JSONResponse({**player.serialized, "token": player.token, "room": room_id})
 
 
-@app.post("/api/game/exit/")
-def exit_game_session(token: str = Header(default="")):
+@router.post("/api/game/exit/")
+def exit_game_session(
+    token: str = Header(default=""),
+    rooms: RoomManager = Depends(get_rooms),
+    storage: BasePersistentStorage = Depends(get_storage),
+):
     persistent_player = storage.get_player_by_token(token=token)
 
     if not persistent_player:
         raise HTTPException(status_code=400, detail="Invalid token")
 
-    game_session.exit_player(token=token)
+    rooms.exit_player(token=token)
+
+
+@router.get("/api/game/stats/")
+def get_stats(request: Request, rooms: RoomManager = Depends(get_rooms)):
+    stats = {
+        "startup_duration": request.app.state.startup_duration,
+        "loop": rooms.loop.stats,
+        "rooms": rooms.stats,
+        "sessions": rooms.sessions_stats(),
+        "position_updates": rooms.position_updates_stats(),
+        "dispatcher": GameWebsocketConnectionHandler.dispatcher.stats,
+        "heartbeat": GameWebsocketConnectionHandler.heartbeat.stats,
+    }
+    if SerializationCache.count_stats:
+        stats["serialization_cache"] = SerializationCache.stats_serialized()
+    return JSONResponse(stats)
 
 
-@app.get("/api/game/leaderboard/")
+@router.get("/api/game/leaderboard/")
 def leaderboard(
     limit: int = Query(default=10, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
+    storage: BasePersistentStorage = Depends(get_storage),
 ):
     player_list = storage.get_player_list(limit=limit, offset=offset)
 
-    return player_list.serialized
+    return JSONResponse(player_list.serialized)
 
 
-@app.get("/api/game/leaderboard/{player_nickname}")
-def leaderboard_player(player_nickname: str):
+@router.get("/api/game/leaderboard/{player_nickname}")
+def leaderboard_player(player_nickname: str, storage: BasePersistentStorage = Depends(get_storage)):
     player = storage.get_player(full_nickname=player_nickname)
 
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
 
-    return player.serialized
+    return JSONResponse(player.serialized)
 
 
-@app.get("/api/game/leaderboard/{player_nickname}/last_games/")
+@router.get("/api/game/leaderboard/{player_nickname}/last_games/")
 def leaderboard_player_last_games(
     player_nickname: str,
     limit: int = Query(default=10, ge=1, le=10),
+    storage: BasePersistentStorage = Depends(get_storage),
 ):
     games = storage.get_players_last_games(full_nickname=player_nickname, amount=limit)
 
-    return [g.serialized for g in games]
+    return JSONResponse([g.serialized for g in games])
 
 
 class GameWebsocketConnectionHandler(StarletteWebsocketConnectionHandler):
+    def __init__(self, rooms: RoomManager):
+        super().__init__()
+        self.rooms = rooms
+        self.game_session: Optional[GameSession] = None  # the room of the player, found by the token
+        self.remote_room: Optional[int] = None  # or the room owned by another worker
+
+    def get_config(self, ws_session: WebSocketSession) -> dict:
+        return {
+            **super().get_config(ws_session),
+            "binary_positions": ws_session.player_index is not None,
+            "batch_interval": ws_session.batch_interval,
+            "delta_updates": ws_session.entity_versions is not None,
+            "airport_catalog": self.rooms.airport_catalog.serialized if ws_session.airport_catalog else None,
+            "refueling_events": ws_session.refueling_events,
+        }
+
     def validate_session(self, ws_session: WebSocketSession):
-        token = ws_session.get_headers().get("sec-websocket-protocol", "")
+        protocols = ws_session.protocols
+        token = next((p for p in protocols if p not in PROTOCOL_FEATURES), "")
         try:
-            player = game_session.get_player_by_token(token)
+            self.game_session = self.rooms.get_room_by_token(token)
+            player = self.game_session.get_player_by_token(token)
+            if player.is_connected:
+                return False
+            player_id = player.id
         except exceptions.PlayerNotFound:
-            return False
-        if player.is_connected:
-            return False
+            # the owner of the room checks if the player is connected already
+            try:
+                self.remote_room, player_id = self.rooms.get_remote_player(token)
+            except exceptions.PlayerNotFound:
+                return False
 
         ws_session.token = token
-        ws_session.player_id = player.id
+        ws_session.player_id = player_id
+        if BINARY_POSITIONS in protocols:
+            ws_session.player_index = PlayerIndex()
+        if BATCHED_EVENTS in protocols:
+            ws_session.batch_interval = self.batch_interval
+        if DELTA_UPDATES in protocols:
+            ws_session.entity_versions = {}
+        if AIRPORT_CATALOG in protocols:
+            ws_session.airport_catalog = True
+        if REFUELING_EVENTS in protocols:
+            ws_session.refueling_events = True
         return True
 
     def on_connect(self, ws_session: WebSocketSession):
-        print("On connect", ws_session)
-        player = game_session.get_player(player_id=ws_session.player_id)
-        game_session.add_session(player=player, ws_session=ws_session)
+        logging.debug("on_connect %s", ws_session.id)
+        if self.remote_room is not None:
+            self.rooms.connect_remote(room_id=self.remote_room, ws_session=ws_session)
+            return
+        player = self.game_session.get_player(player_id=ws_session.player_id)
+        self.game_session.add_session(player=player, ws_session=ws_session)
 
     def on_disconnect(self, ws_session: WebSocketSession):
-        print("On disconnect", ws_session)
+        logging.debug("on_disconnect %s", ws_session.id)
+        if self.remote_room is not None:
+            self.rooms.disconnect_remote(room_id=self.remote_room, ws_session=ws_session)
+            return
         try:
-            game_session.remove_session(ws_session=ws_session)
+            self.game_session.remove_session(ws_session=ws_session)
         except PlayerNotFound:
             pass
 
-    def on_message(self, ws_session: WebSocketSession, message: str):
-        print("on_message %s", message)
+    def on_message(self, ws_session: WebSocketSession, message: Union[str, bytes]):
+        logging.debug("on_message %s", message)
+        if self.remote_room is not None:
+            self.rooms.forward_message(room_id=self.remote_room, ws_session=ws_session, message=message)
+            return
         try:
-            data = json.loads(message)
-            event = dict_to_event(data=data)
-        except (json.JSONDecodeError, exceptions.InvalidEventFormat) as e:
+            event = message_to_event(message)
+        except exceptions.InvalidEventFormat as e:
             logging.error("Invalid event format: %s", e)
             return
         logging.info("on_message parsed event %s", event)
 
-        player = game_session.get_player(player_id=ws_session.player_id)
-        game_session.handle_event(player, event)
+        player = self.game_session.get_player(player_id=ws_session.player_id)
+        self.game_session.handle_event(player, event)
 
 
-@app.websocket("/ws/")
+@router.websocket("/ws/")
 async def websocket_endpoint(websocket: WebSocket):
-    connection = GameWebsocketConnectionHandler()
+    connection = GameWebsocketConnectionHandler(rooms=websocket.app.state.rooms)
     await connection.handler(websocket)
 
 
-@app.websocket("/clock/")
+@router.websocket("/clock/")
 async def clock_websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     while True:
         try:
             data = await websocket.receive_text()
-            await websocket.send_json({"t": timestamp_now(), "ref": data})
+            await websocket.send_text(encode_json({"t": timestamp_now(), "ref": data}))
         except WebSocketDisconnect:
             break
@@ -0,0 +1,470 @@
+import json
+import logging
+import queue
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+import redis
+
+from app.game.catalog import AirportCatalog
+from app.game.events import Event, EventType
+from app.game.protocol import EventFrames, deliver_event_frames, deliver_versioned_event_frames
+from app.tools.encoder import encode_json
+from app.tools.websocket_server import WebSocketSession
+
+
+class RedisBackplane:
+    """
+    lets many workers (processes or nodes) serve the game rooms together, over redis
+
+    a room is simulated by the one worker owning it, the ownership is a key set with NX and renewed while the room
+    runs. The owner publishes every broadcast of the room once, to the room channel, and every worker with sessions
+    of the room delivers it to its own sockets (see RoomRelay). Messages of the sessions connected to other workers
+    reach the owner through the room inbox channel.
+
+    all the subscriptions of the worker share one redis connection read by a single thread, so the messages are
+    handled in the order they were published. The messages to publish are queued and sent in pipelines by another
+    thread, in the order they were queued, publish() never waits for redis (it's called under the game lock),
+    and neither does release(). The ownership of the rooms is renewed by a thread of its own (see keep_ownership)
+    """
+
+    OWNERSHIP_TTL = 10_000  # milliseconds, renewed every third of it
+    PLAYER_TTL = 24 * 60 * 60 * 1000  # milliseconds, the token -> room mapping of a player
+    PUBLISH_QUEUE_SIZE = 100_000  # messages waiting to be published, the newer ones are dropped when redis lags
+    PUBLISH_BATCH = 500  # messages sent in one pipeline
+
+    _release_script = """
+        if redis.call("get", KEYS[1]) == ARGV[1] then
+            return redis.call("del", KEYS[1])
+        end
+        return 0
+    """
+    _forget_script = """
+        local value = redis.call("get", KEYS[1])
+        if value and cjson.decode(value)["room"] == tonumber(ARGV[1]) then
+            return redis.call("del", KEYS[1])
+        end
+        return 0
+    """
+    _renew_script = """
+        if redis.call("get", KEYS[1]) == ARGV[1] then
+            return redis.call("pexpire", KEYS[1], ARGV[2])
+        end
+        return 0
+    """
+
+    def __init__(self, client: redis.Redis, worker_id: Optional[str] = None):
+        self.client = client
+        self.worker_id = worker_id or uuid.uuid4().hex
+        self._release = client.register_script(self._release_script)
+        self._renew = client.register_script(self._renew_script)
+        self._forget = client.register_script(self._forget_script)
+        self._pubsub = client.pubsub()
+        self._handlers: Dict[str, Callable[[dict], None]] = {}
+        # set (and called) when redis confirms the subscription
+        self._confirmations: Dict[str, List[Tuple[threading.Event, Optional[Callable[[], None]]]]] = {}
+        # (channel, handler or None to unsubscribe, confirmation, called on the confirmation)
+        self._subscriptions: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        # (command, channel or key, payload or value) sent by the publisher thread, None stops it
+        self._outbox: "queue.Queue[Optional[Tuple[str, str, str]]]" = queue.Queue(maxsize=self.PUBLISH_QUEUE_SIZE)
+        self._publisher: Optional[threading.Thread] = None
+        self._publisher_lock = threading.Lock()
+        self._keeper: Optional[threading.Thread] = None
+        self._stats = {
+            "published": 0,
+            "dropped": 0,
+            "received": 0,
+            "failed": 0,
+        }
+
+    @staticmethod
+    def room_channel(room_id: int) -> str:
+        return f"game:room:{room_id}"
+
+    @staticmethod
+    def inbox_channel(room_id: int) -> str:
+        return f"game:room:{room_id}:inbox"
+
+    @property
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "worker": self.worker_id,
+            "subscriptions": len(self._handlers),
+            "queued": self._outbox.qsize(),
+        }
+
+    def next_room_id(self) -> int:
+        return self.client.incr("game:rooms:id")
+
+    def acquire(self, room_id: int) -> bool:
+        return bool(self.client.set(f"game:room:{room_id}:owner", self.worker_id, nx=True, px=self.OWNERSHIP_TTL))
+
+    def keep_ownership(self, rooms: Callable[[], List[int]], on_lost: Callable[[int], None]):
+        """
+        renews the ownership of the `rooms` every third of the ttl from a thread of its own,
+        `on_lost` is called by the thread for the rooms another worker may run now
+        """
+        self._keeper = threading.Thread(
+            target=self._keep_ownership,
+            args=(rooms, on_lost),
+            name="backplane-ownership",
+            daemon=True,
+        )
+        self._keeper.start()
+
+    def renew(self, room_ids: List[int]) -> List[int]:
+        """
+        returns the rooms that aren't owned by this worker anymore
+        """
+        pipeline = self.client.pipeline(transaction=False)
+        for room_id in room_ids:
+            self._renew(
+                keys=[f"game:room:{room_id}:owner"],
+                args=[self.worker_id, self.OWNERSHIP_TTL],
+                client=pipeline,
+            )
+        results = pipeline.execute()
+        return [room_id for room_id, renewed in zip(room_ids, results) if not renewed]
+
+    def release(self, room_id: int):
+        """
+        queued like the published messages
+        """
+        self._send("release", f"game:room:{room_id}:owner", self.worker_id)
+
+    def owner(self, room_id: int) -> Optional[str]:
+        return self.client.get(f"game:room:{room_id}:owner")
+
+    def register_player(self, token: str, room_id: int, player_id: uuid.UUID):
+        self.client.set(
+            f"game:token:{token}",
+            encode_json({"room": room_id, "player_id": player_id}),
+            px=self.PLAYER_TTL,
+        )
+
+    def player_room(self, token: str) -> Optional[Tuple[int, str]]:
+        """
+        room id and player id of a player that joined on any worker
+        """
+        value = self.client.get(f"game:token:{token}")
+        if value is None:
+            return None
+        data = json.loads(value)
+        return data["room"], data["player_id"]
+
+    def forget_player(self, token: str, room_id: int):
+        """
+        the player left the room, queued like the published messages, the mapping of a newer join is kept
+        """
+        self._send("forget", f"game:token:{token}", str(room_id))
+
+    def publish(self, channel: str, message: dict):
+        self._send("publish", channel, encode_json(message))
+
+    def _send(self, command: str, key: str, value: str):
+        if self._publisher is None:
+            with self._publisher_lock:
+                if self._publisher is None:
+                    self._publisher = threading.Thread(target=self._publish_queued, name="backplane-publisher", daemon=True)
+                    self._publisher.start()
+        try:
+            self._outbox.put_nowait((command, key, value))
+        except queue.Full:
+            self._stats["dropped"] += 1
+
+    def subscribe(
+        self,
+        channel: str,
+        handler: Callable[[dict], None],
+        on_subscribed: Optional[Callable[[], None]] = None,
+    ) -> threading.Event:
+        """
+        the returned event is set (and `on_subscribed` called by the backplane thread) once the messages
+        published to the channel are received
+        """
+        subscribed = threading.Event()
+        self._subscriptions.put((channel, handler, subscribed, on_subscribed))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="backplane", daemon=True)
+            self._thread.start()
+        return subscribed
+
+    def unsubscribe(self, channel: str):
+        self._subscriptions.put((channel, None, threading.Event(), None))
+
+    def stop(self):
+        """
+        the messages queued till now are published first
+        """
+        self._stopped.set()
+        if self._keeper is not None:
+            self._keeper.join()
+        if self._publisher is not None:
+            self._outbox.put(None)
+            self._publisher.join()
+        if self._thread is not None:
+            self._thread.join()
+        self._pubsub.close()
+
+    def _publish_queued(self):
+        while True:
+            message = self._outbox.get()
+            batch = []
+            while message is not None:
+                batch.append(message)
+                if len(batch) == self.PUBLISH_BATCH:
+                    break
+                try:
+                    message = self._outbox.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                pipeline = self.client.pipeline(transaction=False)
+                for command, key, value in batch:
+                    if command == "publish":
+                        pipeline.publish(key, value)
+                    elif command == "release":
+                        self._release(keys=[key], args=[value], client=pipeline)
+                    else:
+                        self._forget(keys=[key], args=[value], client=pipeline)
+                try:
+                    pipeline.execute()
+                    self._stats["published"] += len(batch)
+                except redis.RedisError:
+                    self._stats["dropped"] += len(batch)
+                    logging.exception("backplane publish failed")
+            if message is None:
+                return
+
+    def _keep_ownership(self, rooms: Callable[[], List[int]], on_lost: Callable[[int], None]):
+        while not self._stopped.wait(self.OWNERSHIP_TTL / 3000):
+            try:
+                lost = self.renew(rooms())
+            except redis.RedisError:
+                logging.exception("backplane ownership renewal failed")
+                continue
+            for room_id in lost:
+                try:
+                    on_lost(room_id)
+                except Exception:
+                    logging.exception("backplane room %s lost", room_id)
+
+    @staticmethod
+    def _confirm(subscribed: threading.Event, on_subscribed: Optional[Callable[[], None]]):
+        subscribed.set()
+        if on_subscribed is not None:
+            on_subscribed()
+
+    def _update_subscriptions(self, block: bool):
+        """
+        the subscriptions are changed by the thread reading the connection only, pubsub isn't thread safe
+        """
+        try:
+            channel, handler, subscribed, on_subscribed = self._subscriptions.get(timeout=0.1 if block else 0)
+        except queue.Empty:
+            return
+        while True:
+            if handler is None:
+                self._confirmations.pop(channel, None)
+                if self._handlers.pop(channel, None) is not None:
+                    self._pubsub.unsubscribe(channel)
+            elif channel in self._handlers:
+                self._handlers[channel] = handler
+                if channel in self._confirmations:
+                    # still waiting for the confirmation
+                    self._confirmations[channel].append((subscribed, on_subscribed))
+                else:
+                    self._confirm(subscribed, on_subscribed)
+            else:
+                self._pubsub.subscribe(channel)
+                self._handlers[channel] = handler
+                self._confirmations[channel] = [(subscribed, on_subscribed)]
+            try:
+                channel, handler, subscribed, on_subscribed = self._subscriptions.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._update_subscriptions(block=not self._handlers)
+                if not self._handlers:
+                    continue
+                message = self._pubsub.get_message(timeout=0.01)
+            except redis.RedisError:
+                logging.exception("backplane connection failed")
+                self._stopped.wait(1)
+                continue
+            if message is None:
+                continue
+            if message["type"] == "subscribe":
+                for subscribed, on_subscribed in self._confirmations.pop(message["channel"], []):
+                    try:
+                        self._confirm(subscribed, on_subscribed)
+                    except Exception:
+                        logging.exception("backplane subscription to %s failed", message["channel"])
+                continue
+            if message["type"] != "message":
+                continue
+
+            self._stats["received"] += 1
+            handler = self._handlers.get(message["channel"])
+            if handler is None:
+                continue
+            try:
+                handler(json.loads(message["data"]))
+            except Exception:
+                self._stats["failed"] += 1
+                logging.exception("backplane message on %s failed", message["channel"])
+
+
+class RoomChannel:
+    """
+    the room's side of the backplane on the worker owning it, what the sessions connected to other workers receive
+    """
+
+    def __init__(self, backplane: RedisBackplane, room_id: int):
+        self.backplane = backplane
+        self.room_id = room_id
+        self.channel = RedisBackplane.room_channel(room_id)
+
+    def broadcast(self, event: Event, everyone_except: List[uuid.UUID], refueling_progress: bool = False):
+        self.backplane.publish(
+            self.channel,
+            {
+                "type": "broadcast",
+                "event": event.serialized,
+                "except": everyone_except,
+                "refueling_progress": refueling_progress,
+            },
+        )
+
+    def broadcast_versioned(
+        self,
+        entity_id: uuid.UUID,
+        version: int,
+        full: Event,
+        delta: Optional[Event],
+        everyone_except: List[uuid.UUID],
+        refueling_progress: bool = False,
+    ):
+        self.backplane.publish(
+            self.channel,
+            {
+                "type": "versioned",
+                "id": entity_id,
+                "version": version,
+                "event": full.serialized,
+                "delta": delta.serialized if delta else None,
+                "except": everyone_except,
+                "refueling_progress": refueling_progress,
+            },
+        )
+
+    def send(self, session_id: uuid.UUID, event: Event):
+        self.backplane.publish(self.channel, {"type": "send", "session": session_id, "event": event.serialized})
+
+    def close(self, session_id: uuid.UUID, code: int, reason: str):
+        self.backplane.publish(
+            self.channel,
+            {"type": "close", "session": session_id, "code": code, "reason": reason},
+        )
+
+
+class RemoteWebSocketSession:
+    """
+    stands in the owner's room for a session connected to another worker, the events for it go through the
+    room channel (see GameSession.send_event)
+    """
+
+    def __init__(
+        self,
+        session_id: uuid.UUID,
+        player_id: uuid.UUID,
+        channel: RoomChannel,
+        refueling_events: bool = False,
+    ):
+        self.id = session_id
+        self.player_id = player_id
+        self.channel = channel
+        self.refueling_events = refueling_events  # negotiated by the session on the other worker
+        self.rtt = None
+        self._is_closed = False
+
+    @property
+    def outbound_stats(self) -> dict:
+        return {"remote": True}
+
+    def close_connection(self, code=1000, reason=""):
+        if self._is_closed:
+            return
+        self._is_closed = True
+        self.channel.close(self.id, code=code, reason=reason)
+
+
+class RoomRelay:
+    """
+    the sessions of a room connected to this worker while another worker owns the room,
+    gets the room channel messages and delivers them the way GameSession does
+    """
+
+    def __init__(self, room_id: int, airport_catalog: AirportCatalog):
+        self.room_id = room_id
+        self.airport_catalog = airport_catalog
+        self._sessions: Dict[str, WebSocketSession] = {}
+        self._lock = threading.Lock()
+        self.subscribed = False
+        self.pending: List[dict] = []  # the inbox messages of the sessions, sent once the room channel is subscribed
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def add_session(self, ws_session: WebSocketSession):
+        with self._lock:
+            self._sessions[str(ws_session.id)] = ws_session
+
+    def remove_session(self, ws_session: WebSocketSession):
+        with self._lock:
+            self._sessions.pop(str(ws_session.id), None)
+
+    def sessions(self) -> List[WebSocketSession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def handle(self, message: dict):
+        message_type = message["type"]
+        if message_type in ("send", "close"):
+            with self._lock:
+                session = self._sessions.get(message["session"])
+            if session is None:
+                return
+            if message_type == "close":
+                session.close_connection(code=message["code"], reason=message["reason"])
+            else:
+                deliver_event_frames(session=session, frames=self._frames(message["event"]))
+            return
+
+        excluded = set(message["except"])
+        sessions = [session for session in self.sessions() if str(session.player_id) not in excluded]
+        refueling_progress = message["refueling_progress"]
+        if message_type == "broadcast":
+            frames = self._frames(message["event"], refueling_progress=refueling_progress)
+            for session in sessions:
+                deliver_event_frames(session=session, frames=frames)
+        elif message_type == "versioned":
+            delta = message["delta"]
+            deliver_versioned_event_frames(
+                sessions=sessions,
+                entity_id=message["id"],
+                version=message["version"],
+                full=self._frames(message["event"], refueling_progress=refueling_progress),
+                delta=self._frames(delta, refueling_progress=refueling_progress) if delta else None,
+            )
+
+    def _frames(self, serialized: dict, refueling_progress: bool = False) -> EventFrames:
+        event = Event(type=EventType(serialized["type"]), data=serialized["data"], created=serialized["created"])
+        return EventFrames(event, airport_catalog=self.airport_catalog, refueling_progress=refueling_progress)
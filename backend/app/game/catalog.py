@@ -0,0 +1,33 @@
+import hashlib
+from typing import List
+
+from app.game.core.airport import Airport
+from app.tools.encoder import encode_json_bytes
+
+
+class AirportCatalog:
+    """
+    static part of the airports (names, descriptions, coordinates...), served over http so it can be cached,
+    version is a hash of the content
+    """
+
+    URL = "/api/game/airports/"
+
+    def __init__(self, airports: List[Airport]):
+        self.content: bytes = encode_json_bytes({"airports": [airport.static_serialized for airport in airports]})
+        self.version: str = hashlib.sha1(self.content).hexdigest()[:16]
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    @property
+    def url(self) -> str:
+        return f"{self.URL}{self.version}/"
+
+    @property
+    def serialized(self) -> dict:
+        return {
+            "version": self.version,
+            "url": self.url,
+        }
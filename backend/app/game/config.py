@@ -14,7 +14,12 @@ class GameConfig:
     FLIGHT_ALTITUDE: float = 200.0
     FUEL_TANK_SIZE: int = 100_000  # 100k liters
     REFUELING_RATE: float = 3500  # liters per second
+    TICK_RATE: int = 20  # game loop ticks per second
+    # position updates are broadcast when the clients' extrapolation of the last one is off by more than:
+    POSITION_BROADCAST_DISTANCE_ERROR: float = 10.0  # km
+    POSITION_BROADCAST_BEARING_ERROR: float = 5.0  # degrees
+    POSITION_BROADCAST_VELOCITY_ERROR: int = 5_000  # km/h, below the smallest step of the clients (10k)
+    POSITION_BROADCAST_MAX_INTERVAL: int = 1000  # or when it's older than 1 second
 
-    @staticmethod
-    def serialized():
-        return dataclasses.asdict(GameConfig())
+    def serialized(self):
+        return dataclasses.asdict(self)
@@ -3,6 +3,7 @@ import uuid
 from typing import Optional, TYPE_CHECKING
 
 from app.game.config import GameConfig
+from app.game.core.cache import SerializationCache
 from app.game.core.coordinates import Coordinates
 from app.game.exceptions import (
     TooFarToLand,
@@ -20,15 +21,30 @@ if TYPE_CHECKING:
     from app.game.core.player import Player
 
 
-class Airport:
+class Airport(SerializationCache):
+    ID_NAMESPACE = uuid.UUID("5b1ce4d4-1b8d-4ad4-9d7c-3c3e0b8a4f61")
+    STATIC_FIELDS = ["name", "full_name", "description", "elevation", "coordinates"]
+    __slots__ = (
+        "id",
+        "name",
+        "full_name",
+        "description",
+        "coordinates",
+        "elevation",
+        "fuel_price",
+        "shipments",
+        "occupying_player",
+    )
+
     id: uuid.UUID
     name: str
     full_name: str
     description: str
     coordinates: "Coordinates"
     elevation: float
-    shipments: dict = {}
-    occupying_player: Optional["Player"] = None
+    fuel_price: float
+    shipments: dict
+    occupying_player: Optional["Player"]
 
     def __init__(
         self,
@@ -39,7 +55,8 @@ class Airport:
         fuel_price: float,
         coordinates: "Coordinates",
     ):
-        self.id = uuid.uuid4()
+        # derived from the name, so that the ids (and the static airport catalog) stay the same between restarts
+        self.id = uuid.uuid5(Airport.ID_NAMESPACE, name)
         self.name = name
         self.full_name = full_name
         self.description = description
@@ -47,21 +64,55 @@ class Airport:
         self.elevation = elevation
         self.fuel_price = fuel_price
         self.shipments = {}
+        self.occupying_player = None
 
     @property
     def serialized(self) -> dict:
+        return self._cached_serialized(self._serialize, self.static_serialized, self.dynamic_serialized)
+
+    def _serialize(self, static: dict, dynamic: dict) -> dict:
+        return {**static, **dynamic}
+
+    @property
+    def static_serialized(self) -> dict:
+        return self._cached_serialized(self._serialize_static, self.coordinates.serialized, name="static")
+
+    def _serialize_static(self, coordinates: dict) -> dict:
         return {
             "id": self.id,
             "name": self.name,
             "full_name": self.full_name,
             "description": self.description,
             "elevation": self.elevation,
+            "coordinates": coordinates,
+        }
+
+    @property
+    def dynamic_serialized(self) -> dict:
+        return self._cached_serialized(self._serialize_dynamic, name="dynamic")
+
+    def _serialize_dynamic(self) -> dict:
+        return {
+            "id": self.id,
             "fuel_price": self.fuel_price,
-            "coordinates": self.coordinates.serialized,
             "occupying_player": self.occupying_player.id if self.occupying_player else None,
             "shipments": [shipment.serialized for shipment in self.shipments.values()],
         }
 
+    @staticmethod
+    def without_static_fields(serialized: dict) -> dict:
+        return {key: value for key, value in serialized.items() if key not in Airport.STATIC_FIELDS}
+
+    def add_shipment(self, shipment: "Shipment"):
+        self.shipments[shipment.id] = shipment
+        self.invalidate_serialized()
+
+    def remove_shipment(self, shipment_id: uuid.UUID) -> Optional["Shipment"]:
+        shipment = self.shipments.pop(shipment_id, None)
+        if shipment:
+            self.invalidate_serialized()
+        return shipment
+
     def land_player(self, player: "Player"):
         now = timestamp_now()
         current_player_position = player.position.future_position(timestamp=now)
@@ -81,23 +132,28 @@ class Airport:
         self.occupying_player = player
         player._airport_id = self.id
 
+        # a new position nobody holds yet, it can be changed before it is assigned
+        current_player_position.coordinates.latitude = self.coordinates.latitude
+        current_player_position.coordinates.longitude = self.coordinates.longitude
+        current_player_position.velocity = 0
         player.position = current_player_position
-        player.position.coordinates.latitude = self.coordinates.latitude
-        player.position.coordinates.longitude = self.coordinates.longitude
-        player.position.velocity = 0
-        player.position.timestamp = now
 
-    def remove_player(self, player: "Player") -> bool:
+    def remove_player(self, player: "Player", bearing: Optional[float] = None) -> bool:
+        """
+        the player takes off heading to `bearing`, or the way it landed
+        """
         if player != self.occupying_player:
             return False
         self.occupying_player = None
         player._airport_id = None
 
         now = timestamp_now()
-        player.position.coordinates.latitude = self.coordinates.latitude
-        player.position.coordinates.longitude = self.coordinates.longitude
-        player.position.velocity = 500000
-        player.position.timestamp = now
+        player.position = player.position.replace(
+            coordinates=Coordinates(latitude=self.coordinates.latitude, longitude=self.coordinates.longitude),
+            velocity=500000,
+            timestamp=now,
+            bearing=player.position.bearing if bearing is None else bearing,
+        )
         player.is_refueling = False
         return True
 
@@ -114,7 +170,7 @@ class Airport:
 
         shipment.player_id = player.id
         player.shipment = shipment
-        self.shipments.pop(shipment_id)
+        self.remove_shipment(shipment_id)
         return shipment
 
     def accept_shipment_delivery(self, player: "Player") -> "Shipment":
@@ -0,0 +1,29 @@
+import dataclasses
+import enum
+import uuid
+from typing import Optional
+
+from app.game.core.airport import Airport
+from app.game.core.flight_plan import FlightPlan
+
+
+class BotState(str, enum.Enum):
+    FLYING = "flying"
+    REFUELING = "refueling"
+    IDLE = "idle"  # landed, waiting before the departure
+
+
+@dataclasses.dataclass
+class Bot:
+    """
+    state of a bot player between its decisions, the decisions are made by the game loop
+    """
+
+    player_id: uuid.UUID
+    created: int
+    state: BotState = BotState.FLYING
+    destination: Optional[Airport] = None
+    arrival_time: int = 0
+    last_decision: int = 0
+    flight_plan: Optional[FlightPlan] = None
+    next_leg: int = 0  # of the flight plan, flown from the next decision
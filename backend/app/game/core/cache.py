@@ -0,0 +1,60 @@
+import collections
+from typing import Callable
+
+
+class SerializationCache:
+    """
+    keeps the results of `serialized` (or other named serialized forms) until an attribute of the object gets assigned,
+    nested objects are passed as parts, the cache is also dropped when any of their serialized forms changes
+
+    cached dicts are shared, they must not be modified by the callers
+
+    the subclasses declare their attributes in __slots__, there are many of them (positions especially)
+    """
+
+    __slots__ = ("_serialized_cache",)  # name -> (serialized, parts)
+
+    # hits, misses and invalidations per class, counted only when enabled (GAME_CACHE_STATS, see app.api.server)
+    count_stats = False
+    stats = collections.defaultdict(collections.Counter)
+
+    def __new__(cls, *args, **kwargs):
+        instance = super().__new__(cls)
+        object.__setattr__(instance, "_serialized_cache", None)
+        return instance
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if self._serialized_cache:
+            self.invalidate_serialized()
+
+    def invalidate_serialized(self):
+        object.__setattr__(self, "_serialized_cache", None)
+        if SerializationCache.count_stats:
+            SerializationCache.stats[type(self).__name__]["invalidations"] += 1
+
+    def _cached_serialized(self, build: Callable[..., dict], *parts, name: str = "serialized") -> dict:
+        caches = self._serialized_cache
+        cache = caches.get(name) if caches else None
+        if cache is not None:
+            serialized, cached_parts = cache
+            for part, cached_part in zip(parts, cached_parts):
+                if part is not cached_part:
+                    break
+            else:
+                if SerializationCache.count_stats:
+                    SerializationCache.stats[type(self).__name__]["hits"] += 1
+                return serialized
+
+        if SerializationCache.count_stats:
+            SerializationCache.stats[type(self).__name__]["misses"] += 1
+        serialized = build(*parts)
+        if caches is None:
+            caches = {}
+            object.__setattr__(self, "_serialized_cache", caches)
+        caches[name] = (serialized, parts)
+        return serialized
+
+    @staticmethod
+    def stats_serialized() -> dict:
+        return {name: dict(counter) for name, counter in SerializationCache.stats.items()}
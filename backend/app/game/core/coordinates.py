@@ -1,80 +1,102 @@
-from math import sin, cos, sqrt, atan2, radians, degrees, asin, pi
+from typing import Optional, Tuple
 
 from app.game.config import GameConfig
+from app.game.core.cache import SerializationCache
+from app.game.core.geodesy import NVector, nvector
 
 
-class Coordinates:
+class Coordinates(SerializationCache):
+    __slots__ = ("latitude", "longitude", "_nvector")
+
     latitude: float
     longitude: float
     EARTH_RADIUS: float = GameConfig.EARTH_RADIUS
     FLIGHT_ALTITUDE: float = GameConfig.FLIGHT_ALTITUDE
+    # the formulas behind the methods below, geodesy.Haversine evaluates the trig on every call (the reference)
+    GEODESY = NVector
 
     def __init__(self, latitude: float, longitude: float):
         self.latitude = latitude
         self.longitude = longitude
 
+    def __setattr__(self, name, value):
+        # SerializationCache.__setattr__ inlined, moved coordinates drop their vector as well
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, "_nvector", None)
+        if self._serialized_cache:
+            self.invalidate_serialized()
+
     @property
     def serialized(self) -> dict:
+        return self._cached_serialized(self._serialize)
+
+    def _serialize(self) -> dict:
         return {
             "lat": self.latitude,
             "lon": self.longitude,
         }
 
+    def nvector(self) -> Tuple[float, ...]:
+        """
+        the unit vector and the trig of the coordinates (see geodesy.nvector), kept till they're moved
+        """
+        vector = self._nvector
+        if vector is None:
+            vector = nvector(self.latitude, self.longitude)
+            object.__setattr__(self, "_nvector", vector)
+        return vector
+
+    def move(self, latitude: float, longitude: float, vector: Optional[Tuple[float, ...]] = None):
+        """
+        both set at once, with the vector when the geodesy computed it along with them
+        """
+        object.__setattr__(self, "latitude", latitude)
+        object.__setattr__(self, "longitude", longitude)
+        object.__setattr__(self, "_nvector", vector)
+        if self._serialized_cache:
+            self.invalidate_serialized()
+
     @classmethod
     def _earth_radius(cls) -> float:
         return cls.EARTH_RADIUS + cls.FLIGHT_ALTITUDE
 
     @staticmethod
     def distance_between(coord1: "Coordinates", coord2: "Coordinates") -> float:
-        """
-        Haversine formula:
-        a = sin²(Δφ/2) + cos φ1 ⋅ cos φ2 ⋅ sin²(Δλ/2)
-        c = 2 ⋅ atan2( √a, √(1−a) )
-        d = R ⋅ c
-        where φ is latitude, λ is longitude, R is earth’s radius
-        note that angles need to be in radians to pass to trig functions!
-        """
-        lat1 = radians(coord1.latitude)
-        lon1 = radians(coord1.longitude)
-        lat2 = radians(coord2.latitude)
-        lon2 = radians(coord2.longitude)
-
-        delta_lat = lat2 - lat1
-        delta_lon = lon2 - lon1
-        a = sin(delta_lat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(delta_lon / 2) ** 2
-        c = 2 * atan2(sqrt(a), sqrt(max(1 - a, 0)))
-        d = Coordinates._earth_radius() * c
-        return d
+        return Coordinates.GEODESY.distance(coord1, coord2, Coordinates._earth_radius())
 
     @staticmethod
     def bearing_between(coord1: "Coordinates", coord2: "Coordinates") -> float:
-        lat1 = radians(coord1.latitude)
-        lon1 = radians(coord1.longitude)
-        lat2 = radians(coord2.latitude)
-        lon2 = radians(coord2.longitude)
-
-        y = sin(lon2 - lon1) * cos(lat2)
-        x = cos(lat1) * sin(lat2) - sin(lat1) * cos(lat2) * cos(lon2 - lon1)
-
-        return ((atan2(y, x) * 180) / pi + 360) % 360
-
-    def destination_coordinates(self, distance: float, bearing: float) -> "Coordinates":
-        # https://stackoverflow.com/a/7835325
-        r = self._earth_radius()
-        bearing = radians(bearing)
-
-        lat1 = radians(self.latitude)
-        lon1 = radians(self.longitude)
-
-        cos_lat1 = cos(lat1)
-        sin_lat1 = sin(lat1)
-        cos_dr = cos(distance / r)
-        sin_dr = sin(distance / r)
-
-        lat2 = asin(sin_lat1 * cos_dr + cos_lat1 * sin_dr * cos(bearing))
-        lon2 = lon1 + atan2(sin(bearing) * sin_dr * cos_lat1, cos_dr - sin_lat1 * sin(lat2))
-
-        lat2 = degrees(lat2)
-        lon2 = degrees(lon2)
+        return Coordinates.GEODESY.bearing(coord1, coord2)
+
+    def destination_coordinates(
+        self,
+        distance: float,
+        bearing: float,
+        out: Optional["Coordinates"] = None,
+    ) -> "Coordinates":
+        """
+        written into `out` instead of new coordinates when given
+        """
+        if out is None:
+            out = Coordinates._uninitialized()
+        self.GEODESY.destination(self, distance, bearing, self._earth_radius(), out)
+        return out
+
+    def destination_turn(
+        self,
+        distance: float,
+        bearing: float,
+        out: Optional["Coordinates"] = None,
+    ) -> Tuple["Coordinates", float]:
+        """
+        destination_coordinates and how much the bearing turned on the way along the great circle
+        """
+        if out is None:
+            out = Coordinates._uninitialized()
+        turn = self.GEODESY.destination(self, distance, bearing, self._earth_radius(), out, turn=True)
+        return out, turn
 
-        return Coordinates(latitude=lat2, longitude=lon2)
+    @staticmethod
+    def _uninitialized() -> "Coordinates":
+        # the latitude and longitude are set by the destination
+        return Coordinates.__new__(Coordinates)
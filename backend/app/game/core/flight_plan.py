@@ -0,0 +1,143 @@
+import math
+import uuid
+from typing import List, Optional
+
+from app.game.core.coordinates import Coordinates
+from app.game.core.position import PlayerPosition
+
+
+class FlightPlan:
+    """
+    a bot's flight to an airport planned at once, great circles flown at a constant velocity between turn points
+
+    the turns and accelerations of the steering are split into legs of at most TURN_STEP degrees or
+    ACCELERATION_STEP milliseconds, flown at their average bearing and velocity, so the plane passes the turn points
+    where a steady turn and acceleration would have taken it. `legs` are the positions right after the turn points
+    (the first one at the start), the plane gets within the arrival distance of the destination at `arrival`,
+    or None when the plan ends at `ends` before that (it's planned again from there)
+    """
+
+    TURN_STEP = 10  # degrees
+    ACCELERATION_STEP = 1000  # milliseconds
+    ALIGNED = 1  # degrees off the destination turned at once, the steering turned up to 2 degrees per tick
+    MAX_LEGS = 64
+
+    def __init__(
+        self,
+        player_id: uuid.UUID,
+        destination_id: uuid.UUID,
+        legs: List[PlayerPosition],
+        ends: int,
+        arrival: Optional[int],
+    ):
+        self.player_id = player_id
+        self.destination_id = destination_id
+        self.legs = legs
+        self.ends = ends
+        self.arrival = arrival
+
+    @classmethod
+    def plan(
+        cls,
+        player_id: uuid.UUID,
+        position: PlayerPosition,
+        destination_id: uuid.UUID,
+        destination: Coordinates,
+        arrival_distance: float,
+        turn_rate: float,
+        acceleration: int,
+        min_velocity: int,
+        max_velocity: int,
+    ) -> "FlightPlan":
+        """
+        from `position` at its timestamp, turning by `turn_rate` degrees per second towards the destination
+        and accelerating by `acceleration` km/h per second (slowing down while it's behind)
+        """
+        legs = []
+        heading = position.bearing  # where the plane points, the legs fly the average of a turn
+        velocity = position.velocity
+        arrival = None
+        while len(legs) < cls.MAX_LEGS:
+            distance = Coordinates.distance_between(position.coordinates, destination)
+            if distance <= arrival_distance:
+                arrival = position.timestamp
+                break
+            ideal_bearing = Coordinates.bearing_between(position.coordinates, destination)
+            bearing_diff = (ideal_bearing - heading + 180) % 360 - 180
+            behind = abs(bearing_diff) > 90 + cls.ALIGNED
+            velocity_delta = -acceleration if behind else acceleration
+
+            if abs(bearing_diff) < cls.ALIGNED:
+                turn = 0
+                heading = ideal_bearing
+                if velocity >= max_velocity:
+                    duration = None  # straight to the destination
+                else:
+                    duration = min(cls.ACCELERATION_STEP, math.ceil((max_velocity - velocity) / acceleration * 1000))
+            else:
+                turn = min(abs(bearing_diff), cls.TURN_STEP)
+                if behind:
+                    turn = min(turn, abs(bearing_diff) - 90)  # it speeds up again from there
+                turn = math.copysign(turn, bearing_diff)
+                duration = max(round(abs(turn) / turn_rate * 1000), 1)
+
+            if duration is None:
+                end_velocity = velocity
+            else:
+                end_velocity = min(max(velocity + velocity_delta * duration / 1000, min_velocity), max_velocity)
+            leg = PlayerPosition(
+                coordinates=position.coordinates,
+                bearing=heading + turn / 2,
+                velocity=int((velocity + end_velocity) / 2),
+                timestamp=position.timestamp,
+                tank_level=position.tank_level,
+            )
+            legs.append(leg)
+
+            # only the legs long enough to get there can
+            if duration is None or distance - leg.velocity * duration / 3_600_000 <= arrival_distance:
+                entry = cls._entry_time(leg, distance, ideal_bearing, arrival_distance)
+                if entry is not None and (duration is None or entry <= duration):
+                    arrival = leg.timestamp + entry
+                    break
+            if duration is None:  # the destination is passed by, the plan goes on
+                duration = cls.ACCELERATION_STEP
+
+            position = leg.future_position(timestamp=leg.timestamp + duration, calculate_bearing=True)
+            heading = position.bearing + turn / 2
+            velocity = end_velocity
+
+        ends = arrival if arrival is not None else position.timestamp
+        return cls(player_id=player_id, destination_id=destination_id, legs=legs, ends=ends, arrival=arrival)
+
+    @staticmethod
+    def _entry_time(leg: PlayerPosition, to_destination: float, bearing: float, distance: float) -> Optional[int]:
+        """
+        milliseconds since the start of the leg till the plane flying it gets within `distance` of the destination
+        (`to_destination` km away at `bearing` from the start), None if it passes by
+        """
+        r = Coordinates._earth_radius()
+        to_destination = to_destination / r
+        if to_destination <= distance / r:
+            return 0
+        relative_bearing = math.radians(bearing - leg.bearing)
+        if math.cos(relative_bearing) <= 0:
+            return None  # behind
+        # the angles from the start to the point of the great circle nearest to the destination,
+        # and from the destination to that point
+        cross_track = math.asin(math.sin(to_destination) * math.sin(relative_bearing))
+        if abs(cross_track) >= distance / r:
+            return None
+        along_track = math.acos(min(math.cos(to_destination) / math.cos(cross_track), 1))
+        entry = along_track - math.acos(min(math.cos(distance / r) / math.cos(cross_track), 1))
+        return math.ceil(entry * r / leg.velocity * 3_600_000)
+
+    @property
+    def serialized(self) -> dict:
+        return {
+            "id": self.player_id,
+            "destination": self.destination_id,
+            "legs": [leg.serialized for leg in self.legs],
+            "ends": self.ends,
+            "arrival": self.arrival,
+        }
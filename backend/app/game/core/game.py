@@ -1,20 +1,28 @@
-import dataclasses
+import heapq
+import itertools
 import logging
+import math
 import random
-import threading
-import time
 import uuid
-from typing import List
+from typing import List, Optional, Set
 
+from app.game.backplane import RemoteWebSocketSession, RoomChannel
+from app.game.catalog import AirportCatalog
 from app.game.config import GameConfig
 from app.game.consts import AIRPORTS, BOT_NAMES, COLORS
-from app.game.core.coordinates import Coordinates
 from app.game.core.airport import Airport
+from app.game.core.bot import Bot, BotState
+from app.game.core.flight_plan import FlightPlan
 from app.game.core.shipment import Shipment
 from app.game.core.player import Player
+from app.game.core.refueling import Refueling
+from app.game.dead_reckoning import DeadReckoning
+from app.game.deltas import DELTA_EVENTS, VERSIONED_EVENTS, DeltaTracker
 from app.game.enums import DeathCause
 from app.game.event_factory import EventFactory
 from app.game.events import Event, EventType
+from app.game.fleet import create_fleet
+from app.game.loop import GameLoop, Timer
 from app.game.exceptions import (
     AirportFull,
     ShipmentExpired,
@@ -32,10 +40,12 @@ from app.game.exceptions import (
 )
 from app.game.models import PlayerPositionUpdateRequest, AirportRequest, ShipmentRequest
 from app.game.persistence.base import BasePersistentStorage
-from app.tools.encoder import encode
-from app.tools.misc import random_with_probability
+from app.game.routes import RouteTable
+from app.game.registry import PlayerRegistry
+from app.game.protocol import EventFrames, deliver_event_frames, deliver_versioned_event_frames
+from app.tools.misc import random_with_probability, synchronized
 from app.tools.timestamp import timestamp_now
-from app.tools.websocket_server import WebSocketSession
+from app.tools.websocket_server import WebSocketSession, Frame
 
 
 logging.getLogger().setLevel(logging.INFO)
@@ -46,14 +56,54 @@ class GameSession:
     config = GameConfig()
     FILL_GAME_WITH_BOTS_TILL = 10
     SPAWN_BOTS_WHEN_NO_PLAYERS = False
-
-    def __init__(self, storage: BasePersistentStorage):
-        self._players = {}
-        self._sessions = {}
+    BOT_TURN_RATE = 40  # degrees per second
+    BOT_ACCELERATION = 200_000  # km/h per second
+    BOT_IDLE_TIME = 5000  # milliseconds spent on an airport
+    BOT_ARRIVAL_DISTANCE = 100  # km from the destination where the bots land
+    SHIPMENT_EXPIRY_GRACE = 3000  # milliseconds a shipment is kept after it is valid till
+
+    # the game systems in the order they run within a tick: name, method, interval in milliseconds
+    SYSTEMS = (
+        ("players", "monitor_players", 0),
+        ("refueling", "refuel_players", 200),
+        ("shipment_spawn", "spawn_shipments", 200),
+        ("bot_count", "manage_bots", 1000),
+        ("bots", "run_bots", 0),
+    )
+
+    def __init__(
+        self,
+        storage: BasePersistentStorage,
+        config: Optional[GameConfig] = None,
+        loop: Optional[GameLoop] = None,
+        channel: Optional[RoomChannel] = None,
+    ):
+        """
+        a game with its own `loop` runs its systems itself, with a shared loop they are run by the owner of the loop
+        (see app.game.rooms.RoomManager), the events are published to the `channel` for the sessions connected
+        to other workers
+        """
+        if config is not None:
+            self.config = config
+        # players, sessions and bots are added and removed through the registry, the dicts are read only
+        self._registry = PlayerRegistry(colors=COLORS, bot_names=BOT_NAMES)
+        self._players = self._registry.players
+        self._sessions = self._registry.sessions
         self._airports = {}
         self._shipments = {}
-        self._bots = {}
+        self._shipment_expiry = {}  # shipment id -> Timer of its removal
+        self._bots = self._registry.bots  # player id -> Bot
+        self._bot_decisions = []  # heap of (timestamp, order, player id)
+        self._bot_decisions_order = itertools.count()
         self._storage = storage
+        self._deltas = DeltaTracker()
+        self._dead_reckoning = DeadReckoning(config=self.config)
+        self._fleet = create_fleet()  # kinematic state of the players' planes, propagated in batches
+        self._refueling = {}  # player id -> (Refueling, Timer of its end)
+        self._deaths = {}  # player id -> Timer of the next death check
+        self.loop = loop or GameLoop(tick_rate=self.config.TICK_RATE)
+        self.channel = channel
+        self.lock = self.loop.lock  # guards the game state, held by every tick of the loop
 
         for airport_data in AIRPORTS:
             airport = Airport(
@@ -65,205 +115,298 @@ class GameSession:
                 fuel_price=airport_data["fuel_price"] * 0.3,
             )
             self._airports[airport.id] = airport
+        self.airport_catalog = AirportCatalog(airports=list(self._airports.values()))
+        self.routes = RouteTable.shared(self.airport_catalog.version, airports=list(self._airports.values()))
 
-        self.schedule_background_tasks()
+        if loop is None:
+            self.schedule_background_tasks()
 
     def schedule_background_tasks(self):
         """
         Manages the whole game runtime
         """
-        t = threading.Thread(target=self.monitor_players)
-        t.start()
-        t = threading.Thread(target=self.manage_airports)
-        t.start()
-        t = threading.Thread(target=self.manage_bots)
-        t.start()
+        for name, method, interval in self.SYSTEMS:
+            self.loop.add_system(name, getattr(self, method), interval=interval)
+        self.loop.start()
 
     def monitor_players(self):
-        while True:
-            self.remove_idle_players()
-            self.check_playing_conditions()
-            time.sleep(0.2)
-
-    def manage_airports(self):
-        while True:
-            self.remove_expired_shipments()
-            time.sleep(0.2)
-            if random_with_probability(0.085):
-                self.add_random_airport_shipment()
+        # deaths are timers of the loop (see _schedule_death)
+        self.broadcast_pending_positions()
 
-    def manage_bots(self):
-        while True:
-            real_players_count = self.real_players_count()
-            bot_players_count = self.bot_players_count()
+    def spawn_shipments(self):
+        if random_with_probability(0.085):
+            self.add_random_airport_shipment()
 
-            if real_players_count == 0 and self.SPAWN_BOTS_WHEN_NO_PLAYERS is False:
-                target_bot_count = 0
-            else:
-                target_bot_count = max(self.FILL_GAME_WITH_BOTS_TILL - real_players_count, 0)
+    def manage_bots(self):
+        real_players_count = self.real_players_count()
+        bot_players_count = self.bot_players_count()
 
-            delta = target_bot_count - bot_players_count
+        if real_players_count == 0 and self.SPAWN_BOTS_WHEN_NO_PLAYERS is False:
+            target_bot_count = 0
+        else:
+            target_bot_count = max(self.FILL_GAME_WITH_BOTS_TILL - real_players_count, 0)
 
-            if delta > 0:
-                    self.increase_bot_count()
-            if delta < 0:
-                    self.decrease_bot_count()
+        delta = target_bot_count - bot_players_count
 
-            time.sleep(1)
+        if delta > 0:
+                self.increase_bot_count()
+        if delta < 0:
+                self.decrease_bot_count()
 
     def increase_bot_count(self):
-        nickname_set = set(BOT_NAMES) - set([self._players[p].nickname for p in self._bots.keys()])
-        nickname = random.choice(list(nickname_set))
+        nickname = self._registry.free_bot_name()
         player = Player(nickname=nickname, color=self._generate_player_color(), bot=True, token=uuid.uuid4().hex)
-        self._players[player.id] = player
+        self._registry.add(player)
+        self._fleet.add(player)
+        self._schedule_death(player)
         self.broadcast_event(event=EventFactory.player_registered_event(player=player))
 
-        thread = threading.Thread(target=self.play_with_bot, args=(player.id,))
-        self._bots[player.id] = {"thread": thread, "created": timestamp_now()}
-        thread.start()
+        now = timestamp_now()
+        bot = Bot(player_id=player.id, created=now, last_decision=now)
+        self._registry.add_bot(bot)
+        self._schedule_bot_decision(bot, timestamp=now)
 
     def decrease_bot_count(self):
-        bots = [(self._players[player_id], bot_data["created"]) for player_id, bot_data in self._bots.items()]
-        bots = sorted(bots, key=lambda b: b[1])
-        bot_to_remove: Player = bots[0][0]  # select the oldest bot
-        self._bots.pop(bot_to_remove.id)
+        bot_to_remove = self._registry.oldest_bot()
+        self._registry.remove_bot(bot_to_remove.player_id)  # removed from the game on its next decision
 
-    def play_with_bot(self, player_id: uuid.UUID):
+    def _schedule_bot_decision(self, bot: Bot, timestamp: int):
+        heapq.heappush(self._bot_decisions, (timestamp, next(self._bot_decisions_order), bot.player_id))
 
-        while True:
-            player: Player = self._players[player_id]
-            if player_id not in self._bots:
-                self.remove_player(player)
-                return
+    def run_bots(self):
+        """
+        advances the bots whose next decision is due, instead of a thread per bot
+        """
+        now = timestamp_now()
+        due = []
+        while self._bot_decisions and self._bot_decisions[0][0] <= now:
+            timestamp, _, player_id = heapq.heappop(self._bot_decisions)
+            player: Player = self._players.get(player_id)
+            bot: Bot = self._bots.get(player_id)
+            if not bot:
+                if player:  # bot count decreased or the bot died
+                    self.remove_player(player)
+                continue
+            if not player:
+                self._registry.remove_bot(player_id)
+                continue
+            due.append((bot, player))
 
-            if player.shipment:
-                destination_airport = self._airports[player.shipment.destination_id]
-            else:
-                destination_airport = random.choice(list(self._airports.values()))
-            result = self._fly_bot_to_point(
-                player_id=player_id,
-                destination_coordinates=destination_airport.coordinates,
-                minimum_distance=100,
-            )
-            if not result:
-                return
+        for bot, player in due:
+            try:
+                next_decision = self._decide_bot(bot=bot, player=player, now=now)
+            except Exception:
+                logging.exception("bot %s decision failed", player.id)
+                next_decision = now + 1000
+            bot.last_decision = now
+            self._schedule_bot_decision(bot, timestamp=next_decision)
+
+    def _decide_bot(self, bot: Bot, player: Player, now: int) -> int:
+        """
+        returns the timestamp of the next decision, a flying bot decides at the turn points of its flight plan
+        """
+        if bot.state == BotState.FLYING:
+            if not bot.destination:
+                if player.shipment:
+                    bot.destination = self._airports[player.shipment.destination_id]
+                else:
+                    bot.destination = random.choice(list(self._airports.values()))
+
+            next_decision = self._fly_bot(bot=bot, player=player, now=now)
+            if next_decision:
+                return next_decision
+            bot.flight_plan = None
 
             try:
                 logging.info("bot landing attempt %s %s", player.id, player.nickname)
-                try:
-                    self.handle_airport_landing(player=player, airport=destination_airport)
-                except AirportFull as e:
-                    if destination_airport.occupying_player != player:
-                        raise e
-                logging.info("bot landed %s %s", player.id, player.nickname)
-                arrival_time = timestamp_now()
-
-                if player.shipment:
-                    try:
-                        self.handle_shipment_delivery(airport=destination_airport, player=player)
-                    except ShipmentExpired:
-                        pass
-                self.refuel_player(player=player, airport=destination_airport)
-                idle_time_left = max(5000 - (timestamp_now() - arrival_time), 0)
-                time.sleep(idle_time_left / 1000)
-
-                shipment_ids = list(destination_airport.shipments.keys())
-                if shipment_ids:
-                    self.handle_shipment_dispatch(
-                        airport=destination_airport,
-                        player=player,
-                        shipment_id=random.choice(shipment_ids),
-                    )
-                self.handle_airport_departure(player=player, airport=destination_airport)
+                self.handle_airport_landing(player=player, airport=bot.destination)
             except AirportFull:
                 logging.info("bot landing failed, airport full %s %s", player.id, player.nickname)
+                bot.destination = None
+                return now
+            logging.info("bot landed %s %s", player.id, player.nickname)
+            bot.arrival_time = now
 
-    def _fly_bot_to_point(
-        self,
-        player_id: uuid.UUID,
-        destination_coordinates: Coordinates,
-        minimum_distance: int = 300,
-    ):
-        minimum_sleep_duration = 0.05
-        min_velocity = self.config.FLYING_VELOCITY
-        max_velocity = self.config.MAX_VELOCITY
-        while True:
-            player: Player = self._players[player_id]
-            if player_id not in self._bots:
-                self.remove_player(player)
-                return False
-
-            now = timestamp_now() + 1
-            current_player_position = player.position.future_position(
-                timestamp=now,
-                calculate_bearing=True,
-            )
-            distance_to_destination = Coordinates.distance_between(
-                current_player_position.coordinates,
-                destination_coordinates,
-            )
-            if distance_to_destination <= minimum_distance:
-                return True
-
-            ideal_bearing_to_destination = Coordinates.bearing_between(
-                current_player_position.coordinates,
-                destination_coordinates,
-            )
-
-            left = (360 - ideal_bearing_to_destination + current_player_position.bearing) % 360
-            right = (360 - current_player_position.bearing + ideal_bearing_to_destination) % 360
-            bearing_diff = min(left, right)
-            bearing_delta = min(2.0, bearing_diff)
-            if left < right:
-                bearing_delta = -bearing_delta
-            bearing = current_player_position.bearing + bearing_delta
-
-            current_velocity = player.position.velocity
-            if abs(bearing_diff) > 90:
-                velocity_delta = -10000
-            else:
-                velocity_delta = 10000
-            velocity = current_velocity + velocity_delta
-            velocity = max(min_velocity, velocity)
-            velocity = min(max_velocity, velocity)
-
-            self.update_player_position(
+            if player.shipment:
+                try:
+                    self.handle_shipment_delivery(airport=bot.destination, player=player)
+                except ShipmentExpired:
+                    pass
+            self.start_refueling(player=player, airport=bot.destination)
+            bot.state = BotState.REFUELING
+            return now + 200
+
+        if bot.state == BotState.REFUELING:
+            if player.id in self._refueling:  # till the tank is full or the money runs out
+                refueling, _ = self._refueling[player.id]
+                return refueling.finishes
+            bot.state = BotState.IDLE
+            return max(bot.arrival_time + self.BOT_IDLE_TIME, now)
+
+        # BotState.IDLE
+        shipment_ids = list(bot.destination.shipments.keys())
+        if shipment_ids:
+            self.handle_shipment_dispatch(
+                airport=bot.destination,
                 player=player,
-                timestamp=now,
-                velocity=velocity,
-                bearing=bearing,
+                shipment_id=random.choice(shipment_ids),
             )
+        # the next destination is planned before the take-off, the bot departs heading to it
+        origin = bot.destination
+        if player.shipment:
+            destination = self._airports[player.shipment.destination_id]
+        else:
+            destination = self._airports[random.choice(self.routes.destinations(origin.id))]
+        self.handle_airport_departure(
+            player=player,
+            airport=origin,
+            bearing=self.routes.bearing(origin.id, destination.id),
+        )
+        bot.state = BotState.FLYING
+        bot.destination = destination
+        return now
 
-            sleep_duration = minimum_sleep_duration
-            if abs(bearing_delta) < 0.01 and velocity == max_velocity:
-                distance_to_destination = max(distance_to_destination - minimum_distance * 1.1, 0)
-                sleep_duration = distance_to_destination / velocity * 3600
-
-                sleep_duration = max(sleep_duration, minimum_sleep_duration)
-                sleep_duration = min(sleep_duration, 3)  # not more than 3 seconds for synchronisation reasons
-            time.sleep(sleep_duration)
+    def _fly_bot(self, bot: Bot, player: Player, now: int) -> Optional[int]:
+        """
+        follows the flight plan of the bot, its position is updated at the turn points only,
+        returns the timestamp of the next one or None when the destination has been reached
+        """
+        plan = bot.flight_plan
+        if plan is not None and bot.next_leg > 0:
+            if player.position.timestamp != plan.legs[bot.next_leg - 1].timestamp:
+                plan = None  # the position changed since the last turn point
+            elif bot.next_leg == len(plan.legs):
+                if plan.arrival is not None:
+                    return None
+                plan = None  # planned again from where the plan ended
+        if plan is None:
+            plan = self._plan_bot_flight(bot=bot, player=player, now=now)
+            if not plan.legs:
+                return None
+
+        leg = plan.legs[bot.next_leg]
+        self.update_player_position(player=player, timestamp=leg.timestamp, velocity=leg.velocity, bearing=leg.bearing)
+        bot.next_leg += 1
+        if bot.next_leg < len(plan.legs):
+            return plan.legs[bot.next_leg].timestamp
+        return plan.ends
+
+    def _plan_bot_flight(self, bot: Bot, player: Player, now: int) -> FlightPlan:
+        position = player.position.future_position(
+            timestamp=max(now, player.position.timestamp + 1),
+            calculate_bearing=True,
+        )
+        plan = FlightPlan.plan(
+            player_id=player.id,
+            position=position,
+            destination_id=bot.destination.id,
+            destination=bot.destination.coordinates,
+            arrival_distance=self.BOT_ARRIVAL_DISTANCE,
+            turn_rate=self.BOT_TURN_RATE,
+            acceleration=self.BOT_ACCELERATION,
+            min_velocity=self.config.FLYING_VELOCITY,
+            max_velocity=self.config.MAX_VELOCITY,
+        )
+        bot.flight_plan = plan
+        bot.next_leg = 0
+        self.broadcast_event(event=EventFactory.player_flight_plan_event(flight_plan=plan))
+        return plan
 
     def send_event(self, event: Event, player: Player):
         if player.is_bot:
             return
         logging.info("send_event %s", event.type)
         session, _ = self._sessions.get(player.session_id)
-        data = dataclasses.asdict(event)
-        data = encode(data)
-        session.send(data)
+        if isinstance(session, RemoteWebSocketSession):
+            self.channel.send(session.id, event)
+            return
+        deliver_event_frames(session=session, frames=EventFrames(event, airport_catalog=self.airport_catalog))
 
-    def broadcast_event(self, event: Event, everyone_except: List[Player] = None):
+    def broadcast_event(self, event: Event, everyone_except: List[Player] = None, refueling_progress: bool = False):
+        """
+        `refueling_progress` events go only to the sessions that don't follow the refuelings themselves
+        (see protocol.is_delivered)
+        """
         logging.info("broadcast_event %s", event.type)
         excl_player_ids = [p.id for p in everyone_except or []]
-        sessions: List[WebSocketSession] = [s for s, _ in self._sessions.values() if s.player_id not in excl_player_ids]
+        sessions: List[WebSocketSession] = []
+        relayed = False  # published to the room channel only when other workers relay sessions of the room
+        for s, _ in self._sessions.values():
+            if s.player_id in excl_player_ids:
+                continue
+            if isinstance(s, RemoteWebSocketSession):
+                relayed = True
+            else:
+                sessions.append(s)
         logging.info("broadcast will be to sessions %s", str([s.id for s in sessions]))
+        if event.type in VERSIONED_EVENTS:
+            self._broadcast_versioned_event(
+                event=event,
+                sessions=sessions,
+                everyone_except=excl_player_ids,
+                relayed=relayed,
+                refueling_progress=refueling_progress,
+            )
+            return
+        if event.type == EventType.PLAYER_REMOVED:
+            self._deltas.forget(event.data["id"])
+
+        if relayed:
+            self.channel.broadcast(event, everyone_except=excl_player_ids, refueling_progress=refueling_progress)
+        frames = EventFrames(event, airport_catalog=self.airport_catalog, refueling_progress=refueling_progress)
         for session in sessions:
-            data = dataclasses.asdict(event)
-            data = encode(data)
-            session.send(data)
+            deliver_event_frames(session=session, frames=frames)
+
+    def _broadcast_versioned_event(
+        self,
+        event: Event,
+        sessions: List[WebSocketSession],
+        everyone_except: List[uuid.UUID],
+        relayed: bool,
+        refueling_progress: bool = False,
+    ):
+        entity_id = event.data["id"]
+        with self._deltas.lock:
+            version, changes = self._deltas.update(entity_id=entity_id, state=event.data)
+            full = EventFrames(
+                Event(type=event.type, data={**event.data, "version": version}, created=event.created),
+                airport_catalog=self.airport_catalog,
+                refueling_progress=refueling_progress,
+            )
+            delta = None
+            if changes is not None and event.type in DELTA_EVENTS:
+                delta = EventFrames(
+                    Event(
+                        type=event.type,
+                        data={**changes, "id": entity_id, "version": version, "delta": True},
+                        created=event.created,
+                    ),
+                    airport_catalog=self.airport_catalog,
+                    refueling_progress=refueling_progress,
+                )
+
+            if relayed:
+                self.channel.broadcast_versioned(
+                    entity_id=entity_id,
+                    version=version,
+                    full=full.event,
+                    delta=delta.event if delta else None,
+                    everyone_except=everyone_except,
+                    refueling_progress=refueling_progress,
+                )
+            deliver_versioned_event_frames(sessions=sessions, entity_id=entity_id, version=version, full=full, delta=delta)
+
+    def sessions_stats(self) -> List[dict]:
+        return [
+            {"id": session.id, "player_id": player.id, "rtt": session.rtt, **session.outbound_stats}
+            for session, player in list(self._sessions.values())
+        ]
+
+    def position_updates_stats(self) -> dict:
+        return dict(self._dead_reckoning.stats)
 
     def real_players_count(self) -> int:
-        return len(self._players) - len(self._bots)
+        return self._registry.real_players_count()
 
     def bot_players_count(self) -> int:
         return len(self._bots)
@@ -274,47 +417,75 @@ class GameSession:
             raise PlayerNotFound
         return player
 
-    def remove_idle_players(self):
-        logging.debug(f"remove_idle_players")
-        now = timestamp_now()
-
-        for player in list(self._players.values()):
-            if player.is_bot:
-                continue
-            if player.is_connected:
-                continue
-            if now - player.disconnected_since > self.config.PLAYER_TIME_TO_CONNECT:
-                self.pronounce_player_dead(player=player, cause=DeathCause.DISCONNECTED)
-
-    def check_playing_conditions(self):
-        logging.debug(f"check_playing_conditions")
-        now = timestamp_now()
-
-        for player in list(self._players.values()):
-            if player.is_dead:
-                # death has already been detected but player has not been removed yet, no need to do anything
-                continue
+    def _death_cause(self, player: Player, now: int) -> Optional[DeathCause]:
+        if not player.is_connected and now - player.disconnected_since > self.config.PLAYER_TIME_TO_CONNECT:
+            return DeathCause.DISCONNECTED
+        if player.is_grounded:
+            # player shouldn't die when landed
+            return None
+        if player.position.future_tank_level(timestamp=now) == 0:
+            return DeathCause.RUN_OUT_OF_FUEL
+        if player.position.velocity < GameConfig.FLYING_VELOCITY:
+            return DeathCause.SPEED_TOO_LOW
+        return None
+
+    def _death_deadline(self, player: Player) -> Optional[int]:
+        """
+        the earliest timestamp the player can die at, as long as nothing changes
+        """
+        deadlines = []
+        if not player.is_connected:
+            deadlines.append(player.disconnected_since + self.config.PLAYER_TIME_TO_CONNECT + 1)
+        if not player.is_grounded:
+            position = player.position
+            if position.velocity < GameConfig.FLYING_VELOCITY:
+                deadlines.append(position.timestamp)
+            fuel_consumption = position.fuel_consumption
+            if fuel_consumption:
+                deadlines.append(position.timestamp + math.ceil(position.tank_level * 3_600_000 / fuel_consumption))
+        return min(deadlines, default=None)
+
+    def _schedule_death(self, player: Player):
+        """
+        called whenever the deadline could have changed (position, landing, departure, connection),
+        instead of checking every player every tick
 
-            if player.is_grounded:
-                # player shouldn't die when landed
-                continue
+        a scheduled check earlier than the new deadline is kept, it checks again and reschedules when it runs,
+        so the timers of the loop aren't replaced on every position update
+        """
+        deadline = self._death_deadline(player)
+        timer: Optional[Timer] = self._deaths.get(player.id)
+        if timer is not None:
+            if deadline is not None and timer.timestamp <= deadline:
+                return
+            timer.cancel()
+            del self._deaths[player.id]
+        if deadline is not None:
+            self._deaths[player.id] = self.loop.schedule(deadline, lambda: self._check_death(player))
+
+    def _check_death(self, player: Player):
+        self._deaths.pop(player.id, None)
+        if self._players.get(player.id) is not player or player.is_dead:
+            # death has already been detected but player has not been removed yet, no need to do anything
+            return
+        cause = self._death_cause(player, now=timestamp_now())
+        if cause:
+            self.pronounce_player_dead(player=player, cause=cause)
+        else:
+            self._schedule_death(player)
 
-            # check tank level
-            current_tank_level = player.position.future_tank_level(timestamp=now)
-            if current_tank_level == 0:
-                self.pronounce_player_dead(player=player, cause=DeathCause.RUN_OUT_OF_FUEL)
-                continue
+    def get_player_by_token(self, token: str) -> Player:
+        player = self._registry.by_token(token)
+        if not player:
+            raise PlayerNotFound
+        return player
 
-            # check speed
-            if player.position.velocity < GameConfig.FLYING_VELOCITY:
-                self.pronounce_player_dead(player=player, cause=DeathCause.SPEED_TOO_LOW)
-                continue
+    def get_session(self, session_id: uuid.UUID) -> Optional[WebSocketSession]:
+        ws_session, _ = self._sessions.get(session_id, (None, None))
+        return ws_session
 
-    def get_player_by_token(self, token: str) -> Player:
-        for player in self._players.values():
-            if player.token == token:
-                return player
-        raise PlayerNotFound
+    def player_tokens(self) -> Set[str]:
+        return self._registry.player_tokens()
 
     def get_players_session(self, player_id: uuid.UUID) -> WebSocketSession:
         player = self.get_player(player_id=player_id)
@@ -324,33 +495,33 @@ class GameSession:
         return ws_session
 
     def _generate_player_color(self):
-        available_colors = list(set(COLORS) - set([p.color for p in self._players.values()]))
-        return random.choice(available_colors)
+        return self._registry.free_color()
 
+    @synchronized
     def add_player(self, nickname: str, token: str) -> Player:
         logging.info(f"add_player {nickname}")
         if len(self._players) >= self.config.MAX_PLAYERS:
             raise PlayerLimitExceeded
 
-        for player in self._players.values():
-            if player.is_bot:
-                continue
-
-            if player.token == token:
-                raise DuplicatedGameSession
+        existing_player = self._registry.by_token(token)
+        if existing_player and not existing_player.is_bot:
+            raise DuplicatedGameSession
 
         player = Player(nickname=nickname, token=token, color=self._generate_player_color())
-        self._players[player.id] = player
+        self._registry.add(player)
+        self._fleet.add(player)
+        self._schedule_death(player)
         self.broadcast_event(event=EventFactory.player_registered_event(player=player), everyone_except=[player])
         logging.info(f"add_player {nickname} added {player.id}")
         return player
 
+    @synchronized
     def add_session(self, player: Player, ws_session: WebSocketSession):
         logging.info(f"add_session {ws_session.id} for player {player.id}")
         if player.is_connected:
             raise PlayerAlreadyConnected
-        self._sessions[ws_session.id] = (ws_session, player)
-        player.session_id = ws_session.id
+        self._registry.connect(player=player, ws_session=ws_session)
+        self._schedule_death(player)
         self.broadcast_event(event=EventFactory.player_connected_event(player=player), everyone_except=[player])
 
         # send game info
@@ -358,16 +529,25 @@ class GameSession:
         self.send_event(
             event=EventFactory.airport_list_event(airport_list=list(self._airports.values())), player=player
         )
+        for refueling, _ in list(self._refueling.values()):
+            self.send_event(event=EventFactory.refueling_started_event(refueling=refueling), player=player)
+        for bot in list(self._bots.values()):
+            if bot.state == BotState.FLYING and bot.flight_plan is not None:
+                self.send_event(event=EventFactory.player_flight_plan_event(flight_plan=bot.flight_plan), player=player)
 
+    @synchronized
     def remove_session(self, ws_session: WebSocketSession):
         logging.info(f"remove_session {ws_session.id}")
         ws_session.close_connection()
-        self._sessions.pop(ws_session.id, None)
-        player = self.get_player(player_id=ws_session.player_id)
-        player.session_id = None
+        player = self._registry.disconnect(ws_session)
+        if player is None or player.session_id is not None:
+            # a late disconnect of a session replaced by a new one (or removed already)
+            return
         player.disconnected_since = timestamp_now()
+        self._schedule_death(player)
         self.broadcast_event(event=EventFactory.player_disconnected_event(player=player), everyone_except=[player])
 
+    @synchronized
     def remove_player(self, player: Player):
         logging.info(f"remove_player {player.id}")
         try:
@@ -375,24 +555,33 @@ class GameSession:
             self.remove_session(ws_session)
         except PlayerNotFound:
             pass
-        try:
-            if player.is_grounded:
-                airport = self._airports.get(player.airport_id)
-                airport.remove_player(player)
-                self.broadcast_event(event=EventFactory.airport_updated_event(airport=airport))
-            self._players.pop(player.id)
-            self.broadcast_event(event=EventFactory.player_removed_event(player=player), everyone_except=[player])
-        except KeyError:
-            pass
+        self._settle_refueling(player)
+        if player.is_grounded:
+            airport = self._airports.get(player.airport_id)
+            airport.remove_player(player)
+            self.broadcast_event(event=EventFactory.airport_updated_event(airport=airport))
+        if not self._registry.remove(player):
+            return
+        self._fleet.remove(player)
+        timer = self._deaths.pop(player.id, None)
+        if timer is not None:
+            timer.cancel()
+        self._dead_reckoning.forget(player.id)
+        self.broadcast_event(event=EventFactory.player_removed_event(player=player), everyone_except=[player])
 
     def pronounce_player_dead(self, player: Player, cause: DeathCause):
         # XD
+        self._settle_refueling(player)
         player.death_cause = cause
         self.broadcast_event(event=EventFactory.player_updated_event(player=player))
 
         if player.is_bot:
-            self._bots.pop(player.id)
+            self._registry.remove_bot(player.id)
             return
+        self._record_game(player=player, cause=cause)
+        self.remove_player(player=player)
+
+    def _record_game(self, player: Player, cause: DeathCause):
         now = timestamp_now()
         self._storage.add_game_record(
             full_nickname=player.nickname,
@@ -402,14 +591,44 @@ class GameSession:
             time_alive=now-player.joined,
             death_cause=cause,
         )
-        self.remove_player(player=player)
 
+    def shutdown(self):
+        """
+        stops the game loop, games of the players still playing are recorded as ended by a disconnection
+        and their connections get closed
+        """
+        self.loop.stop()
+        with self.lock:
+            for player in list(self._players.values()):
+                if player.is_bot or player.is_dead:
+                    continue
+                self._settle_refueling(player)
+                player.death_cause = DeathCause.DISCONNECTED
+                try:
+                    self._record_game(player=player, cause=DeathCause.DISCONNECTED)
+                except Exception:
+                    logging.exception("game of %s not recorded", player.nickname)
+            for ws_session, _ in list(self._sessions.values()):
+                ws_session.close_connection(code=1001, reason="server shutting down")
+
+    def close(self):
+        """
+        cancels the scheduled work of a game without players that isn't run anymore
+        """
+        for _, timer in self._refueling.values():
+            timer.cancel()
+        self._refueling.clear()
+        for timers in (self._deaths, self._shipment_expiry):
+            for timer in timers.values():
+                timer.cancel()
+            timers.clear()
+
+    def websocket_sessions(self) -> List[WebSocketSession]:
+        return [ws_session for ws_session, _ in list(self._sessions.values())]
+
+    @synchronized
     def exit_player(self, token: str):
-        player = None
-        for p in self._players.values():
-            if p.token == token:
-                player = p
-                break
+        player = self._registry.by_token(token)
         if not player:
             return
         self.pronounce_player_dead(player=player, cause=DeathCause.EXITED)
@@ -444,71 +663,145 @@ class GameSession:
         new_position.bearing = bearing  # todo validation
 
         player.position = new_position
+        self._schedule_death(player)
+        if self._dead_reckoning.update(player.id, new_position):
+            self.broadcast_player_position(player=player)
+
+    def broadcast_player_position(self, player: Player):
+        position = player.position
+        self._dead_reckoning.broadcasted(player.id, position)
         self.broadcast_event(event=EventFactory.player_position_updated_event(player=player))
 
+    def broadcast_pending_positions(self):
+        """
+        position updates skipped by the dead reckoning, broadcast once the clients' extrapolation has drifted
+        """
+        now = timestamp_now()
+        # only the players waiting for a broadcast, not every player on every tick
+        players = {}
+        for player_id in self._dead_reckoning.waiting():
+            player = self._players.get(player_id)
+            if player is not None and not player.is_grounded:
+                players[player_id] = player
+        positions = self._fleet.positions_at(
+            list(players),
+            timestamp=now,
+            calculate_bearing=True,
+        )
+        for player_id in self._dead_reckoning.pending(positions, timestamp=now):
+            self.broadcast_player_position(player=players[player_id])
+
     def add_random_airport_shipment(self):
         if len(self._shipments) >= self.config.MAX_SHIPMENTS_IN_GAME:
             return
         origin_airport_id = random.choice(list(self._airports.keys()))
-        destination_airport_id = random.choice(list(set(self._airports.keys()) - {origin_airport_id}))
+        destination_airport_id = random.choice(self.routes.destinations(origin_airport_id))
 
         origin_airport = self._airports[origin_airport_id]
         destination_airport = self._airports[destination_airport_id]
 
-        shipment = Shipment(destination=destination_airport, origin=origin_airport)
+        shipment = Shipment(
+            destination=destination_airport,
+            origin=origin_airport,
+            distance=self.routes.distance(origin_airport_id, destination_airport_id),
+        )
         self._shipments[shipment.id] = shipment
-        origin_airport.shipments[shipment.id] = shipment
+        self._shipment_expiry[shipment.id] = self.loop.schedule(
+            shipment.valid_till + self.SHIPMENT_EXPIRY_GRACE,
+            lambda: self.remove_expired_shipment(shipment),
+        )
+        origin_airport.add_shipment(shipment)
 
         self.broadcast_event(event=EventFactory.airport_updated_event(airport=origin_airport))
 
-    def remove_expired_shipments(self):
-        shipments_to_remove = []
-        for shipment in self._shipments.values():
-            if shipment.valid_till + 3 * 1000 < timestamp_now():
-                shipments_to_remove.append(shipment)
-        for shipment in shipments_to_remove:
-            self._shipments.pop(shipment.id, None)
-            player: Player = self._players.get(shipment.player_id)
-            if player:
-                player.shipment = None
-                self.broadcast_event(event=EventFactory.player_updated_event(player=player))
-
-            airport: Airport = self._airports.get(shipment.origin_id)
-            if airport.shipments.pop(shipment.id, None):
-                self.broadcast_event(event=EventFactory.airport_updated_event(airport=airport))
-
-    def refuel_player(self, player: Player, airport: Airport):
+    def remove_expired_shipment(self, shipment: Shipment):
+        """
+        run by the timer scheduled when the shipment was created, cancelled when it gets delivered
+        """
+        self._shipments.pop(shipment.id, None)
+        self._shipment_expiry.pop(shipment.id, None)
+        player: Player = self._players.get(shipment.player_id)
+        if player:
+            player.shipment = None
+            self.broadcast_event(event=EventFactory.player_updated_event(player=player))
+
+        airport: Airport = self._airports.get(shipment.origin_id)
+        if airport.remove_shipment(shipment.id):
+            self.broadcast_event(event=EventFactory.airport_updated_event(airport=airport))
+
+    def start_refueling(self, player: Player, airport: Airport):
+        if player.id in self._refueling:
+            return
+        now = timestamp_now()
+        player.position = player.position.replace(
+            tank_level=player.position.future_tank_level(timestamp=now),
+            timestamp=now,
+        )
+        if not self._begin_refueling(player=player, airport=airport):
+            logging.info(f"Player {player} has a full tank or no money to refuel!")
+            self._send_refueling_stopped(player=player, airport=airport)
+
+    def _begin_refueling(self, player: Player, airport: Airport) -> bool:
         now = timestamp_now()
-        player.position.tank_level = player.position.future_tank_level(timestamp=now)
-        player.position.timestamp = now
+        refueling = Refueling(
+            player_id=player.id,
+            airport_id=airport.id,
+            started=now,
+            tank_level=player.position.tank_level,
+            score=player.score,
+            fuel_price=airport.fuel_price,
+        )
+        if not refueling.fuel:
+            return False
 
+        # the clients following airport.refueling_started derive the tank level and score from it,
+        # the player keeps the values of the last progress step till the refueling gets settled
         player.is_refueling = True
-        refueling_refresh_time = 0.2  # how much each iteration takes [s]
-        while True:
-            time.sleep(refueling_refresh_time)
-            if not player.is_refueling:
-                break
-            if player.position.tank_level == GameConfig.FUEL_TANK_SIZE:
-                break
-            if player.score == 0:
-                logging.info(f"Player {player} has no money to refuel!")
-                break
-
-            added_fuel = refueling_refresh_time * GameConfig.REFUELING_RATE
-            price = int(airport.fuel_price * added_fuel)
-            if player.score < price:
-                price = player.score
-                added_fuel = price / airport.fuel_price
-
-            player.score -= price
-
-            new_level = player.position.tank_level + added_fuel
-            player.position.tank_level = min(new_level, GameConfig.FUEL_TANK_SIZE)
-            player.position.timestamp = timestamp_now()
-
-            self.broadcast_event(event=EventFactory.player_updated_event(player=player))
+        timer = self.loop.schedule(refueling.finishes, lambda: self.stop_refueling(player=player))
+        self._refueling[player.id] = (refueling, timer)
+        self.broadcast_event(event=EventFactory.refueling_started_event(refueling=refueling))
+        return True
 
+    def _settle_refueling(self, player: Player) -> Optional[Refueling]:
+        """
+        ends the refueling, the tank level and score it has come to are stored in the player
+        """
+        refueling, timer = self._refueling.pop(player.id, (None, None))
+        if not refueling:
+            return None
+        timer.cancel()
+        now = timestamp_now()
+        player.position = player.position.replace(tank_level=refueling.future_tank_level(timestamp=now), timestamp=now)
+        player.score = refueling.future_score(timestamp=now)
         player.is_refueling = False
+        return refueling
+
+    def refuel_players(self):
+        """
+        stores the tank level and score the refueling players have come to, broadcast to the clients
+        that don't follow airport.refueling_started, the players keep the values from the start of the refueling
+        while no such client is connected (they are derived from the Refueling when it gets settled)
+        """
+        if not self._refueling or all(ws_session.refueling_events for ws_session in self.websocket_sessions()):
+            return
+        now = timestamp_now()
+        for refueling, _ in list(self._refueling.values()):
+            player = self._players[refueling.player_id]
+            player.position = player.position.replace(
+                tank_level=refueling.future_tank_level(timestamp=now),
+                timestamp=now,
+            )
+            player.score = refueling.future_score(timestamp=now)
+            self.broadcast_event(event=EventFactory.player_updated_event(player=player), refueling_progress=True)
+
+    def stop_refueling(self, player: Player):
+        refueling = self._settle_refueling(player)
+        if not refueling:
+            return
+        self.broadcast_event(event=EventFactory.player_updated_event(player=player))
+        self._send_refueling_stopped(player=player, airport=self._airports[refueling.airport_id])
+
+    def _send_refueling_stopped(self, player: Player, airport: Airport):
         self.send_event(event=EventFactory.refueling_stopped_event(airport=airport, player=player), player=player)
         self.send_event(event=EventFactory.player_position_updated_event(player=player), player=player)
 
@@ -524,15 +817,19 @@ class GameSession:
 
     def handle_airport_landing(self, player: Player, airport: Airport):
         airport.land_player(player=player)
+        self._schedule_death(player)
 
         self.broadcast_event(event=EventFactory.airport_updated_event(airport=airport))
-        self.broadcast_event(event=EventFactory.player_position_updated_event(player=player))
+        self.broadcast_player_position(player=player)
 
-    def handle_airport_departure(self, player: Player, airport: Airport):
-        airport.remove_player(player=player)
+    def handle_airport_departure(self, player: Player, airport: Airport, bearing: Optional[float] = None):
+        if player == airport.occupying_player:
+            self.stop_refueling(player=player)
+        airport.remove_player(player=player, bearing=bearing)
+        self._schedule_death(player)
 
         self.broadcast_event(event=EventFactory.airport_updated_event(airport=airport))
-        self.broadcast_event(event=EventFactory.player_position_updated_event(player=player))
+        self.broadcast_player_position(player=player)
 
     def handle_shipment_dispatch(self, airport: Airport, player: Player, shipment_id: uuid.UUID):
         airport.dispatch_shipment(shipment_id=shipment_id, player=player)
@@ -541,8 +838,14 @@ class GameSession:
         self.broadcast_event(event=EventFactory.airport_updated_event(airport=airport))
 
     def handle_shipment_delivery(self, airport: Airport, player: Player):
-        shipment = airport.accept_shipment_delivery(player=player)
+        refueling = self._settle_refueling(player)  # continued with the new score
+        try:
+            shipment = airport.accept_shipment_delivery(player=player)
+        finally:
+            if refueling and not self._begin_refueling(player=player, airport=airport):
+                self._send_refueling_stopped(player=player, airport=airport)
         self._shipments.pop(shipment.id)
+        self._shipment_expiry.pop(shipment.id).cancel()
 
         self.send_event(event=EventFactory.shipment_delivered_event(shipment=shipment), player=player)
         self.broadcast_event(event=EventFactory.player_updated_event(player=player))
@@ -591,9 +894,7 @@ class GameSession:
             raise RefuelingWhenFlying
 
         airport: Airport = self._airports.get(player.airport_id)
-
-        t = threading.Thread(target=self.refuel_player, args=(player, airport))
-        t.start()
+        self.start_refueling(player=player, airport=airport)
 
     def handle_refueling_end_request_event(self, player: Player, event: Event):
         logging.info(f"handle_refueling_end_request_event {player.id} {event}")
@@ -601,8 +902,9 @@ class GameSession:
         if not player.is_grounded:
             raise RefuelingWhenFlying
 
-        player.is_refueling = False
+        self.stop_refueling(player=player)
 
+    @synchronized
     def handle_event(self, player: Player, event: Event):
         logging.info(f"handle_event {player.id} {event}")
 
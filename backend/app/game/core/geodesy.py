@@ -0,0 +1,167 @@
+from math import sin, cos, sqrt, atan2, radians, degrees, asin, hypot, pi
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    from app.game.core.coordinates import Coordinates
+
+
+class Haversine:
+    """
+    spherical trigonometry on latitudes and longitudes, converted and evaluated again on every call
+    """
+
+    @staticmethod
+    def distance(coord1: "Coordinates", coord2: "Coordinates", radius: float) -> float:
+        """
+        Haversine formula:
+        a = sin²(Δφ/2) + cos φ1 ⋅ cos φ2 ⋅ sin²(Δλ/2)
+        c = 2 ⋅ atan2( √a, √(1−a) )
+        d = R ⋅ c
+        where φ is latitude, λ is longitude, R is earth’s radius
+        note that angles need to be in radians to pass to trig functions!
+        """
+        lat1 = radians(coord1.latitude)
+        lon1 = radians(coord1.longitude)
+        lat2 = radians(coord2.latitude)
+        lon2 = radians(coord2.longitude)
+
+        delta_lat = lat2 - lat1
+        delta_lon = lon2 - lon1
+        a = sin(delta_lat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(delta_lon / 2) ** 2
+        c = 2 * atan2(sqrt(a), sqrt(max(1 - a, 0)))
+        return radius * c
+
+    @staticmethod
+    def bearing(coord1: "Coordinates", coord2: "Coordinates") -> float:
+        lat1 = radians(coord1.latitude)
+        lon1 = radians(coord1.longitude)
+        lat2 = radians(coord2.latitude)
+        lon2 = radians(coord2.longitude)
+
+        y = sin(lon2 - lon1) * cos(lat2)
+        x = cos(lat1) * sin(lat2) - sin(lat1) * cos(lat2) * cos(lon2 - lon1)
+
+        return ((atan2(y, x) * 180) / pi + 360) % 360
+
+    @staticmethod
+    def destination(
+        coordinates: "Coordinates",
+        distance: float,
+        bearing: float,
+        radius: float,
+        out: "Coordinates",
+        turn: bool = False,
+    ) -> Optional[float]:
+        """
+        writes the destination into `out`, returns how much the bearing turned on the way when `turn` is set
+        """
+        # https://stackoverflow.com/a/7835325
+        bearing = radians(bearing)
+
+        lat1 = radians(coordinates.latitude)
+        lon1 = radians(coordinates.longitude)
+
+        cos_lat1 = cos(lat1)
+        sin_lat1 = sin(lat1)
+        cos_dr = cos(distance / radius)
+        sin_dr = sin(distance / radius)
+
+        lat2 = asin(sin_lat1 * cos_dr + cos_lat1 * sin_dr * cos(bearing))
+        lon2 = lon1 + atan2(sin(bearing) * sin_dr * cos_lat1, cos_dr - sin_lat1 * sin(lat2))
+
+        out.move(degrees(lat2), degrees(lon2))
+        if turn:
+            # the bearing from the destination back to the start turned around, minus the initial one
+            return (Haversine.bearing(out, coordinates) - 180) % 360 - Haversine.bearing(coordinates, out)
+        return None
+
+
+class NVector:
+    """
+    positions as unit vectors from the earth's centre (n-vectors) with the trig of their latitude and longitude,
+    computed once per coordinates (see Coordinates.nvector) and carried over to the destinations:
+    a distance is the angle between two vectors, a bearing their difference projected on the local north and east,
+    and a flight along a great circle is a rotation of the vector towards the bearing
+
+    the vectors kept by the coordinates are read directly, calling Coordinates.nvector costs as much as the math
+    """
+
+    @staticmethod
+    def distance(coord1: "Coordinates", coord2: "Coordinates", radius: float) -> float:
+        x1, y1, z1, _, _, _, _ = coord1._nvector or coord1.nvector()
+        x2, y2, z2, _, _, _, _ = coord2._nvector or coord2.nvector()
+        # atan2 of the norm of the cross product and the dot product is accurate at any angle
+        cross_x = y1 * z2 - z1 * y2
+        cross_y = z1 * x2 - x1 * z2
+        cross_z = x1 * y2 - y1 * x2
+        sin_angle = sqrt(cross_x * cross_x + cross_y * cross_y + cross_z * cross_z)
+        return radius * atan2(sin_angle, x1 * x2 + y1 * y2 + z1 * z2)
+
+    @staticmethod
+    def bearing(coord1: "Coordinates", coord2: "Coordinates") -> float:
+        _, _, _, sin_lat1, cos_lat1, sin_lon1, cos_lon1 = coord1._nvector or coord1.nvector()
+        x2, y2, z2, _, _, _, _ = coord2._nvector or coord2.nvector()
+        east = cos_lon1 * y2 - sin_lon1 * x2
+        north = cos_lat1 * z2 - sin_lat1 * (cos_lon1 * x2 + sin_lon1 * y2)
+        return (degrees(atan2(east, north)) + 360) % 360
+
+    @staticmethod
+    def destination(
+        coordinates: "Coordinates",
+        distance: float,
+        bearing: float,
+        radius: float,
+        out: "Coordinates",
+        turn: bool = False,
+    ) -> Optional[float]:
+        """
+        the vector rotated by distance / radius towards the bearing, the direction of the flight rotates with it
+        """
+        x1, y1, z1, sin_lat1, cos_lat1, sin_lon1, cos_lon1 = coordinates._nvector or coordinates.nvector()
+        angle = distance / radius
+        cos_angle = cos(angle)
+        sin_angle = sin(angle)
+        bearing = radians(bearing)
+        cos_bearing = cos(bearing)
+        sin_bearing = sin(bearing)
+        # the direction of the flight, north and east of the start combined
+        dx = -sin_lat1 * cos_lon1 * cos_bearing - sin_lon1 * sin_bearing
+        dy = -sin_lat1 * sin_lon1 * cos_bearing + cos_lon1 * sin_bearing
+        dz = cos_lat1 * cos_bearing
+
+        x2 = x1 * cos_angle + dx * sin_angle
+        y2 = y1 * cos_angle + dy * sin_angle
+        z2 = z1 * cos_angle + dz * sin_angle
+        cos_lat2 = hypot(x2, y2)
+
+        # the longitude moves from the start like the haversine formulas, it isn't wrapped to ±180
+        delta_lon = atan2(y2 * cos_lon1 - x2 * sin_lon1, x2 * cos_lon1 + y2 * sin_lon1)
+        latitude = degrees(atan2(z2, cos_lat2))
+        longitude = coordinates.longitude + degrees(delta_lon)
+        if cos_lat2 > 0:
+            out.move(latitude, longitude, (x2, y2, z2, z2, cos_lat2, y2 / cos_lat2, x2 / cos_lat2))
+        else:  # at a pole, the longitude of the vector is any
+            out.move(latitude, longitude)
+        if not turn:
+            return None
+
+        # the direction on arrival projected on the east and north of the destination (both scaled by cos_lat2)
+        tx = dx * cos_angle - x1 * sin_angle
+        ty = dy * cos_angle - y1 * sin_angle
+        tz = dz * cos_angle - z1 * sin_angle
+        east = ty * x2 - tx * y2
+        north = tz * cos_lat2 * cos_lat2 - z2 * (tx * x2 + ty * y2)
+        return degrees((atan2(east, north) - bearing + pi) % (2 * pi) - pi)
+
+
+def nvector(latitude: float, longitude: float) -> Tuple[float, ...]:
+    """
+    (x, y, z, sin latitude, cos latitude, sin longitude, cos longitude)
+    """
+    lat = radians(latitude)
+    lon = radians(longitude)
+    sin_lat = sin(lat)
+    cos_lat = cos(lat)
+    sin_lon = sin(lon)
+    cos_lon = cos(lon)
+    return cos_lat * cos_lon, cos_lat * sin_lon, sin_lat, sin_lat, cos_lat, sin_lon, cos_lon
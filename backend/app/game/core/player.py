@@ -1,13 +1,36 @@
 import uuid
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
+from app.game.core.cache import SerializationCache
 from app.game.core.position import PlayerPosition
 from app.game.core.shipment import Shipment
 from app.game.enums import DeathCause
 from app.tools.timestamp import timestamp_now
 
+if TYPE_CHECKING:
+    from app.game.fleet import ScalarFleet
+
+
+class Player(SerializationCache):
+    __slots__ = (
+        "_id",
+        "_nickname",
+        "_token",
+        "_airport_id",
+        "disconnected_since",
+        "session_id",
+        "fleet",
+        "_position",
+        "score",
+        "is_bot",
+        "shipment",
+        "shipments_delivered",
+        "color",
+        "is_refueling",
+        "death_cause",
+        "joined",
+    )
 
-class Player:
     def __init__(self, nickname: str, token: str, color: str, bot: bool = False):
         self._id: uuid.UUID = uuid.uuid4()
         self._nickname: str = nickname
@@ -15,6 +38,7 @@ class Player:
         self._airport_id: Optional[uuid.UUID] = None
         self.disconnected_since: int = timestamp_now()
         self.session_id: Optional[uuid.UUID] = None
+        self.fleet: Optional["ScalarFleet"] = None  # set by the fleet the player is added to
         self.position: "PlayerPosition" = PlayerPosition.random()
         self.score: int = 0
         self.is_bot: bool = bot
@@ -49,12 +73,32 @@ class Player:
     def is_dead(self) -> bool:
         return bool(self.death_cause)
 
+    @property
+    def position(self) -> "PlayerPosition":
+        return self._position
+
+    @position.setter
+    def position(self, position: "PlayerPosition"):
+        """
+        positions must not be modified after they are assigned, the fleet copies the last one when it propagates
+        """
+        self._position = position
+        if self.fleet is not None:
+            self.fleet.update(self)
+
     @property
     def airport_id(self) -> uuid.UUID:
         return self._airport_id
 
     @property
     def serialized(self) -> dict:
+        return self._cached_serialized(
+            self._serialize,
+            self.position.serialized,
+            self.shipment.serialized if self.shipment else None,
+        )
+
+    def _serialize(self, position: dict, shipment: Optional[dict]) -> dict:
         return {
             "id": self.id,
             "nickname": self.nickname,
@@ -64,6 +108,6 @@ class Player:
             "is_bot": self.is_bot,
             "score": self.score,
             "death_cause": self.death_cause,
-            "position": self.position.serialized,
-            "shipment": self.shipment.serialized if self.shipment else None,
+            "position": position,
+            "shipment": shipment,
         }
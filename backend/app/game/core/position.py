@@ -1,11 +1,15 @@
 import random
+from typing import Optional
 
 from app.game.config import GameConfig
+from app.game.core.cache import SerializationCache
 from app.game.core.coordinates import Coordinates
 from app.tools.timestamp import timestamp_now
 
 
-class PlayerPosition:
+class PlayerPosition(SerializationCache):
+    __slots__ = ("coordinates", "bearing", "velocity", "timestamp", "tank_level")
+
     coordinates: "Coordinates"
     bearing: float
     velocity: int  # km/h
@@ -31,25 +35,60 @@ class PlayerPosition:
         new_tank_level = max(new_tank_level, 0)
         return new_tank_level
 
-    def future_position(self, timestamp: int, calculate_bearing: bool = False) -> "PlayerPosition":
+    def future_position(
+        self,
+        timestamp: int,
+        calculate_bearing: bool = False,
+        out: Optional["PlayerPosition"] = None,
+    ) -> "PlayerPosition":
+        """
+        written into `out` instead of a new position when given, a scratch position of the caller that no player
+        holds (see Player.position) and that isn't this one
+        """
         timestamp_delta = timestamp - self.timestamp
         distance_traveled = self.velocity * timestamp_delta / 3_600_000  # s = v*t, convert timestamp to hours
-        future_coordinates = self.coordinates.destination_coordinates(distance=distance_traveled, bearing=self.bearing)
+        out_coordinates = out.coordinates if out is not None else None
         if calculate_bearing:
-            bearing_diff = (
-                Coordinates.bearing_between(future_coordinates, self.coordinates) - 180
-            ) % 360 - Coordinates.bearing_between(self.coordinates, future_coordinates)
-            future_bearing = self.bearing + bearing_diff
+            future_coordinates, turn = self.coordinates.destination_turn(
+                distance=distance_traveled,
+                bearing=self.bearing,
+                out=out_coordinates,
+            )
+            future_bearing = self.bearing + turn
         else:
+            future_coordinates = self.coordinates.destination_coordinates(
+                distance=distance_traveled,
+                bearing=self.bearing,
+                out=out_coordinates,
+            )
             future_bearing = self.bearing
 
-        return PlayerPosition(
-            coordinates=future_coordinates,
-            bearing=future_bearing,
-            velocity=self.velocity,
-            timestamp=timestamp,
-            tank_level=self.future_tank_level(timestamp=timestamp),
-        )
+        if out is None:
+            return PlayerPosition(
+                coordinates=future_coordinates,
+                bearing=future_bearing,
+                velocity=self.velocity,
+                timestamp=timestamp,
+                tank_level=self.future_tank_level(timestamp=timestamp),
+            )
+        out.bearing = future_bearing
+        out.velocity = self.velocity
+        out.tank_level = self.future_tank_level(timestamp=timestamp)
+        out.timestamp = timestamp
+        return out
+
+    def replace(self, **changes) -> "PlayerPosition":
+        """
+        a copy with some of the attributes changed, positions are replaced as a whole (see Player.position)
+        """
+        attributes = {
+            "coordinates": self.coordinates,
+            "bearing": self.bearing,
+            "velocity": self.velocity,
+            "timestamp": self.timestamp,
+            "tank_level": self.tank_level,
+        }
+        return PlayerPosition(**{**attributes, **changes})
 
     @staticmethod
     def random() -> "PlayerPosition":
@@ -87,8 +126,11 @@ class PlayerPosition:
 
     @property
     def serialized(self) -> dict:
+        return self._cached_serialized(self._serialize, self.coordinates.serialized)
+
+    def _serialize(self, coordinates: dict) -> dict:
         return {
-            "coordinates": self.coordinates.serialized,
+            "coordinates": coordinates,
             "velocity": self.velocity,
             "fuel_consumption": self.fuel_consumption,
             "tank_level": self.tank_level,
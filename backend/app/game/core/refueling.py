@@ -0,0 +1,58 @@
+import math
+import uuid
+
+from app.game.config import GameConfig
+
+
+class Refueling:
+    """
+    refueling at a constant rate and price, tank level and score are derived for any moment,
+    like the fuel consumption in PlayerPosition.future_tank_level
+    """
+
+    def __init__(
+        self,
+        player_id: uuid.UUID,
+        airport_id: uuid.UUID,
+        started: int,
+        tank_level: float,
+        score: int,
+        fuel_price: float,
+        rate: float = GameConfig.REFUELING_RATE,
+    ):
+        self.player_id = player_id
+        self.airport_id = airport_id
+        self.started = started
+        self.tank_level = tank_level  # at the start
+        self.score = score  # at the start
+        self.fuel_price = fuel_price  # per liter
+        self.rate = rate  # liters per second
+
+        fuel_to_full_tank = max(GameConfig.FUEL_TANK_SIZE - tank_level, 0)
+        affordable_fuel = score / fuel_price if fuel_price > 0 else fuel_to_full_tank
+        self.fuel = min(fuel_to_full_tank, affordable_fuel)  # added till the end
+        self.finishes = started + math.ceil(self.fuel / rate * 1000)
+
+    def fuel_added(self, timestamp: int) -> float:
+        if timestamp >= self.finishes:
+            return self.fuel
+        return max(timestamp - self.started, 0) * self.rate / 1000
+
+    def future_tank_level(self, timestamp: int) -> float:
+        return min(self.tank_level + self.fuel_added(timestamp), GameConfig.FUEL_TANK_SIZE)
+
+    def future_score(self, timestamp: int) -> int:
+        return max(self.score - int(self.fuel_added(timestamp) * self.fuel_price), 0)
+
+    @property
+    def serialized(self) -> dict:
+        return {
+            "id": self.airport_id,
+            "player_id": self.player_id,
+            "started": self.started,
+            "finishes": self.finishes,
+            "tank_level": self.tank_level,
+            "score": self.score,
+            "fuel_price": self.fuel_price,
+            "rate": self.rate,
+        }
@@ -2,6 +2,7 @@ import random
 import uuid
 from typing import Optional, TYPE_CHECKING
 
+from app.game.core.cache import SerializationCache
 from app.game.core.coordinates import Coordinates
 from app.tools.timestamp import timestamp_now
 
@@ -9,7 +10,8 @@ if TYPE_CHECKING:
     from app.game.core.airport import Airport
 
 
-class Shipment:
+class Shipment(SerializationCache):
+    __slots__ = ("id", "name", "award", "_origin", "_destination", "time_to_deliver", "valid_till", "player_id")
 
     id: uuid.UUID
     name: str
@@ -18,23 +20,27 @@ class Shipment:
     _destination: "Airport"
     time_to_deliver: int
     valid_till: int
-    player_id: Optional[uuid.UUID] = None  # id of the player that is transporting the shipment
+    player_id: Optional[uuid.UUID]  # id of the player that is transporting the shipment
 
-    def __init__(self, origin: "Airport", destination: "Airport"):
+    def __init__(self, origin: "Airport", destination: "Airport", distance: Optional[float] = None):
+        """
+        `distance` between the airports, in km, when it is known already (see app.game.routes.RouteTable)
+        """
         self.id = uuid.uuid4()
         self.name = random.choice(Shipment.shipment_names())
         self._origin = origin
         self._destination = destination
         self.time_to_deliver = random.randint(90, 150) * 1000
-        self.award = self._get_random_award()
+        self.award = self._get_random_award(distance)
         self.valid_till = timestamp_now() + self.time_to_deliver
         self.player_id = None
 
-    def _get_random_award(self):
-        distance_between_endpoints = Coordinates.distance_between(
-            coord1=self._origin.coordinates,
-            coord2=self._destination.coordinates,
-        )
+    def _get_random_award(self, distance_between_endpoints: Optional[float] = None):
+        if distance_between_endpoints is None:
+            distance_between_endpoints = Coordinates.distance_between(
+                coord1=self._origin.coordinates,
+                coord2=self._destination.coordinates,
+            )
         random_factor = random.uniform(0.85, 1.15)
         scaling = 150000
         return int(distance_between_endpoints / self.time_to_deliver * random_factor * scaling)
@@ -61,6 +67,9 @@ class Shipment:
 
     @property
     def serialized(self) -> dict:
+        return self._cached_serialized(self._serialize)
+
+    def _serialize(self) -> dict:
         return {
             "id": self.id,
             "name": self.name,
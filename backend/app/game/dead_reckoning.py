@@ -0,0 +1,94 @@
+import threading
+import uuid
+from typing import Dict, List, Set
+
+from app.game.config import GameConfig
+from app.game.core.coordinates import Coordinates
+from app.game.core.position import PlayerPosition
+
+
+class DeadReckoning:
+    """
+    clients extrapolate the planes from the last broadcast position, a new position is broadcast only
+    when that extrapolation diverges from the authoritative one by more than the configured errors
+    """
+
+    def __init__(self, config: GameConfig):
+        self.config = config
+        self._lock = threading.Lock()
+        self._broadcast: Dict[uuid.UUID, PlayerPosition] = {}  # player id -> last broadcast position
+        self._pending: Set[uuid.UUID] = set()  # players with a position not broadcast yet
+        # the extrapolations are only compared, they are propagated into these instead of new positions
+        self._extrapolated = self._scratch_position()
+        self._actual = self._scratch_position()
+        self.stats = {
+            "updates": 0,
+            "broadcasts": 0,
+        }
+
+    def update(self, player_id: uuid.UUID, position: PlayerPosition) -> bool:
+        """
+        called on every authoritative position change, returns whether it has to be broadcast
+        """
+        with self._lock:
+            self.stats["updates"] += 1
+            if self._diverges(player_id, position, timestamp=position.timestamp):
+                return True
+            self._pending.add(player_id)
+            return False
+
+    def broadcasted(self, player_id: uuid.UUID, position: PlayerPosition):
+        with self._lock:
+            self.stats["broadcasts"] += 1
+            self._broadcast[player_id] = position
+            self._pending.discard(player_id)
+
+    def waiting(self) -> List[uuid.UUID]:
+        """
+        players with a position not broadcast yet
+        """
+        with self._lock:
+            return list(self._pending)
+
+    def pending(self, positions: Dict[uuid.UUID, PlayerPosition], timestamp: int) -> List[uuid.UUID]:
+        """
+        players whose not broadcast position has diverged by now, `positions` are their current positions
+        """
+        with self._lock:
+            return [
+                player_id
+                for player_id in list(self._pending)
+                if player_id in positions and self._diverges(player_id, positions[player_id], timestamp=timestamp)
+            ]
+
+    def forget(self, player_id: uuid.UUID):
+        with self._lock:
+            self._broadcast.pop(player_id, None)
+            self._pending.discard(player_id)
+
+    def _diverges(self, player_id: uuid.UUID, position: PlayerPosition, timestamp: int) -> bool:
+        last = self._broadcast.get(player_id)
+        if last is None:
+            return True
+        if timestamp - last.timestamp >= self.config.POSITION_BROADCAST_MAX_INTERVAL:
+            return True
+        if abs(position.velocity - last.velocity) > self.config.POSITION_BROADCAST_VELOCITY_ERROR:
+            return True
+
+        extrapolated = self._position_at(last, timestamp=timestamp, out=self._extrapolated)
+        actual = self._position_at(position, timestamp=timestamp, out=self._actual)
+        bearing_error = abs((actual.bearing - extrapolated.bearing + 180) % 360 - 180)
+        if bearing_error > self.config.POSITION_BROADCAST_BEARING_ERROR:
+            return True
+        distance_error = Coordinates.distance_between(actual.coordinates, extrapolated.coordinates)
+        return distance_error > self.config.POSITION_BROADCAST_DISTANCE_ERROR
+
+    @staticmethod
+    def _position_at(position: PlayerPosition, timestamp: int, out: PlayerPosition) -> PlayerPosition:
+        if timestamp == position.timestamp:
+            return position  # bearing calculated from a zero distance would be off
+        return position.future_position(timestamp=timestamp, calculate_bearing=True, out=out)
+
+    @staticmethod
+    def _scratch_position() -> PlayerPosition:
+        return PlayerPosition(coordinates=Coordinates(latitude=0, longitude=0), bearing=0, velocity=0, timestamp=0)
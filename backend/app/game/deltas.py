@@ -0,0 +1,52 @@
+import threading
+import uuid
+from typing import Dict, Optional, Tuple
+
+from app.game.events import EventType
+
+
+# events carrying the whole state of an entity, each of them bumps the entity version
+VERSIONED_EVENTS = [
+    EventType.PLAYER_REGISTERED,
+    EventType.PLAYER_CONNECTED,
+    EventType.PLAYER_DISCONNECTED,
+    EventType.PLAYER_UPDATED,
+    EventType.AIRPORT_UPDATED,
+]
+
+# versioned events that can be sent as a difference to the previous version
+DELTA_EVENTS = [
+    EventType.PLAYER_UPDATED,
+    EventType.AIRPORT_UPDATED,
+]
+
+_MISSING = object()
+
+
+class DeltaTracker:
+    """
+    remembers the last broadcast state of every entity, so that the next one can be described as a difference
+    """
+
+    def __init__(self):
+        # held for the whole broadcast of a versioned event, so the sessions get the versions in order
+        self.lock = threading.RLock()
+        self._states: Dict[uuid.UUID, Tuple[int, dict]] = {}
+
+    def update(self, entity_id: uuid.UUID, state: dict) -> Tuple[int, Optional[dict]]:
+        """
+        returns the new version of the entity and the fields that changed since the previous one,
+        changes are None if there's no previous version
+        """
+        previous = self._states.get(entity_id)
+        if previous is None:
+            version, changes = 1, None
+        else:
+            previous_version, previous_state = previous
+            version = previous_version + 1
+            changes = {key: value for key, value in state.items() if previous_state.get(key, _MISSING) != value}
+        self._states[entity_id] = (version, state)
+        return version, changes
+
+    def forget(self, entity_id: uuid.UUID):
+        self._states.pop(entity_id, None)
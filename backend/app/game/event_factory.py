@@ -1,7 +1,10 @@
+import uuid
 from typing import List
 
 from app.game.core.airport import Airport
+from app.game.core.flight_plan import FlightPlan
 from app.game.core.player import Player
+from app.game.core.refueling import Refueling
 from app.game.core.shipment import Shipment
 from app.game.events import Event, EventType
 
@@ -15,6 +18,10 @@ class EventFactory:
     def airport_list_event(airport_list: List["Airport"]) -> Event:
         return Event(type=EventType.AIRPORT_LIST, data={"airports": [airport.serialized for airport in airport_list]})
 
+    @staticmethod
+    def refueling_started_event(refueling: "Refueling") -> Event:
+        return Event(type=EventType.AIRPORT_REFUELING_STARTED, data=refueling.serialized)
+
     @staticmethod
     def refueling_stopped_event(airport: "Airport", player: "Player") -> Event:
         return Event(
@@ -66,3 +73,17 @@ class EventFactory:
                 "position": player.position.serialized,
             },
         )
+
+    @staticmethod
+    def player_flight_plan_event(flight_plan: "FlightPlan") -> Event:
+        return Event(type=EventType.PLAYER_FLIGHT_PLAN, data=flight_plan.serialized)
+
+    @staticmethod
+    def player_index_assigned_event(player_id: uuid.UUID, index: int) -> Event:
+        return Event(
+            type=EventType.PLAYER_INDEX_ASSIGNED,
+            data={
+                "id": player_id,
+                "index": index,
+            },
+        )
@@ -1,5 +1,6 @@
 import dataclasses
 import enum
+from typing import Optional
 
 from pydantic import ValidationError, BaseModel, validator, conint
 
@@ -15,6 +16,8 @@ class EventType(str, enum.Enum):
     PLAYER_REMOVED = "player.removed"
     PLAYER_UPDATED = "player.updated"
     PLAYER_POSITION_UPDATED = "player_position.updated"
+    PLAYER_FLIGHT_PLAN = "player.flight_plan"
+    PLAYER_INDEX_ASSIGNED = "player.index_assigned"
     PLAYER_POSITION_UPDATE_REQUEST = "player_position.update_request"
     AIRPORT_LANDING_REQUEST = "airport.landing_request"
     AIRPORT_DEPARTURE_REQUEST = "airport.departure_request"
@@ -23,6 +26,7 @@ class EventType(str, enum.Enum):
     AIRPORT_SHIPMENT_DELIVERED = "airport.shipment_delivered"
     AIRPORT_REFUELING_START_REQUEST = "airport.refueling_start_request"
     AIRPORT_REFUELING_END_REQUEST = "airport.refueling_end_request"
+    AIRPORT_REFUELING_STARTED = "airport.refueling_started"
     AIRPORT_REFUELING_STOPPED = "airport.refueling_stopped"
     AIRPORT_UPDATED = "airport.updated"
     AIRPORT_LIST = "airport.list"
@@ -36,18 +40,36 @@ EVENTS_EMITTED_BY_SERVER = [
     EventType.PLAYER_REMOVED,
     EventType.PLAYER_UPDATED,
     EventType.PLAYER_POSITION_UPDATED,
+    EventType.PLAYER_FLIGHT_PLAN,
+    EventType.PLAYER_INDEX_ASSIGNED,
     EventType.AIRPORT_SHIPMENT_DELIVERED,
+    EventType.AIRPORT_REFUELING_STARTED,
     EventType.AIRPORT_REFUELING_STOPPED,
     EventType.AIRPORT_UPDATED,
     EventType.AIRPORT_LIST,
 ]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(init=False)
 class Event:
+    __slots__ = ("type", "data", "created")
+
     type: EventType
     data: dict
-    created: int = dataclasses.field(default_factory=timestamp_now)
+    created: int
+
+    def __init__(self, type: EventType, data: dict, created: Optional[int] = None):
+        self.type = type
+        self.data = data
+        self.created = timestamp_now() if created is None else created
+
+    @property
+    def serialized(self) -> dict:
+        return {
+            "type": self.type,
+            "data": self.data,
+            "created": self.created,
+        }
 
 
 class EventMessageBody(BaseModel):
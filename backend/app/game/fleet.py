@@ -0,0 +1,228 @@
+import math
+import uuid
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+from app.game.core.coordinates import Coordinates
+from app.game.core.position import PlayerPosition
+
+try:
+    import numpy
+except ImportError:  # the game runs without it, a plane at a time (ScalarFleet)
+    numpy = None
+
+if TYPE_CHECKING:
+    from app.game.core.player import Player
+
+
+class ScalarFleet:
+    """
+    the planes of a game, propagated one at a time with PlayerPosition
+    """
+
+    def __init__(self):
+        self._players: Dict[uuid.UUID, "Player"] = {}
+
+    def __len__(self):
+        return len(self._players)
+
+    def add(self, player: "Player"):
+        self._players[player.id] = player
+        player.fleet = self
+
+    def remove(self, player: "Player"):
+        self._players.pop(player.id, None)
+        player.fleet = None
+
+    def update(self, player: "Player"):
+        pass
+
+    def positions_at(
+        self,
+        player_ids: List[uuid.UUID],
+        timestamp: int,
+        calculate_bearing: bool = False,
+    ) -> Dict[uuid.UUID, PlayerPosition]:
+        """
+        the positions of the planes at `timestamp`, or their last positions when they're newer
+        """
+        positions = {}
+        for player_id in player_ids:
+            position = self._players[player_id].position
+            future_timestamp = max(timestamp, position.timestamp)
+            if future_timestamp == position.timestamp:
+                positions[player_id] = position  # bearing calculated from a zero distance would be off
+            else:
+                positions[player_id] = position.future_position(
+                    timestamp=future_timestamp,
+                    calculate_bearing=calculate_bearing,
+                )
+        return positions
+
+
+class FleetState(ScalarFleet):
+    """
+    the last position of every plane of a game in contiguous arrays, so that the planes are propagated all at once
+    instead of a PlayerPosition at a time, with the formulas of geodesy.NVector
+
+    an assigned position only marks the plane as stale, the rows of the stale planes are copied from their positions
+    in bulk when the fleet is propagated. Rows of removed planes are reused
+    """
+
+    _COLUMNS = {
+        "latitude": "float64",
+        "longitude": "float64",
+        "bearing": "float64",
+        "velocity": "float64",
+        "tank_level": "float64",
+        "fuel_consumption": "float64",
+        "timestamp": "int64",
+    }
+
+    def __init__(self, capacity: int = 64):
+        super().__init__()
+        self._rows: Dict[uuid.UUID, int] = {}
+        self._ids: List[Optional[uuid.UUID]] = [None] * capacity
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        self._stale: Set[uuid.UUID] = set()
+        for column, dtype in self._COLUMNS.items():
+            setattr(self, column, numpy.zeros(capacity, dtype=dtype))
+
+    def add(self, player: "Player"):
+        if not self._free:
+            self._grow()
+        row = self._free.pop()
+        self._rows[player.id] = row
+        self._ids[row] = player.id
+        super().add(player)
+        self.update(player)
+
+    def remove(self, player: "Player"):
+        row = self._rows.pop(player.id, None)
+        if row is not None:
+            self._ids[row] = None
+            self._free.append(row)
+        self._stale.discard(player.id)
+        super().remove(player)
+
+    def update(self, player: "Player"):
+        self._stale.add(player.id)
+
+    def positions_at(
+        self,
+        player_ids: List[uuid.UUID],
+        timestamp: int,
+        calculate_bearing: bool = False,
+    ) -> Dict[uuid.UUID, PlayerPosition]:
+        if not player_ids:
+            return {}
+        self._sync()
+        rows = numpy.fromiter((self._rows[player_id] for player_id in player_ids), dtype="int64", count=len(player_ids))
+        anchor_timestamp = self.timestamp[rows]
+        future_timestamp = numpy.maximum(timestamp, anchor_timestamp)
+        elapsed = future_timestamp - anchor_timestamp
+        latitude, longitude, bearing = self._propagate(
+            latitude=self.latitude[rows],
+            longitude=self.longitude[rows],
+            bearing=self.bearing[rows],
+            distance=self.velocity[rows] * elapsed / 3_600_000,
+            calculate_bearing=calculate_bearing,
+        )
+        # bearing calculated from a zero distance would be off
+        bearing = numpy.where(elapsed == 0, self.bearing[rows], bearing)
+        tank_level = numpy.maximum(self.tank_level[rows] - elapsed * self.fuel_consumption[rows] / 3_600_000, 0)
+
+        # python numbers in the positions, converted per column
+        columns = zip(
+            player_ids,
+            latitude.tolist(),
+            longitude.tolist(),
+            bearing.tolist(),
+            self.velocity[rows].astype("int64").tolist(),
+            future_timestamp.tolist(),
+            tank_level.tolist(),
+        )
+        return {
+            player_id: PlayerPosition(
+                coordinates=Coordinates(latitude=lat, longitude=lon),
+                bearing=bearing,
+                velocity=velocity,
+                timestamp=timestamp,
+                tank_level=tank_level,
+            )
+            for player_id, lat, lon, bearing, velocity, timestamp, tank_level in columns
+        }
+
+    def _sync(self):
+        """
+        copies the positions assigned since the last propagation into the arrays, a column at a time
+        """
+        if not self._stale:
+            return
+        player_ids = list(self._stale)
+        self._stale.clear()
+        rows = [self._rows[player_id] for player_id in player_ids]
+        positions = [self._players[player_id].position for player_id in player_ids]
+        self.latitude[rows] = [position.coordinates.latitude for position in positions]
+        self.longitude[rows] = [position.coordinates.longitude for position in positions]
+        self.bearing[rows] = [position.bearing for position in positions]
+        self.velocity[rows] = [position.velocity for position in positions]
+        self.tank_level[rows] = [position.tank_level for position in positions]
+        self.fuel_consumption[rows] = [position.fuel_consumption for position in positions]
+        self.timestamp[rows] = [position.timestamp for position in positions]
+
+    @staticmethod
+    def _propagate(latitude, longitude, bearing, distance, calculate_bearing: bool):
+        """
+        geodesy.NVector.destination for arrays, with the turned bearing of PlayerPosition.future_position
+        """
+        lat1 = numpy.radians(latitude)
+        lon1 = numpy.radians(longitude)
+        sin_lat1 = numpy.sin(lat1)
+        cos_lat1 = numpy.cos(lat1)
+        sin_lon1 = numpy.sin(lon1)
+        cos_lon1 = numpy.cos(lon1)
+        x1 = cos_lat1 * cos_lon1
+        y1 = cos_lat1 * sin_lon1
+        z1 = sin_lat1
+
+        angle = distance / Coordinates._earth_radius()
+        cos_angle = numpy.cos(angle)
+        sin_angle = numpy.sin(angle)
+        theta = numpy.radians(bearing)
+        cos_bearing = numpy.cos(theta)
+        sin_bearing = numpy.sin(theta)
+        # the direction of the flight, north and east of the start combined
+        dx = -sin_lat1 * cos_lon1 * cos_bearing - sin_lon1 * sin_bearing
+        dy = -sin_lat1 * sin_lon1 * cos_bearing + cos_lon1 * sin_bearing
+        dz = cos_lat1 * cos_bearing
+
+        x2 = x1 * cos_angle + dx * sin_angle
+        y2 = y1 * cos_angle + dy * sin_angle
+        z2 = z1 * cos_angle + dz * sin_angle
+        cos_lat2 = numpy.hypot(x2, y2)
+        delta_lon = numpy.arctan2(y2 * cos_lon1 - x2 * sin_lon1, x2 * cos_lon1 + y2 * sin_lon1)
+        latitude2 = numpy.degrees(numpy.arctan2(z2, cos_lat2))
+        longitude2 = longitude + numpy.degrees(delta_lon)
+        if not calculate_bearing:
+            return latitude2, longitude2, bearing
+
+        # the direction on arrival projected on the east and north of the destination (both scaled by cos_lat2)
+        tx = dx * cos_angle - x1 * sin_angle
+        ty = dy * cos_angle - y1 * sin_angle
+        tz = dz * cos_angle - z1 * sin_angle
+        east = ty * x2 - tx * y2
+        north = tz * cos_lat2 * cos_lat2 - z2 * (tx * x2 + ty * y2)
+        turn = numpy.degrees((numpy.arctan2(east, north) - theta + math.pi) % (2 * math.pi) - math.pi)
+        return latitude2, longitude2, bearing + turn
+
+    def _grow(self):
+        capacity = len(self._ids)
+        for column in self._COLUMNS:
+            array = getattr(self, column)
+            setattr(self, column, numpy.concatenate([array, numpy.zeros_like(array)]))
+        self._ids.extend([None] * capacity)
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+
+def create_fleet() -> ScalarFleet:
+    return FleetState() if numpy is not None else ScalarFleet()
@@ -0,0 +1,149 @@
+import dataclasses
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from app.tools.timestamp import timestamp_now
+
+
+@dataclasses.dataclass
+class System:
+    name: str
+    run: Callable[[], None]
+    interval: int  # in milliseconds, 0 runs the system every tick
+    next_run: int = 0
+    runs: int = 0
+    total_duration: float = 0  # in milliseconds
+    max_duration: float = 0
+
+    @property
+    def serialized(self) -> dict:
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "runs": self.runs,
+            "avg_duration": self.total_duration / self.runs if self.runs else 0,
+            "max_duration": self.max_duration,
+        }
+
+
+class Timer:
+    def __init__(self, timestamp: int, callback: Callable[[], None]):
+        self.timestamp = timestamp
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class GameLoop:
+    """
+    runs the game systems one after another, in the order they were added, on a single thread at a fixed tick rate,
+    timers scheduled for a timestamp run at the beginning of the first tick after it
+
+    the whole tick holds `lock`, everything else changing the game state (client requests) has to hold it as well
+    """
+
+    def __init__(self, tick_rate: int, lock: Optional[threading.RLock] = None):
+        self.tick_rate = tick_rate
+        self.tick_interval = 1000 / tick_rate  # in milliseconds
+        self.lock = lock or threading.RLock()
+        self._systems: List[System] = []
+        self._timers: List[Tuple[int, int, Timer]] = []  # heap of (timestamp, order, timer)
+        self._timers_order = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+        self.ticks = 0
+        self.overruns = 0  # ticks that took longer than the tick interval
+        self.last_tick_duration = 0.0
+        self.max_tick_duration = 0.0
+        self._total_tick_duration = 0.0
+
+    def add_system(self, name: str, run: Callable[[], None], interval: int = 0):
+        self._systems.append(System(name=name, run=run, interval=interval))
+
+    def schedule(self, timestamp: int, callback: Callable[[], None]) -> Timer:
+        """
+        has to be called holding the lock
+        """
+        timer = Timer(timestamp=timestamp, callback=callback)
+        heapq.heappush(self._timers, (timestamp, next(self._timers_order), timer))
+        return timer
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "tick_rate": self.tick_rate,
+            "timers": len(self._timers),
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "last_tick_duration": self.last_tick_duration,
+            "avg_tick_duration": self._total_tick_duration / self.ticks if self.ticks else 0,
+            "max_tick_duration": self.max_tick_duration,
+            "systems": [system.serialized for system in self._systems],
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="game-loop", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def tick(self):
+        tick_start = time.perf_counter()
+        now = timestamp_now()
+        with self.lock:
+            self._run_timers(now)
+            for system in self._systems:
+                if now < system.next_run:
+                    continue
+                system.next_run = now + system.interval
+
+                start = time.perf_counter()
+                try:
+                    system.run()
+                except Exception:
+                    logging.exception("game loop system %s failed", system.name)
+                duration = (time.perf_counter() - start) * 1000
+                system.runs += 1
+                system.total_duration += duration
+                system.max_duration = max(system.max_duration, duration)
+
+        duration = (time.perf_counter() - tick_start) * 1000
+        self.ticks += 1
+        self.last_tick_duration = duration
+        self._total_tick_duration += duration
+        self.max_tick_duration = max(self.max_tick_duration, duration)
+        if duration > self.tick_interval:
+            self.overruns += 1
+
+    def _run_timers(self, now: int):
+        while self._timers and self._timers[0][0] <= now:
+            _, _, timer = heapq.heappop(self._timers)
+            if timer.cancelled:
+                continue
+            try:
+                timer.callback()
+            except Exception:
+                logging.exception("game loop timer %s failed", timer.callback)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stopped.is_set():
+            self.tick()
+
+            next_tick += self.tick_interval / 1000
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # overrun, don't try to catch up with a burst of ticks
+                next_tick = time.monotonic()
+                continue
+            self._stopped.wait(delay)
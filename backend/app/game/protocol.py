@@ -0,0 +1,269 @@
+import json
+import struct
+import uuid
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+from app.game.catalog import AirportCatalog
+from app.game.core.airport import Airport
+from app.game.event_factory import EventFactory
+from app.game.events import Event, EventType, dict_to_event
+from app.game.exceptions import InvalidEventFormat
+from app.tools.websocket_server import Frame, WebSocketSession
+
+
+# subprotocols a client can offer next to its token, e.g. new WebSocket(url, [token, "binary_positions.v1"])
+BINARY_POSITIONS = "binary_positions.v1"
+BATCHED_EVENTS = "batched_events.v1"
+DELTA_UPDATES = "delta_updates.v1"
+AIRPORT_CATALOG = "airport_catalog.v1"
+REFUELING_EVENTS = "refueling_events.v1"
+
+PROTOCOL_FEATURES = [
+    BINARY_POSITIONS,
+    BATCHED_EVENTS,
+    DELTA_UPDATES,
+    AIRPORT_CATALOG,
+    REFUELING_EVENTS,
+]
+
+
+class PlayerIndex:
+    """
+    small per session numbers standing in for player ids in binary messages
+    """
+
+    def __init__(self):
+        self._indexes: Dict[uuid.UUID, int] = {}
+        self._released: List[int] = []
+
+    def get_or_assign(self, player_id: uuid.UUID) -> Tuple[int, bool]:
+        index = self._indexes.get(player_id)
+        if index is not None:
+            return index, False
+
+        if self._released:
+            index = self._released.pop()
+        else:
+            index = len(self._indexes)
+        self._indexes[player_id] = index
+        return index, True
+
+    def release(self, player_id: uuid.UUID):
+        index = self._indexes.pop(player_id, None)
+        if index is not None:
+            self._released.append(index)
+
+
+class BinaryProtocol:
+    """
+    fixed layout little-endian records used instead of json for the most frequent messages
+
+    server -> client, player_position.updated:
+        u8 message type, u16 player index, u64 created, u8 is_grounded, f64 latitude, f64 longitude,
+        f64 bearing, u32 velocity, f32 tank_level, u32 fuel_consumption, u64 timestamp
+
+    client -> server, player_position.update_request:
+        u8 message type, u64 created, f64 bearing, u32 velocity, u64 timestamp
+    """
+
+    PLAYER_POSITION_UPDATED = 1
+    PLAYER_POSITION_UPDATE_REQUEST = 2
+
+    _header = struct.Struct("<BH")
+    _player_position = struct.Struct("<Q?dddIfIQ")
+    _player_position_update_request = struct.Struct("<BQdIQ")
+
+    @staticmethod
+    def player_position_updated_body(event: Event) -> bytes:
+        """
+        everything but the header, so that it can be encoded once and shared between the sessions
+        """
+        position = event.data["position"]
+        coordinates = position["coordinates"]
+        return BinaryProtocol._player_position.pack(
+            event.created,
+            event.data["is_grounded"],
+            coordinates["lat"],
+            coordinates["lon"],
+            position["bearing"],
+            int(position["velocity"]),
+            position["tank_level"],
+            position["fuel_consumption"],
+            position["timestamp"],
+        )
+
+    @staticmethod
+    def player_position_updated(index: int, body: bytes) -> bytes:
+        return BinaryProtocol._header.pack(BinaryProtocol.PLAYER_POSITION_UPDATED, index) + body
+
+    @staticmethod
+    def player_position_update_request(created: int, bearing: float, velocity: int, timestamp: int) -> bytes:
+        return BinaryProtocol._player_position_update_request.pack(
+            BinaryProtocol.PLAYER_POSITION_UPDATE_REQUEST,
+            created,
+            bearing,
+            velocity,
+            timestamp,
+        )
+
+    @staticmethod
+    def bytes_to_event(message: bytes) -> Event:
+        try:
+            message_type, created, bearing, velocity, timestamp = BinaryProtocol._player_position_update_request.unpack(
+                message
+            )
+        except struct.error as e:
+            raise InvalidEventFormat from e
+
+        if message_type != BinaryProtocol.PLAYER_POSITION_UPDATE_REQUEST or created <= 0:
+            raise InvalidEventFormat
+
+        return Event(
+            type=EventType.PLAYER_POSITION_UPDATE_REQUEST,
+            data={
+                "bearing": bearing,
+                "velocity": velocity,
+                "timestamp": timestamp,
+            },
+            created=created,
+        )
+
+
+class EventFrames:
+    """
+    lazily encoded representations of one event, shared by all of its recipients
+    """
+
+    def __init__(
+        self,
+        event: Event,
+        airport_catalog: Optional[AirportCatalog] = None,
+        refueling_progress: bool = False,
+    ):
+        self.event = event
+        self.airport_catalog = airport_catalog
+        self.refueling_progress = refueling_progress  # for the sessions without airport.refueling_started only
+        self._json: Optional[Frame] = None
+        self._catalog_json: Optional[Frame] = None
+        self._player_position_body: Optional[bytes] = None
+
+    @property
+    def coalesce_key(self) -> Optional[Hashable]:
+        # only the latest position (or flight plan) of a player is worth sending to a client that fell behind
+        if self.event.type in (EventType.PLAYER_POSITION_UPDATED, EventType.PLAYER_FLIGHT_PLAN):
+            return self.event.type, self.event.data["id"]
+        return None
+
+    @property
+    def json(self) -> Frame:
+        if self._json is None:
+            self._json = Frame.from_data(self.event.serialized, coalesce_key=self.coalesce_key, batchable=True)
+        return self._json
+
+    @property
+    def catalog_json(self) -> Frame:
+        """
+        for the clients that take the static airport data from the catalog
+        """
+        if self._catalog_json is not None:
+            return self._catalog_json
+
+        event = self.event
+        if event.type == EventType.AIRPORT_LIST:
+            data = {
+                "airports": [Airport.without_static_fields(airport) for airport in event.data["airports"]],
+                "catalog": self.airport_catalog.serialized,
+            }
+        elif event.type == EventType.AIRPORT_UPDATED and not event.data.get("delta"):
+            data = Airport.without_static_fields(event.data)
+        else:
+            return self.json
+
+        self._catalog_json = Frame.from_data(
+            Event(type=event.type, data=data, created=event.created).serialized,
+            batchable=True,
+        )
+        return self._catalog_json
+
+    @property
+    def player_position_body(self) -> bytes:
+        if self._player_position_body is None:
+            self._player_position_body = BinaryProtocol.player_position_updated_body(self.event)
+        return self._player_position_body
+
+
+def is_delivered(session: WebSocketSession, frames: EventFrames) -> bool:
+    """
+    the refuelings are followed either by airport.refueling_started or by player.updated on every progress step
+    """
+    if session.refueling_events:
+        return not frames.refueling_progress
+    return frames.event.type != EventType.AIRPORT_REFUELING_STARTED
+
+
+def deliver_event_frames(session: WebSocketSession, frames: EventFrames):
+    """
+    sends the event in the representation the session negotiated
+    """
+    if not is_delivered(session, frames):
+        return
+    event = frames.event
+    if event.type == EventType.PLAYER_REMOVED:
+        if session.player_index is not None:
+            session.player_index.release(event.data["id"])
+        if session.entity_versions is not None:
+            session.entity_versions.pop(event.data["id"], None)
+
+    if session.player_index is not None and event.type == EventType.PLAYER_POSITION_UPDATED:
+        player_id = event.data["id"]
+        index, assigned = session.player_index.get_or_assign(player_id)
+        if assigned:
+            index_event = EventFactory.player_index_assigned_event(player_id=player_id, index=index)
+            session.send_frame(Frame.from_data(index_event.serialized, batchable=True))
+        session.send_frame(
+            Frame(
+                payload=BinaryProtocol.player_position_updated(index, frames.player_position_body),
+                coalesce_key=frames.coalesce_key,
+            )
+        )
+        return
+
+    if session.airport_catalog:
+        session.send_frame(frames.catalog_json)
+        return
+    session.send_frame(frames.json)
+
+
+def deliver_versioned_event_frames(
+    sessions: List[WebSocketSession],
+    entity_id: Hashable,
+    version: int,
+    full: EventFrames,
+    delta: Optional[EventFrames],
+):
+    for session in sessions:
+        if not is_delivered(session, full):
+            continue
+        known_versions = session.entity_versions
+        if known_versions is None:
+            deliver_event_frames(session=session, frames=full)
+            continue
+        # a session that missed the previous version gets the full state instead
+        if delta is not None and known_versions.get(entity_id) == version - 1:
+            deliver_event_frames(session=session, frames=delta)
+        else:
+            deliver_event_frames(session=session, frames=full)
+        known_versions[entity_id] = version
+
+
+def message_to_event(message: Union[str, bytes]) -> Event:
+    """
+    parses a client message, json or binary, raises InvalidEventFormat
+    """
+    if isinstance(message, bytes):
+        return BinaryProtocol.bytes_to_event(message)
+    try:
+        data = json.loads(message)
+    except json.JSONDecodeError as e:
+        raise InvalidEventFormat(e)
+    return dict_to_event(data=data)
@@ -0,0 +1,111 @@
+import collections
+import random
+import uuid
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from app.game.core.bot import Bot
+from app.game.core.player import Player
+from app.tools.websocket_server import WebSocketSession
+
+
+class PlayerRegistry:
+    """
+    the players, sessions and bots of a game with the indexes of the lookups made on every join and connection
+    (token, session, free colors and bot names), kept in sync by adding and removing everything through it
+
+    the dicts are shared with the game for reading, they must not be modified directly
+    """
+
+    def __init__(self, colors: Sequence[str], bot_names: Sequence[str]):
+        self.players: Dict[uuid.UUID, Player] = {}
+        self.sessions: Dict[uuid.UUID, Tuple[WebSocketSession, Player]] = {}  # session id -> (session, player)
+        self.bots: Dict[uuid.UUID, Bot] = {}  # player id -> Bot, the oldest first
+        self._tokens: Dict[str, Player] = {}
+        self._player_tokens: Set[str] = set()  # of the players that aren't bots
+        self._colors = list(dict.fromkeys(colors))
+        self._bot_names = list(dict.fromkeys(bot_names))
+        self._used_colors = collections.Counter()
+        self._used_bot_names = collections.Counter()
+
+    def __len__(self):
+        return len(self.players)
+
+    def add(self, player: Player):
+        self.players[player.id] = player
+        self._tokens[player.token] = player
+        if not player.is_bot:
+            self._player_tokens.add(player.token)
+        self._used_colors[player.color] += 1
+
+    def remove(self, player: Player) -> bool:
+        """
+        returns False when the player has been removed already
+        """
+        if player.id not in self.players:
+            return False
+        self.remove_bot(player.id)
+        del self.players[player.id]
+        if self._tokens.get(player.token) is player:
+            del self._tokens[player.token]
+            self._player_tokens.discard(player.token)
+        self._release(self._used_colors, player.color)
+        if player.session_id is not None:
+            self.sessions.pop(player.session_id, None)
+        return True
+
+    def by_token(self, token: str) -> Optional[Player]:
+        return self._tokens.get(token)
+
+    def player_tokens(self) -> Set[str]:
+        return set(self._player_tokens)
+
+    def real_players_count(self) -> int:
+        return len(self.players) - len(self.bots)
+
+    def connect(self, player: Player, ws_session: WebSocketSession):
+        self.sessions[ws_session.id] = (ws_session, player)
+        player.session_id = ws_session.id
+
+    def disconnect(self, ws_session: WebSocketSession) -> Optional[Player]:
+        _, player = self.sessions.pop(ws_session.id, (None, None))
+        if player is not None and player.session_id == ws_session.id:
+            player.session_id = None
+        return player
+
+    def add_bot(self, bot: Bot):
+        self.bots[bot.player_id] = bot
+        self._used_bot_names[self.players[bot.player_id].nickname] += 1
+
+    def remove_bot(self, player_id: uuid.UUID) -> Optional[Bot]:
+        """
+        the player stays in the game till it's removed
+        """
+        bot = self.bots.pop(player_id, None)
+        if bot is not None:
+            self._release(self._used_bot_names, self.players[player_id].nickname)
+        return bot
+
+    def oldest_bot(self) -> Optional[Bot]:
+        return next(iter(self.bots.values()), None)
+
+    def free_color(self) -> str:
+        # colors repeat only with more players than colors
+        return self._pick(self._colors, self._used_colors)
+
+    def free_bot_name(self) -> str:
+        return self._pick(self._bot_names, self._used_bot_names)
+
+    @staticmethod
+    def _pick(values: List[str], used: collections.Counter) -> str:
+        """
+        a random value not in use, the number of values is fixed so it doesn't depend on the number of players
+        """
+        free = [value for value in values if not used[value]]
+        return random.choice(free or values)
+
+    @staticmethod
+    def _release(used: collections.Counter, value: str):
+        if used[value] > 1:
+            used[value] -= 1
+        else:
+            used.pop(value, None)
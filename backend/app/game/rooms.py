@@ -0,0 +1,410 @@
+import base64
+import dataclasses
+import functools
+import itertools
+import logging
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.game.backplane import RedisBackplane, RemoteWebSocketSession, RoomChannel, RoomRelay
+from app.game.config import GameConfig
+from app.game.core.game import GameSession
+from app.game.core.player import Player
+from app.game.exceptions import (
+    DuplicatedGameSession,
+    InvalidEventFormat,
+    PlayerAlreadyConnected,
+    PlayerLimitExceeded,
+    PlayerNotFound,
+)
+from app.game.loop import GameLoop
+from app.game.persistence.base import BasePersistentStorage
+from app.game.protocol import message_to_event
+from app.tools.misc import synchronized
+from app.tools.timestamp import timestamp_now
+from app.tools.websocket_server import WebSocketSession
+
+
+class RoomManager:
+    """
+    hosts many games (rooms) side by side, players join the fullest room with a free slot and a new room is created
+    when all of them are full, rooms left without players are removed after `ROOM_IDLE_TIME`
+
+    all the rooms are run by one game loop, every game system is a single loop system going through the rooms,
+    so the rooms share the loop's thread and lock
+
+    with a backplane the workers share the rooms, a player joins a room owned by the worker handling the join
+    and its websocket can be connected to any worker (see RedisBackplane)
+    """
+
+    MAX_ROOMS = 250
+    MIN_ROOMS = 1  # kept even without players
+    ROOM_IDLE_TIME = 60_000  # milliseconds without players before the room is removed
+
+    def __init__(
+        self,
+        storage: BasePersistentStorage,
+        config: Optional[GameConfig] = None,
+        backplane: Optional[RedisBackplane] = None,
+    ):
+        self._storage = storage
+        self.config = config or GameConfig()
+        self.backplane = backplane
+        self.loop = GameLoop(tick_rate=self.config.TICK_RATE)
+        self.lock = self.loop.lock
+        self._rooms: Dict[int, GameSession] = {}
+        self._rooms_ids = itertools.count(1)
+        self._rooms_by_token: Dict[str, int] = {}
+        self._empty_since: Dict[int, int] = {}  # room id -> timestamp
+        self._relays: Dict[int, RoomRelay] = {}  # rooms owned by other workers with sessions connected to this one
+        self._relays_lock = threading.Lock()
+        self.removed = 0
+
+        for _ in range(self.MIN_ROOMS):
+            self.create_room()
+
+        for name, method, interval in GameSession.SYSTEMS:
+            self.loop.add_system(name, functools.partial(self._run_rooms, method), interval=interval)
+        self.loop.add_system("rooms", self.remove_empty_rooms, interval=1000)
+        if backplane is not None:
+            backplane.keep_ownership(rooms=lambda: list(self._rooms), on_lost=self.drop_room)
+        self.loop.start()
+
+    @property
+    def airport_catalog(self):
+        # the airports are the same in every room
+        return next(iter(self._rooms.values())).airport_catalog
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "rooms": [
+                {
+                    "id": room_id,
+                    "players": room.real_players_count(),
+                    "bots": room.bot_players_count(),
+                    "sessions": len(room.websocket_sessions()),
+                }
+                for room_id, room in list(self._rooms.items())
+            ],
+            "removed": self.removed,
+            "relays": [{"id": room_id, "sessions": len(relay)} for room_id, relay in list(self._relays.items())],
+            "backplane": self.backplane.stats if self.backplane else None,
+        }
+
+    def create_room(self, config: Optional[GameConfig] = None) -> int:
+        """
+        the room id is taken from redis before the game lock is acquired
+        """
+        channel = None
+        if self.backplane is None:
+            room_id = next(self._rooms_ids)
+        else:
+            room_id = self.backplane.next_room_id()
+            while not self.backplane.acquire(room_id):
+                room_id = self.backplane.next_room_id()
+            channel = RoomChannel(self.backplane, room_id)
+        room = GameSession(
+            storage=self._storage,
+            config=config or dataclasses.replace(self.config),
+            loop=self.loop,
+            channel=channel,
+        )
+        with self.lock:
+            self._rooms[room_id] = room
+        if self.backplane is not None:
+            self.backplane.subscribe(
+                RedisBackplane.inbox_channel(room_id),
+                functools.partial(self._handle_inbox, room_id),
+            )
+        logging.info("room %s created", room_id)
+        return room_id
+
+    def add_player(self, nickname: str, token: str) -> Tuple[int, Player]:
+        """
+        returns the id of the room the player joined, the redis round trips are made outside the game lock
+        """
+        try:
+            self.get_remote_player(token)
+            raise DuplicatedGameSession  # in a room of another worker
+        except PlayerNotFound:
+            pass
+
+        while True:
+            joined = self._join_room(nickname=nickname, token=token)
+            if joined is not None:
+                break
+            self.create_room()
+
+        room_id, player = joined
+        if self.backplane is not None:
+            self.backplane.register_player(token=token, room_id=room_id, player_id=player.id)
+        return room_id, player
+
+    @synchronized
+    def _join_room(self, nickname: str, token: str) -> Optional[Tuple[int, Player]]:
+        """
+        None when all the rooms are full
+        """
+        try:
+            self.get_room_by_token(token).get_player_by_token(token)
+            raise DuplicatedGameSession
+        except PlayerNotFound:
+            pass
+
+        rooms = sorted(
+            (
+                (room_id, room)
+                for room_id, room in self._rooms.items()
+                if room.real_players_count() < room.config.MAX_PLAYERS
+            ),
+            key=lambda item: item[1].real_players_count(),
+            reverse=True,
+        )
+        for room_id, room in rooms:
+            try:
+                player = room.add_player(nickname=nickname, token=token)
+                break
+            except PlayerLimitExceeded:
+                continue
+        else:
+            if len(self._rooms) >= self.MAX_ROOMS:
+                raise PlayerLimitExceeded
+            return None
+
+        self._rooms_by_token[token] = room_id
+        self._empty_since.pop(room_id, None)
+        return room_id, player
+
+    def get_room_by_token(self, token: str) -> GameSession:
+        room = self._rooms.get(self._rooms_by_token.get(token))
+        if room is None:
+            raise PlayerNotFound
+        return room
+
+    def get_remote_player(self, token: str) -> Tuple[int, str]:
+        """
+        room id and player id of a player in a room owned by another worker
+        """
+        if self.backplane is None:
+            raise PlayerNotFound
+        found = self.backplane.player_room(token)
+        if found is None or found[0] in self._rooms or self.backplane.owner(found[0]) is None:
+            raise PlayerNotFound
+        return found
+
+    def connect_remote(self, room_id: int, ws_session: WebSocketSession):
+        with self._relays_lock:
+            relay = self._relays.get(room_id)
+            if relay is None:
+                relay = self._relays[room_id] = RoomRelay(room_id=room_id, airport_catalog=self.airport_catalog)
+                self.backplane.subscribe(
+                    RedisBackplane.room_channel(room_id),
+                    relay.handle,
+                    on_subscribed=functools.partial(self._relay_subscribed, relay),
+                )
+            relay.add_session(ws_session)
+            # the owner sends the game state as soon as it gets the connect
+            self._send_inbox(
+                relay,
+                {
+                    "type": "connect",
+                    "session": ws_session.id,
+                    "token": ws_session.token,
+                    "refueling_events": ws_session.refueling_events,
+                },
+            )
+
+    def disconnect_remote(self, room_id: int, ws_session: WebSocketSession):
+        with self._relays_lock:
+            relay = self._relays.get(room_id)
+            if relay is None:
+                self.backplane.publish(
+                    RedisBackplane.inbox_channel(room_id),
+                    {"type": "disconnect", "session": ws_session.id},
+                )
+                return
+            if relay.subscribed:
+                self._send_inbox(relay, {"type": "disconnect", "session": ws_session.id})
+            else:  # the owner hasn't heard of the session yet
+                relay.pending = [message for message in relay.pending if message["session"] != ws_session.id]
+            relay.remove_session(ws_session)
+            if not len(relay):
+                del self._relays[room_id]
+                self.backplane.unsubscribe(RedisBackplane.room_channel(room_id))
+
+    def forward_message(self, room_id: int, ws_session: WebSocketSession, message: Union[str, bytes]):
+        forwarded = {"type": "message", "session": ws_session.id}
+        if isinstance(message, bytes):
+            forwarded["binary"] = base64.b64encode(message).decode()
+        else:
+            forwarded["text"] = message
+        with self._relays_lock:
+            relay = self._relays.get(room_id)
+            if relay is not None:
+                self._send_inbox(relay, forwarded)
+
+    def _send_inbox(self, relay: RoomRelay, message: dict):
+        """
+        the messages of the sessions wait till the room channel is subscribed, so that none of the owner's
+        answers is missed, called under the relays lock to keep their order
+        """
+        if relay.subscribed:
+            self.backplane.publish(RedisBackplane.inbox_channel(relay.room_id), message)
+        else:
+            relay.pending.append(message)
+
+    def _relay_subscribed(self, relay: RoomRelay):
+        """
+        run by the backplane thread
+        """
+        with self._relays_lock:
+            relay.subscribed = True
+            for message in relay.pending:
+                self.backplane.publish(RedisBackplane.inbox_channel(relay.room_id), message)
+            relay.pending = []
+
+    def exit_player(self, token: str):
+        try:
+            self.get_room_by_token(token).exit_player(token=token)
+            return
+        except PlayerNotFound:
+            pass
+        try:
+            room_id, _ = self.get_remote_player(token)
+        except PlayerNotFound:
+            return
+        # the owner of the room exits the player, like it handles the messages of the remote sessions
+        self.backplane.publish(RedisBackplane.inbox_channel(room_id), {"type": "exit", "token": token})
+
+    def websocket_sessions(self) -> List[WebSocketSession]:
+        """
+        the sessions connected to this worker
+        """
+        local = [
+            ws_session
+            for room in list(self._rooms.values())
+            for ws_session in room.websocket_sessions()
+            if not isinstance(ws_session, RemoteWebSocketSession)
+        ]
+        return local + [ws_session for relay in list(self._relays.values()) for ws_session in relay.sessions()]
+
+    def sessions_stats(self) -> List[dict]:
+        return [
+            {"room": room_id, **session_stats}
+            for room_id, room in list(self._rooms.items())
+            for session_stats in room.sessions_stats()
+        ]
+
+    def position_updates_stats(self) -> dict:
+        stats = {}
+        for room in list(self._rooms.values()):
+            for key, value in room.position_updates_stats().items():
+                stats[key] = stats.get(key, 0) + value
+        return stats
+
+    def remove_empty_rooms(self):
+        now = timestamp_now()
+        for room_id, room in list(self._rooms.items()):
+            if room.real_players_count() or room.websocket_sessions():
+                self._empty_since.pop(room_id, None)
+                continue
+            empty_since = self._empty_since.setdefault(room_id, now)
+            if now - empty_since < self.ROOM_IDLE_TIME or len(self._rooms) <= self.MIN_ROOMS:
+                continue
+
+            self._remove_room(room_id)
+            self.removed += 1
+            logging.info("room %s removed", room_id)
+
+        # forget the players that left
+        tokens = {room_id: room.player_tokens() for room_id, room in self._rooms.items()}
+        left = [token for token, room_id in self._rooms_by_token.items() if token not in tokens.get(room_id, ())]
+        for token in left:
+            room_id = self._rooms_by_token.pop(token)
+            if self.backplane is not None:
+                self.backplane.forget_player(token=token, room_id=room_id)
+
+    @synchronized
+    def drop_room(self, room_id: int):
+        """
+        another worker may run the room now, this one must not touch the game anymore,
+        called by the backplane when the ownership couldn't be renewed
+        """
+        if room_id not in self._rooms:  # removed meanwhile
+            return
+        logging.error("room %s not owned anymore, dropping it", room_id)
+        for ws_session in self._rooms[room_id].websocket_sessions():
+            ws_session.close_connection(code=1011, reason="room moved")
+        self._remove_room(room_id)
+
+    def shutdown(self):
+        self.loop.stop()
+        for room_id, room in list(self._rooms.items()):
+            room.shutdown()
+            if self.backplane is not None:
+                self.backplane.release(room_id)
+        if self.backplane is not None:
+            self.backplane.stop()
+
+    def _remove_room(self, room_id: int):
+        room = self._rooms.pop(room_id)
+        room.close()
+        self._empty_since.pop(room_id, None)
+        if self.backplane is not None:
+            self.backplane.unsubscribe(RedisBackplane.inbox_channel(room_id))
+            self.backplane.release(room_id)
+
+    @synchronized
+    def _handle_inbox(self, room_id: int, message: dict):
+        """
+        the sessions of the room connected to other workers, run by the backplane thread
+        """
+        room = self._rooms.get(room_id)
+        if room is None:
+            return
+        if message["type"] == "exit":
+            room.exit_player(token=message["token"])
+            return
+        session_id = uuid.UUID(message["session"])
+
+        if message["type"] == "connect":
+            ws_session = RemoteWebSocketSession(
+                session_id=session_id,
+                player_id=None,
+                channel=room.channel,
+                refueling_events=message["refueling_events"],
+            )
+            try:
+                player = room.get_player_by_token(message["token"])
+                ws_session.player_id = player.id
+                room.add_session(player=player, ws_session=ws_session)
+            except (PlayerNotFound, PlayerAlreadyConnected):
+                ws_session.close_connection(code=1008)
+            return
+
+        ws_session = room.get_session(session_id)
+        if ws_session is None:
+            return
+        if message["type"] == "disconnect":
+            try:
+                room.remove_session(ws_session=ws_session)
+            except PlayerNotFound:
+                pass
+        elif message["type"] == "message":
+            try:
+                event = message_to_event(
+                    base64.b64decode(message["binary"]) if "binary" in message else message["text"]
+                )
+            except InvalidEventFormat as e:
+                logging.error("Invalid event format: %s", e)
+                return
+            room.handle_event(room.get_player(player_id=ws_session.player_id), event)
+
+    def _run_rooms(self, method: str):
+        for room_id, room in list(self._rooms.items()):
+            try:
+                getattr(room, method)()
+            except Exception:
+                logging.exception("room %s %s failed", room_id, method)
@@ -0,0 +1,83 @@
+import bisect
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from app.game.core.airport import Airport
+from app.game.core.coordinates import Coordinates
+
+
+class RouteTable:
+    """
+    distances (km) and initial bearings between every two airports, computed once, the airports never move
+
+    only the ids and coordinates of the airports are kept, so one table serves every room (see `shared`)
+    """
+
+    _shared: Dict[str, "RouteTable"] = {}  # catalog version -> table
+    _shared_lock = threading.Lock()
+
+    def __init__(self, airports: List[Airport]):
+        self._ids: List[uuid.UUID] = [airport.id for airport in airports]
+        self._index: Dict[uuid.UUID, int] = {airport_id: index for index, airport_id in enumerate(self._ids)}
+        self._coordinates: List[Coordinates] = [airport.coordinates for airport in airports]
+        self._distances: List[List[float]] = [
+            [Coordinates.distance_between(origin, destination) for destination in self._coordinates]
+            for origin in self._coordinates
+        ]
+        self._bearings: List[List[float]] = [
+            [Coordinates.bearing_between(origin, destination) for destination in self._coordinates]
+            for origin in self._coordinates
+        ]
+        # the other airports of every airport by distance: (distances, ids)
+        self._neighbours: List[Tuple[List[float], List[uuid.UUID]]] = []
+        for origin, row in enumerate(self._distances):
+            neighbours = sorted((distance, index) for index, distance in enumerate(row) if index != origin)
+            self._neighbours.append(
+                ([distance for distance, _ in neighbours], [self._ids[index] for _, index in neighbours])
+            )
+
+    @classmethod
+    def shared(cls, version: str, airports: List[Airport]) -> "RouteTable":
+        """
+        the table of the airports with the given catalog version, built by the first room
+        """
+        with cls._shared_lock:
+            table = cls._shared.get(version)
+            if table is None:
+                table = cls._shared[version] = cls(airports)
+            return table
+
+    def __len__(self):
+        return len(self._ids)
+
+    def distance(self, origin_id: uuid.UUID, destination_id: uuid.UUID) -> float:
+        return self._distances[self._index[origin_id]][self._index[destination_id]]
+
+    def bearing(self, origin_id: uuid.UUID, destination_id: uuid.UUID) -> float:
+        """
+        initial bearing of the great circle from the origin to the destination
+        """
+        return self._bearings[self._index[origin_id]][self._index[destination_id]]
+
+    def destinations(self, origin_id: uuid.UUID) -> List[uuid.UUID]:
+        """
+        the other airports, the nearest first
+        """
+        return list(self._neighbours[self._index[origin_id]][1])
+
+    def within(self, origin_id: uuid.UUID, radius: float) -> List[uuid.UUID]:
+        """
+        the other airports at most `radius` km away, the nearest first
+        """
+        distances, ids = self._neighbours[self._index[origin_id]]
+        return ids[: bisect.bisect_right(distances, radius)]
+
+    def nearest(self, coordinates: Coordinates) -> Optional[uuid.UUID]:
+        """
+        the airport nearest to any point, e.g. a flying plane
+        """
+        if not self._ids:
+            return None
+        distances = [Coordinates.distance_between(coordinates, airport) for airport in self._coordinates]
+        return self._ids[min(range(len(distances)), key=distances.__getitem__)]
@@ -0,0 +1,96 @@
+import collections
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Hashable, Set, Tuple
+
+
+class MailboxFull(Exception):
+    pass
+
+
+class SessionDispatcher:
+    """
+    runs the callbacks of one session in order, on a bounded pool of worker threads shared by all the sessions,
+    so different sessions are processed in parallel
+
+    a mailbox exists only while it has callbacks to run, nothing is left behind after a session is gone
+    """
+
+    def __init__(self, max_workers: int = 8, mailbox_size: int = 256, max_batch: int = 32):
+        self.max_workers = max_workers
+        self.mailbox_size = mailbox_size
+        self.max_batch = max_batch  # callbacks run in a row before the worker is handed over to other sessions
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="session-dispatcher")
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._mailboxes: Dict[Hashable, Deque[Tuple[Callable, tuple]]] = {}
+        self._scheduled: Set[Hashable] = set()  # sessions with a drain submitted to the executor
+        self._stats = {
+            "processed": 0,
+            "failed": 0,
+            "rejected": 0,
+        }
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "workers": self.max_workers,
+                "mailboxes": len(self._mailboxes),
+                "queued": sum(len(mailbox) for mailbox in self._mailboxes.values()),
+            }
+
+    def submit(self, session_id: Hashable, callback: Callable, *args, bounded: bool = True):
+        """
+        raises MailboxFull when the session has `mailbox_size` callbacks waiting already,
+        unbounded submits (like the disconnect handling) are always accepted
+        """
+        with self._lock:
+            mailbox = self._mailboxes.get(session_id)
+            if mailbox is None:
+                mailbox = self._mailboxes[session_id] = collections.deque()
+            elif bounded and len(mailbox) >= self.mailbox_size:
+                self._stats["rejected"] += 1
+                raise MailboxFull
+            mailbox.append((callback, args))
+
+            if session_id in self._scheduled:
+                return
+            self._scheduled.add(session_id)
+        self._executor.submit(self._drain, session_id)
+
+    def wait_idle(self, timeout: float) -> bool:
+        """
+        waits till all the mailboxes are empty, returns False if they aren't after `timeout` seconds
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._mailboxes, timeout=timeout)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _drain(self, session_id: Hashable):
+        for _ in range(self.max_batch):
+            with self._lock:
+                mailbox = self._mailboxes[session_id]
+                if not mailbox:
+                    del self._mailboxes[session_id]
+                    self._scheduled.discard(session_id)
+                    if not self._mailboxes:
+                        self._idle.notify_all()
+                    return
+                callback, args = mailbox.popleft()
+
+            try:
+                callback(*args)
+                succeeded = True
+            except Exception:
+                logging.exception("session %s callback %s failed", session_id, callback)
+                succeeded = False
+            with self._lock:
+                self._stats["processed" if succeeded else "failed"] += 1
+
+        # still scheduled, the rest of the mailbox waits behind the other sessions' work
+        self._executor.submit(self._drain, session_id)
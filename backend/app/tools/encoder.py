@@ -1,5 +1,6 @@
-import json
 import datetime
+import enum
+import json
 from uuid import UUID
 
 
@@ -9,8 +10,21 @@ class JSONEncoder(json.JSONEncoder):
             return str(obj)
         if isinstance(obj, datetime.datetime):
             return obj.timestamp()
+        if isinstance(obj, enum.Enum):
+            return obj.value
         return json.JSONEncoder.default(self, obj)
 
 
-def encode(data: dict) -> dict:
-    return json.loads(json.dumps(data, cls=JSONEncoder))
+# shared instance, str based enums (like DeathCause) are written by the C encoder without calling default()
+_encoder = JSONEncoder(separators=(",", ":"), ensure_ascii=False, check_circular=False)
+
+
+def encode_json(data) -> str:
+    """
+    serializes data straight to the wire format in a single pass
+    """
+    return _encoder.encode(data)
+
+
+def encode_json_bytes(data) -> bytes:
+    return encode_json(data).encode("utf-8")
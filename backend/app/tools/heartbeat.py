@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.tools.websocket_server import WebSocketSession
+
+
+class HeartbeatService:
+    """
+    pings all the registered sessions from a single task in the event loop,
+    the sessions that sent nothing within `max_pong_awaiting_time` after the ping are closed together
+
+    the pings skip the outbound queue of the session (see WebSocketSession.send_control), so the round trip time
+    doesn't include the queued game events and a client that is behind on them isn't taken for a dead one
+
+    clients answer the "ping" text message with "pong", dead TCP connections are detected by the server's
+    protocol level pings as well (see ws_ping_interval in run.py)
+    """
+
+    def __init__(self, ping_interval: int, max_pong_awaiting_time: int):
+        if max_pong_awaiting_time > ping_interval:
+            raise ValueError
+        self.ping_interval = ping_interval  # in milliseconds
+        self.max_pong_awaiting_time = max_pong_awaiting_time  # in milliseconds
+        self._sessions: Dict[uuid.UUID, "WebSocketSession"] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.closed = 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "closed": self.closed,
+        }
+
+    def register(self, session: "WebSocketSession"):
+        """
+        has to be called from the event loop
+        """
+        self._sessions[session.id] = session
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unregister(self, session: "WebSocketSession"):
+        self._sessions.pop(session.id, None)
+
+    def stop(self):
+        """
+        forgets all the sessions and cancels the task, the next register starts it again
+        """
+        self._sessions.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def pong(self, session: "WebSocketSession"):
+        session.last_seen = time.monotonic() * 1000
+        if session.last_ping:
+            session.rtt = session.last_seen - session.last_ping
+
+    @staticmethod
+    def received(session: "WebSocketSession"):
+        session.last_seen = time.monotonic() * 1000
+
+    async def _run(self):
+        while self._sessions:
+            pinged = list(self._sessions.values())
+            now = time.monotonic() * 1000
+            for session in pinged:
+                session.last_ping = now
+                session.send_control("ping")
+
+            await asyncio.sleep(self.max_pong_awaiting_time / 1000)
+            dead = [
+                session
+                for session in pinged
+                if session.id in self._sessions and session.last_seen < session.last_ping
+            ]
+            if dead:
+                logging.warning("heartbeat broken, closing %s connections", len(dead))
+            for session in dead:
+                self.unregister(session)
+                session.close_connection(code=1001)
+            self.closed += len(dead)
+
+            await asyncio.sleep((self.ping_interval - self.max_pong_awaiting_time) / 1000)
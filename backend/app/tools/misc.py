@@ -1,3 +1,4 @@
+import functools
 import random
 
 
@@ -5,3 +6,16 @@ def random_with_probability(probability: float):
     if probability < 0 or probability > 1:
         raise RuntimeError
     return random.random() < probability
+
+
+def synchronized(method):
+    """
+    runs the method holding the `lock` of its object
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
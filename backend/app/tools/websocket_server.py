@@ -1,30 +1,109 @@
 import asyncio
+import collections
+import dataclasses
+import enum
+import logging
 import threading
-import time
 import uuid
+from typing import Hashable, List, Optional, Union
+
 from fastapi import WebSocket, WebSocketDisconnect
 from starlette.websockets import WebSocketState
 
-from app.tools.thread_manager import ThreadManager
-from app.tools.timestamp import timestamp_now
+from app.tools.dispatcher import MailboxFull, SessionDispatcher
+from app.tools.encoder import encode_json
+from app.tools.heartbeat import HeartbeatService
+
+
+@dataclasses.dataclass(frozen=True)
+class Frame:
+    """
+    ready to send websocket message, encoded once and shared between all the recipients
+    """
+    payload: Union[str, bytes]
+    coalesce_key: Optional[Hashable] = None  # queued frame gets replaced by a newer one with the same key
+    batchable: bool = False  # json that can be sent as an element of a batch array
+
+    @classmethod
+    def from_data(cls, data: dict, coalesce_key: Optional[Hashable] = None, batchable: bool = False) -> "Frame":
+        return cls(payload=encode_json(data), coalesce_key=coalesce_key, batchable=batchable)
+
+
+class SlowConsumerPolicy(str, enum.Enum):
+    # a queued frame is replaced by a newer one with the same key (see Frame.coalesce_key), so a client falling
+    # behind gets the latest positions only, it's disconnected when the queue fills up anyway
+    DEGRADE = "degrade"
+    # every frame is queued, the client is disconnected when the queue fills up
+    DISCONNECT = "disconnect"
 
 
 class WebSocketSession:
+    """
+    frames are put on a bounded outbound queue (from any thread) and written to the socket
+    in order by a single writer coroutine running in the event loop
+    """
+
     _connection: WebSocket
     _is_closed: bool
     id: uuid.UUID
     token: str
     player_id: uuid.UUID
 
-    def __init__(self, websocket, loop: asyncio.AbstractEventLoop):
+    def __init__(
+        self,
+        websocket,
+        loop: asyncio.AbstractEventLoop,
+        max_queue_size: int = 512,
+        slow_consumer_policy: SlowConsumerPolicy = SlowConsumerPolicy.DEGRADE,
+    ):
         self.id = uuid.uuid4()
         self._connection = websocket
         self._loop = loop
         self._is_closed = False
+        self.player_index = None  # set when the client negotiated binary position messages
+        self.batch_interval = 0  # in milliseconds, batchable frames queued within it are sent as one json array
+        self.entity_versions = None  # set when the client negotiated delta updates, entity id -> last sent version
+        self.airport_catalog = False  # set when the client takes the static airport data from the catalog
+        self.refueling_events = False  # set when the client derives the refuelings from airport.refueling_started
+        self.last_ping = 0.0  # monotonic milliseconds, kept by HeartbeatService
+        self.last_seen = 0.0  # any message received counts, not only the pong
+        self.rtt: Optional[float] = None  # in milliseconds, ping to pong of the last heartbeat
+
+        self._max_queue_size = max_queue_size
+        self._slow_consumer_policy = slow_consumer_policy
+        self._lock = threading.Lock()
+        self._queue = collections.deque()  # of [frame] cells, emptied cell means the frame has been coalesced
+        self._queued_keys = {}
+        self._queue_depth = 0
+        self._control = collections.deque()  # config and heartbeat frames, written ahead of the queued ones
+        self._writer_idle = True
+        self._wakeup = asyncio.Event()
+        self._close = None
+        self._writer: Optional[asyncio.Task] = None
+        self._stats = {
+            "sent": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "max_queue_depth": 0,
+        }
 
     def get_headers(self):
         return self._connection.headers
 
+    @property
+    def protocols(self) -> List[str]:
+        header = self.get_headers().get("sec-websocket-protocol", "")
+        return [protocol.strip() for protocol in header.split(",") if protocol.strip()]
+
+    @property
+    def outbound_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "queue_depth": self._queue_depth,
+                "closed": self._is_closed,
+            }
+
     def get_connection(self):
         if self._is_closed:
             return
@@ -32,101 +111,230 @@ class WebSocketSession:
             return
         return self._connection
 
+    def start(self):
+        """
+        has to be called from the event loop, after the connection has been accepted
+        """
+        self._writer = self._loop.create_task(self._write())
+
+    async def wait_closed(self):
+        """
+        till the queued frames and the close frame have been written (see close_connection)
+        """
+        if self._writer is not None:
+            await self._writer
+
     def close_connection(self, code=1000, reason=""):
-        self._is_closed = True
-        connection = self.get_connection()
-        if not connection:
-            return
-        coroutine = connection.close(code=code, reason=reason)
-        self._loop.create_task(coroutine)
+        """
+        frames queued so far are still sent before the connection gets closed
+        """
+        with self._lock:
+            if self._is_closed:
+                return
+            self._is_closed = True
+            self._close = (code, reason)
+        self._wake()
 
     def send(self, data: dict):
-        connection = self.get_connection()
-        if not connection:
-            return
-        coroutine = connection.send_json(data)
-        self._loop.create_task(coroutine)
+        self.send_frame(Frame.from_data(data))
 
     def send_text(self, data: str):
-        connection = self.get_connection()
-        if not connection:
-            return
-        coroutine = connection.send_text(data)
-        self._loop.create_task(coroutine)
+        self.send_frame(Frame(payload=data))
 
+    def send_bytes(self, data: bytes):
+        self.send_frame(Frame(payload=data))
 
-class StarletteWebsocketConnectionHandler:
-    ping_interval = 1000  # in milliseconds
-    max_pong_awaiting_time = 1000  # in milliseconds
+    def send_control(self, data: str):
+        """
+        the frame skips the outbound queue and is never dropped, so a client falling behind on the game events
+        still gets it in time
+        """
+        with self._lock:
+            if self._is_closed:
+                return
+            self._control.append(Frame(payload=data))
+        self._wake()
 
-    def __init__(self):
-        self._thread_manager = ThreadManager()
-        self.last_ping = 0
-        self.last_pong = 0
+    def send_frame(self, frame: Frame):
+        with self._lock:
+            if self._is_closed:
+                return
+
+            coalesce = frame.coalesce_key is not None and self._slow_consumer_policy == SlowConsumerPolicy.DEGRADE
+            if coalesce:
+                stale_cell = self._queued_keys.get(frame.coalesce_key)
+                if stale_cell:
+                    stale_cell.clear()
+                    self._queue_depth -= 1
+                    self._stats["coalesced"] += 1
+
+            if self._queue_depth >= self._max_queue_size:
+                logging.warning("websocket session %s too slow, closing the connection", self.id)
+                self._stats["dropped"] += self._queue_depth
+                self._queue.clear()
+                self._queued_keys.clear()
+                self._queue_depth = 0
+                self._is_closed = True
+                self._close = (1013, "too slow")
+            else:
+                cell = [frame]
+                self._queue.append(cell)
+                self._queue_depth += 1
+                self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue_depth)
+                if coalesce:
+                    self._queued_keys[frame.coalesce_key] = cell
+        self._wake()
+
+    def _wake(self):
+        with self._lock:
+            if not self._writer_idle:
+                return
+            self._writer_idle = False
+        self._loop.call_soon_threadsafe(self._wakeup.set)
 
-        if self.max_pong_awaiting_time > self.ping_interval:
-            raise ValueError
+    def _pop_frame(self, batchable_only: bool = False) -> Optional[Frame]:
+        # called with the lock held
+        while self._queue:
+            cell = self._queue[0]
+            if cell and batchable_only and not cell[0].batchable:
+                return None
+            self._queue.popleft()
+            if not cell:
+                continue
+            frame = cell[0]
+            self._queue_depth -= 1
+            if frame.coalesce_key is not None and self._queued_keys.get(frame.coalesce_key) is cell:
+                del self._queued_keys[frame.coalesce_key]
+            return frame
+        return None
 
-        def heartbeat(session: WebSocketSession):
+    def _next_frame(self) -> Optional[Frame]:
+        with self._lock:
+            if self._control:
+                return self._control.popleft()
+            frame = self._pop_frame()
+            if frame is None:
+                self._writer_idle = True
+                return None
+            if not (self.batch_interval and frame.batchable):
+                return frame
+
+            batch = [frame.payload]
             while True:
-                session.send_text("ping")
-                self.last_ping = timestamp_now()
-                time.sleep(self.max_pong_awaiting_time/1000)
-                delta = self.last_pong - self.last_ping
-                if delta >= self.max_pong_awaiting_time or delta < 0:
-                    print("HEARTBEAT BROKEN, CLOSING THE CONNECTION")
-                    session.close_connection(code=1001)
+                frame = self._pop_frame(batchable_only=True)
+                if frame is None:
+                    break
+                batch.append(frame.payload)
+            return Frame(payload="[" + ",".join(batch) + "]")
+
+    async def _write(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self.batch_interval and not self._control:
+                await asyncio.sleep(self.batch_interval / 1000)
+
+            while True:
+                frame = self._next_frame()
+                if frame is None:
+                    break
+                try:
+                    if isinstance(frame.payload, bytes):
+                        await self._connection.send_bytes(frame.payload)
+                    else:
+                        await self._connection.send_text(frame.payload)
+                except Exception:  # connection broken, receiving side will notice the disconnect
+                    self._shutdown()
                     return
-                time.sleep((self.ping_interval - self.max_pong_awaiting_time)/1000)
+                with self._lock:
+                    self._stats["sent"] += 1
 
+            if self._close:
+                code, reason = self._close
+                self._shutdown()
+                if self._connection.client_state != WebSocketState.DISCONNECTED:
+                    try:
+                        await self._connection.close(code=code, reason=reason)
+                    except Exception:
+                        pass
+                return
+
+    def _shutdown(self):
+        with self._lock:
+            self._is_closed = True
+            self._queue.clear()
+            self._queued_keys.clear()
+            self._queue_depth = 0
+            self._control.clear()
+
+
+class StarletteWebsocketConnectionHandler:
+    ping_interval = 1000  # in milliseconds
+    max_pong_awaiting_time = 1000  # in milliseconds
+    outbound_queue_size = 512  # frames waiting to be written to one client
+    batch_interval = 40  # in milliseconds, used for the sessions that opted in to batching
+    slow_consumer_policy = SlowConsumerPolicy.DEGRADE
+    # on_connect, on_message and on_disconnect of one session run in order, sessions run in parallel
+    dispatcher = SessionDispatcher(max_workers=8, mailbox_size=256)
+    heartbeat = HeartbeatService(ping_interval=ping_interval, max_pong_awaiting_time=max_pong_awaiting_time)
+
+    def __init__(self):
         async def handler(websocket: WebSocket):
-            ws_session = WebSocketSession(websocket, loop=asyncio.get_event_loop())
-            if not self.validate_session(ws_session):
+            ws_session = WebSocketSession(
+                websocket,
+                loop=asyncio.get_event_loop(),
+                max_queue_size=self.outbound_queue_size,
+                slow_consumer_policy=self.slow_consumer_policy,
+            )
+            # the lookups of the session may wait for the game lock or another worker (redis)
+            valid = await asyncio.get_event_loop().run_in_executor(None, self.validate_session, ws_session)
+            if not valid:
                 await ws_session._connection.close(code=3000)
                 return
             await ws_session._connection.accept(subprotocol=ws_session.token)
-            ws_session.send(data={
-                "config": {
-                    "ping_interval": self.ping_interval,
-                    "max_pong_awaiting_time": self.max_pong_awaiting_time,
-                }
-            })
-            thread = threading.Thread(target=self.on_connect, args=(ws_session,))
-            self._thread_manager.add_thread(str(ws_session.id), thread)
-
-            heartbeat_thread = threading.Thread(target=heartbeat, args=(ws_session,))
-            heartbeat_thread.start()
+            ws_session.start()
+            ws_session.send_control(encode_json({"config": self.get_config(ws_session)}))
+            self.dispatcher.submit(ws_session.id, self.on_connect, ws_session)
+            self.heartbeat.register(ws_session)
 
             while True:
                 try:
-                    message = await ws_session._connection.receive_text()
+                    received = await ws_session._connection.receive()
+                    if received["type"] == "websocket.disconnect":
+                        raise WebSocketDisconnect(received["code"])
+                    message = received.get("text")
+                    if message is None:
+                        message = received.get("bytes")
 
                     if message == "pong":
-                        self.last_pong = timestamp_now()
+                        self.heartbeat.pong(ws_session)
                         continue
+                    self.heartbeat.received(ws_session)
 
-                    thread = threading.Thread(
-                        target=self.on_message,
-                        args=(
-                            ws_session,
-                            message,
-                        ),
-                    )
-                    self._thread_manager.add_thread(str(ws_session.id), thread)
+                    self.dispatcher.submit(ws_session.id, self.on_message, ws_session, message)
+                except MailboxFull:
+                    logging.warning("websocket session %s sends faster than it's handled, closing", ws_session.id)
+                    ws_session.close_connection(code=1008, reason="too many messages")
                 except WebSocketDisconnect:
-                    thread = threading.Thread(target=self.on_disconnect, args=(ws_session,))
-                    self._thread_manager.add_thread(str(ws_session.id), thread)
+                    self.heartbeat.unregister(ws_session)
+                    self.dispatcher.submit(ws_session.id, self.on_disconnect, ws_session, bounded=False)
                     return
 
         self.handler = handler
 
+    def get_config(self, ws_session: WebSocketSession) -> dict:
+        return {
+            "ping_interval": self.ping_interval,
+            "max_pong_awaiting_time": self.max_pong_awaiting_time,
+        }
+
     def validate_session(self, ws_session: WebSocketSession) -> bool:
         raise NotImplemented
 
     def on_connect(self, ws_session: WebSocketSession):
         raise NotImplemented
 
-    def on_message(self, ws_session: WebSocketSession, message: str):
+    def on_message(self, ws_session: WebSocketSession, message: Union[str, bytes]):
         raise NotImplemented
 
     def on_disconnect(self, ws_session: WebSocketSession):
@@ -0,0 +1,97 @@
+"""
+End-to-end fan-out latency of the redis backplane: the owner of a room publishes position broadcasts,
+N worker processes deliver them to their sessions of the room. Latency is from the publish till the event
+is queued on all the sessions of a worker. Needs redis.
+
+    GAME_REDIS_HOST=localhost python -m benchmarks.backplane [sessions per worker]
+"""
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+import redis
+
+from app.game.backplane import RedisBackplane, RoomChannel, RoomRelay
+from app.game.catalog import AirportCatalog
+from app.game.events import Event, EventType
+from benchmarks.common import FakeWebSocketSession
+
+
+WORKERS = [1, 2, 4, 8]
+EVENTS = 1000
+RATE = 500  # events per second, about 25 players moving in a room
+
+
+def redis_client() -> redis.Redis:
+    return redis.Redis(host=os.environ.get("GAME_REDIS_HOST") or "game_redis", decode_responses=True)
+
+
+def worker(room_id: int, sessions: int, ready, results):
+    backplane = RedisBackplane(client=redis_client())
+    relay = RoomRelay(room_id=room_id, airport_catalog=AirportCatalog(airports=[]))
+    for _ in range(sessions):
+        relay.add_session(FakeWebSocketSession())
+    latencies = []
+
+    def handle(message: dict):
+        relay.handle(message)
+        latencies.append(time.time() - message["event"]["data"]["sent"])
+        if len(latencies) == EVENTS:
+            results.put(latencies)
+
+    backplane.subscribe(RedisBackplane.room_channel(room_id), handle).wait()
+    ready.release()
+    while len(latencies) < EVENTS:
+        time.sleep(0.05)
+    backplane.stop()
+
+
+def run(workers: int, sessions: int) -> (list, int):
+    backplane = RedisBackplane(client=redis_client())
+    room_id = backplane.next_room_id()
+    channel = RoomChannel(backplane, room_id)
+    ready = multiprocessing.Semaphore(0)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(room_id, sessions, ready, results)) for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.acquire()
+
+    start = time.perf_counter()
+    for index in range(EVENTS):
+        event = Event(
+            type=EventType.PLAYER_POSITION_UPDATED,
+            data={"id": f"player{index % 25}", "sent": time.time(), "position": {"bearing": 12.5, "velocity": 600000}},
+        )
+        channel.broadcast(event, everyone_except=[])
+        time.sleep(max(start + (index + 1) / RATE - time.perf_counter(), 0))
+
+    latencies = []
+    for _ in processes:
+        latencies.extend(results.get(timeout=30))
+    for process in processes:
+        process.join()
+    backplane.stop()
+    return latencies, backplane.stats["published"]
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    print(f"{EVENTS} broadcasts at {RATE}/s, {sessions} sessions per worker")
+    for workers in WORKERS:
+        latencies, published = run(workers, sessions)
+        latencies = sorted(latency * 1000 for latency in latencies)
+        print(
+            f"{workers} workers ({workers * sessions} sessions): published {published}, "
+            f"delivered {len(latencies)}, latency p50 {statistics.median(latencies):.2f} ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms, max {latencies[-1]:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
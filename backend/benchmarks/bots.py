@@ -0,0 +1,67 @@
+"""
+Soak test of the bot scheduler, hundreds of bots flying, landing and refueling in one game loop
+with a few connected sessions receiving the broadcasts.
+
+    python -m benchmarks.bots [bots] [seconds]
+"""
+import collections
+import sys
+import threading
+import time
+
+from benchmarks.common import BenchmarkGameSession, FakeWebSocketSession
+
+
+SESSIONS = 10
+
+
+def main():
+    bots = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    duration = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    game_session = BenchmarkGameSession(storage=None)
+    game_session.BOT_IDLE_TIME = 1000
+    for _ in range(bots):
+        game_session.increase_bot_count()
+    spectators = list(game_session._players.values())[:SESSIONS]
+    ws_sessions = [FakeWebSocketSession() for _ in spectators]
+    for ws_session, player in zip(ws_sessions, spectators):
+        game_session._registry.connect(player=player, ws_session=ws_session)
+
+    loop = game_session.loop
+    loop.add_system("players", game_session.monitor_players)
+    loop.add_system("refueling", game_session.refuel_players, interval=200)
+    loop.add_system("bots", game_session.run_bots)
+
+    landings = collections.Counter()
+    original_landing = game_session.handle_airport_landing
+
+    def handle_airport_landing(player, airport):
+        original_landing(player=player, airport=airport)
+        landings[player.id] += 1
+
+    game_session.handle_airport_landing = handle_airport_landing
+
+    loop.start()
+    time.sleep(duration)
+    loop.stop()
+
+    stats = loop.stats
+    systems = {system["name"]: system for system in stats["systems"]}
+    states = collections.Counter(bot.state.value for bot in game_session._bots.values())
+    position_updates = game_session.position_updates_stats()
+    print(f"{bots} bots, {duration}s, {SESSIONS} sessions, threads: {threading.active_count()}")
+    print(
+        f"ticks: {stats['ticks']} ({stats['ticks'] / duration:.1f}/s), overruns: {stats['overruns']}, "
+        f"tick avg {stats['avg_tick_duration']:.2f} ms, max {stats['max_tick_duration']:.2f} ms"
+    )
+    print(f"bot decisions: avg {systems['bots']['avg_duration']:.2f} ms per tick, max {systems['bots']['max_duration']:.2f} ms")
+    print(
+        f"position updates: {position_updates['updates']}, broadcasts: {position_updates['broadcasts']}, "
+        f"frames per session: {sum(ws.frames for ws in ws_sessions) / SESSIONS:.0f}"
+    )
+    print(f"landings: {sum(landings.values())}, bots alive: {len(game_session._bots)} {dict(states)}")
+
+
+if __name__ == "__main__":
+    main()
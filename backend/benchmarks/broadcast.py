@@ -0,0 +1,42 @@
+"""
+Cost of a single broadcast_event as the number of connected sessions grows.
+
+    python -m benchmarks.broadcast
+"""
+import dataclasses
+
+from app.game.event_factory import EventFactory
+from app.tools.websocket_server import Frame
+from benchmarks.common import game_session_with_players, legacy_encode, measure
+
+
+SESSION_COUNTS = [1, 10, 50, 100, 500]
+REPEAT = 200
+
+
+def legacy_broadcast(game_session, event):
+    # encoding per recipient, as done before frames were introduced
+    for session, _ in game_session._sessions.values():
+        data = dataclasses.asdict(event)
+        session.send_frame(Frame(payload=legacy_encode(data)))
+
+
+def main():
+    print(f"{'sessions':>8} {'legacy [us]':>12} {'frame [us]':>12} {'speedup':>8}")
+    for sessions_count in SESSION_COUNTS:
+        game_session, players = game_session_with_players(sessions_count)
+        player = players[0]
+
+        legacy = measure(
+            lambda: legacy_broadcast(game_session, EventFactory.player_updated_event(player=player)),
+            repeat=REPEAT,
+        )
+        current = measure(
+            lambda: game_session.broadcast_event(EventFactory.player_updated_event(player=player)),
+            repeat=REPEAT,
+        )
+        print(f"{sessions_count:>8} {legacy:>12.1f} {current:>12.1f} {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
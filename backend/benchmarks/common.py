@@ -0,0 +1,123 @@
+import dataclasses
+import datetime
+import json
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional
+
+from app.game.config import GameConfig
+from app.game.core.game import GameSession
+from app.game.core.player import Player
+
+
+class LegacyJSONEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, uuid.UUID):
+            return str(obj)
+        if isinstance(obj, datetime.datetime):
+            return obj.timestamp()
+        return json.JSONEncoder.default(self, obj)
+
+
+def legacy_encode(data: dict) -> str:
+    # the dumps/loads round-trip that app.tools.encoder used to do, followed by starlette's send_json dumps
+    return json.dumps(json.loads(json.dumps(data, cls=LegacyJSONEncoder)))
+
+
+class LegacyThreadManager:
+    """
+    the thread per message dispatch that app.tools.dispatcher.SessionDispatcher replaced
+    """
+
+    @dataclasses.dataclass
+    class Namespace:
+        locked: bool = False
+        thread_queue: Optional[queue.Queue] = None
+
+    def __init__(self):
+        self._message_queue = {}
+
+    def _execute(self, namespace_name: str):
+        namespace = self._message_queue.get(namespace_name, LegacyThreadManager.Namespace())
+        if not namespace.thread_queue:
+            return
+        if namespace.locked:
+            return
+        try:
+            thread = namespace.thread_queue.get(block=False)
+        except queue.Empty:
+            return
+
+        namespace.locked = True
+        thread.start()
+        thread.join()
+        namespace.thread_queue.task_done()
+        namespace.locked = False
+
+        return self._execute(namespace_name)
+
+    def add_thread(self, namespace_name: str, thread: threading.Thread):
+        namespace = self._message_queue.get(namespace_name, LegacyThreadManager.Namespace())
+        if not namespace.thread_queue:
+            namespace.thread_queue = queue.Queue()
+
+        namespace.thread_queue.put(thread)
+        self._message_queue[namespace_name] = namespace
+
+        t = threading.Thread(target=self._execute, args=(namespace_name,))
+        t.start()
+
+
+class FakeWebSocketSession:
+    """
+    stands in for WebSocketSession, counts the frames instead of writing them to a socket
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4()
+        self.token = uuid.uuid4().hex
+        self.player_id = None
+        self.player_index = None
+        self.entity_versions = None
+        self.airport_catalog = False
+        self.refueling_events = False
+        self.frames = 0
+        self.bytes = 0
+
+    def send_frame(self, frame):
+        self.frames += 1
+        self.bytes += len(frame.payload)
+
+    def close_connection(self, code=1000, reason=""):
+        pass
+
+
+class BenchmarkGameSession(GameSession):
+    def schedule_background_tasks(self):
+        # benchmarks drive the game manually
+        pass
+
+
+def game_session_with_players(players_count: int) -> (GameSession, List[Player]):
+    game_session = BenchmarkGameSession(storage=None)
+    game_session.config = GameConfig(MAX_PLAYERS=players_count)
+    players = []
+    for index in range(players_count):
+        ws_session = FakeWebSocketSession()
+        player = game_session.add_player(nickname=f"player{index}", token=ws_session.token)
+        ws_session.player_id = player.id
+        game_session.add_session(player=player, ws_session=ws_session)
+        players.append(player)
+    return game_session, players
+
+
+def measure(function: Callable, repeat: int) -> float:
+    """
+    returns average duration of a single call in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1_000_000
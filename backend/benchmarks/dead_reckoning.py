@@ -0,0 +1,86 @@
+"""
+Position broadcasts of steering bots with and without the dead reckoning thresholds,
+and how far the clients' extrapolation drifts from the authoritative position in between.
+
+    python -m benchmarks.dead_reckoning
+"""
+import random
+
+from app.game.config import GameConfig
+from app.game.consts import AIRPORTS
+from app.game.core.coordinates import Coordinates
+from app.game.core.position import PlayerPosition
+from app.game.dead_reckoning import DeadReckoning
+
+
+BOTS = 10
+DURATION = 60_000  # simulated milliseconds
+UPDATE_INTERVAL = 50  # like the bots steered before the flight plans
+PENDING_CHECK_INTERVAL = 200  # like GameSession.monitor_players
+
+
+def steer(position: PlayerPosition, destination: Coordinates, timestamp: int) -> PlayerPosition:
+    # the steering of the bots before the flight plans (see benchmarks.flight_plans)
+    current = position.future_position(timestamp=timestamp, calculate_bearing=True)
+    ideal_bearing = Coordinates.bearing_between(current.coordinates, destination)
+    left = (360 - ideal_bearing + current.bearing) % 360
+    right = (360 - current.bearing + ideal_bearing) % 360
+    bearing_diff = min(left, right)
+    bearing_delta = min(2.0, bearing_diff)
+    if left < right:
+        bearing_delta = -bearing_delta
+    velocity_delta = -10000 if bearing_diff > 90 else 10000
+    velocity = min(max(current.velocity + velocity_delta, GameConfig.FLYING_VELOCITY), GameConfig.MAX_VELOCITY)
+
+    new_position = position.future_position(timestamp=timestamp)
+    new_position.bearing = current.bearing + bearing_delta
+    new_position.velocity = velocity
+    return new_position
+
+
+def main():
+    random.seed(0)
+    destinations = [airport["coordinates"] for airport in AIRPORTS]
+    dead_reckoning = DeadReckoning(config=GameConfig())
+    positions = {}
+    broadcast = {}
+    targets = {}
+    for bot_id in range(BOTS):
+        position = PlayerPosition.random()
+        position.timestamp = 0
+        positions[bot_id] = broadcast[bot_id] = position
+        dead_reckoning.broadcasted(bot_id, position)
+        targets[bot_id] = random.choice(destinations)
+
+    errors = []
+    for timestamp in range(UPDATE_INTERVAL, DURATION + 1, UPDATE_INTERVAL):
+        for bot_id in range(BOTS):
+            if Coordinates.distance_between(positions[bot_id].coordinates, targets[bot_id]) < 100:
+                targets[bot_id] = random.choice(destinations)
+            position = positions[bot_id] = steer(positions[bot_id], targets[bot_id], timestamp)
+
+            extrapolated = broadcast[bot_id].future_position(timestamp=timestamp)
+            errors.append(Coordinates.distance_between(extrapolated.coordinates, position.coordinates))
+
+            if dead_reckoning.update(bot_id, position):
+                dead_reckoning.broadcasted(bot_id, position)
+                broadcast[bot_id] = position
+
+        if timestamp % PENDING_CHECK_INTERVAL == 0:
+            for bot_id in dead_reckoning.pending(positions, timestamp=timestamp):
+                dead_reckoning.broadcasted(bot_id, positions[bot_id])
+                broadcast[bot_id] = positions[bot_id]
+
+    updates = dead_reckoning.stats["updates"]
+    broadcasts = dead_reckoning.stats["broadcasts"] - BOTS
+    errors.sort()
+    print(f"{BOTS} bots, {DURATION / 1000:.0f}s, update every {UPDATE_INTERVAL}ms")
+    print(f"updates: {updates}, broadcasts: {broadcasts} ({updates / max(broadcasts, 1):.1f}x fewer)")
+    print(
+        f"client extrapolation error [km]: median {errors[len(errors) // 2]:.2f}, "
+        f"p99 {errors[len(errors) * 99 // 100]:.2f}, max {errors[-1]:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Death detection of thousands of flying planes: checking every plane on every tick (as monitor_players used to)
+vs a timer of the game loop per plane at its deadline. Half of the planes run out of fuel at random times,
+the rest keep flying. Prints the cost per tick and how late the deaths were detected.
+
+    python -m benchmarks.deaths [planes] [seconds]
+"""
+import statistics
+import sys
+import time
+
+from app.game.config import GameConfig
+from app.game.enums import DeathCause
+from app.tools.timestamp import timestamp_now
+from benchmarks.common import BenchmarkGameSession
+
+
+def polling_check(game_session: BenchmarkGameSession):
+    """
+    the monitor_players checks replaced by the death timers
+    """
+    now = timestamp_now()
+    for player in list(game_session._players.values()):
+        if player.is_dead or player.is_grounded:
+            continue
+        if player.position.future_tank_level(timestamp=now) == 0:
+            game_session.pronounce_player_dead(player=player, cause=DeathCause.RUN_OUT_OF_FUEL)
+        elif player.position.velocity < GameConfig.FLYING_VELOCITY:
+            game_session.pronounce_player_dead(player=player, cause=DeathCause.SPEED_TOO_LOW)
+
+
+def run(planes: int, duration: int, polling: bool) -> (dict, list):
+    game_session = BenchmarkGameSession(storage=None)
+    if polling:
+        game_session._schedule_death = lambda player: None
+    for _ in range(planes):
+        game_session.increase_bot_count()
+
+    now = timestamp_now()
+    deadlines = {}
+    for index, player in enumerate(game_session._players.values()):
+        position = player.position.replace(timestamp=now)
+        if index % 2 == 0:
+            # runs out of fuel within the benchmark
+            flight_time = 500 + index * (duration - 1) * 1000 // planes
+            position = position.replace(tank_level=flight_time * position.fuel_consumption / 3_600_000)
+            deadlines[player.id] = now + flight_time
+        player.position = position
+        game_session._schedule_death(player)
+
+    deaths = {}
+    original_pronounce_player_dead = game_session.pronounce_player_dead
+
+    def pronounce_player_dead(player, cause):
+        deaths[player.id] = timestamp_now()
+        original_pronounce_player_dead(player=player, cause=cause)
+
+    game_session.pronounce_player_dead = pronounce_player_dead
+    loop = game_session.loop
+    if polling:
+        loop.add_system("players", lambda: polling_check(game_session))
+    else:
+        loop.add_system("players", game_session.monitor_players)
+    loop.start()
+    time.sleep(duration)
+    loop.stop()
+
+    lateness = [deaths[player_id] - deadline for player_id, deadline in deadlines.items() if player_id in deaths]
+    return loop.stats, lateness
+
+
+def main():
+    planes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    duration = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{planes} planes, {planes // 2} running out of fuel within {duration}s")
+    for polling in (True, False):
+        stats, lateness = run(planes, duration, polling=polling)
+        players = next(system for system in stats["systems"] if system["name"] == "players")
+        print(
+            f"{'every tick' if polling else 'deadlines'}: players avg {players['avg_duration']:.2f} ms, "
+            f"tick avg {stats['avg_tick_duration']:.2f} ms, overruns {stats['overruns']}, deaths {len(lateness)}, "
+            f"late by avg {statistics.mean(lateness):.0f} ms, max {max(lateness)} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Bytes sent per player.updated and airport.updated with full snapshots and with delta updates.
+
+    python -m benchmarks.deltas
+"""
+from app.game.event_factory import EventFactory
+from benchmarks.common import FakeWebSocketSession, game_session_with_players
+
+
+UPDATES = 100
+
+
+def main():
+    game_session, players = game_session_with_players(2)
+    for _ in range(game_session.config.MAX_SHIPMENTS_IN_GAME):
+        game_session.add_random_airport_shipment()
+    player = players[0]
+    airport = next(iter(game_session._airports.values()))
+
+    full_session = FakeWebSocketSession()
+    delta_session = FakeWebSocketSession()
+    delta_session.entity_versions = {}
+    for ws_session in [full_session, delta_session]:
+        game_session._registry.connect(player=player, ws_session=ws_session)
+
+    # refueling, only score and position (tank level) change
+    for _ in range(UPDATES):
+        player.score += 100
+        player.position.tank_level += 700
+        game_session.broadcast_event(event=EventFactory.player_updated_event(player=player))
+    refueling = full_session.bytes, delta_session.bytes
+
+    # occupying player coming and going
+    for index in range(UPDATES):
+        airport.occupying_player = player if index % 2 else None
+        game_session.broadcast_event(event=EventFactory.airport_updated_event(airport=airport))
+    landing = full_session.bytes - refueling[0], delta_session.bytes - refueling[1]
+
+    print(f"{'updates':>26} {'full [B]':>10} {'delta [B]':>10}")
+    print(f"{'player.updated refueling':>26} {refueling[0] / UPDATES:>10.0f} {refueling[1] / UPDATES:>10.0f}")
+    print(f"{'airport.updated landing':>26} {landing[0] / UPDATES:>10.0f} {landing[1] / UPDATES:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
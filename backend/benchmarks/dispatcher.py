@@ -0,0 +1,81 @@
+"""
+Inbound messages handled per second per number of sessions, with the session dispatcher
+and with the old thread per message dispatch. Also checks the per-session order.
+
+    python -m benchmarks.dispatcher
+"""
+import threading
+import time
+
+from app.tools.dispatcher import SessionDispatcher
+from benchmarks.common import LegacyThreadManager
+
+
+MESSAGES = 5000
+SESSIONS = [1, 10, 100]
+
+
+class Sink:
+    """
+    stands in for on_message, records the order the messages of every session were handled in
+    """
+
+    def __init__(self, sessions: int):
+        self.handled = {session: [] for session in range(sessions)}
+        self.remaining = MESSAGES
+        self._lock = threading.Lock()
+        self.done = threading.Event()
+
+    def on_message(self, session: int, sequence: int):
+        sum(range(100))  # a little bit of game logic
+        self.handled[session].append(sequence)
+        with self._lock:
+            self.remaining -= 1
+            if not self.remaining:
+                self.done.set()
+
+    def in_order(self) -> bool:
+        return all(handled == sorted(handled) for handled in self.handled.values())
+
+
+def run(sessions: int, submit) -> (float, int, bool):
+    sink = Sink(sessions)
+    peak_threads = threading.active_count()
+    start = time.perf_counter()
+    for sequence in range(MESSAGES):
+        submit(sink, sequence % sessions, sequence)
+        if sequence % 100 == 0:
+            peak_threads = max(peak_threads, threading.active_count())
+    sink.done.wait()
+    duration = time.perf_counter() - start
+    return MESSAGES / duration, peak_threads, sink.in_order()
+
+
+def main():
+    dispatcher = SessionDispatcher()
+
+    def dispatch(sink, session, sequence):
+        dispatcher.submit(session, sink.on_message, session, sequence, bounded=False)
+
+    thread_manager = LegacyThreadManager()
+
+    def legacy_dispatch(sink, session, sequence):
+        thread = threading.Thread(target=sink.on_message, args=(session, sequence))
+        thread_manager.add_thread(str(session), thread)
+
+    print(f"{MESSAGES} messages")
+    print(f"{'sessions':>8} {'dispatcher [msg/s]':>19} {'threads':>8} {'legacy [msg/s]':>15} {'threads':>8} {'in order':>9}")
+    for sessions in SESSIONS:
+        rate, threads, ordered = run(sessions, dispatch)
+        legacy_rate, legacy_threads, legacy_ordered = run(sessions, legacy_dispatch)
+        print(
+            f"{sessions:>8} {rate:>19.0f} {threads:>8} {legacy_rate:>15.0f} {legacy_threads:>8}"
+            f" {ordered!s:>5}/{legacy_ordered!s:<5}"
+        )
+    time.sleep(0.1)  # the last drains are returning
+    print(f"left behind: {dispatcher.stats['mailboxes']} mailboxes, {len(thread_manager._message_queue)} legacy namespaces")
+    dispatcher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Single-pass encode_json against the previous encode round-trip, on player_list and airport_list payloads.
+
+    python -m benchmarks.encoder
+"""
+import random
+
+from app.game.enums import DeathCause
+from app.game.event_factory import EventFactory
+from app.tools.encoder import encode_json
+from benchmarks.common import game_session_with_players, legacy_encode, measure
+
+
+PLAYERS_COUNT = 16
+REPEAT = 2000
+
+
+def realistic_game_session():
+    game_session, players = game_session_with_players(PLAYERS_COUNT)
+    for _ in range(game_session.config.MAX_SHIPMENTS_IN_GAME):
+        game_session.add_random_airport_shipment()
+
+    shipments = list(game_session._shipments.values())
+    for player in players[::2]:
+        player.shipment = random.choice(shipments)
+        player.score = random.randint(0, 100_000)
+    players[-1].death_cause = DeathCause.RUN_OUT_OF_FUEL
+    return game_session
+
+
+def main():
+    game_session = realistic_game_session()
+    payloads = {
+        "player_list": EventFactory.player_list_event(player_list=list(game_session._players.values())),
+        "airport_list": EventFactory.airport_list_event(airport_list=list(game_session._airports.values())),
+    }
+
+    print(f"{'payload':>12} {'size [B]':>9} {'legacy [us]':>12} {'single pass [us]':>17} {'speedup':>8}")
+    for name, event in payloads.items():
+        data = event.serialized
+        size = len(encode_json(data).encode("utf-8"))
+        legacy = measure(lambda: legacy_encode(data), repeat=REPEAT)
+        current = measure(lambda: encode_json(data), repeat=REPEAT)
+        print(f"{name:>12} {size:>9} {legacy:>12.1f} {current:>17.1f} {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
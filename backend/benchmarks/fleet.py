@@ -0,0 +1,76 @@
+"""
+Batched kinematics of the planes: the propagation of every plane to now,
+a PlayerPosition at a time (ScalarFleet) vs the numpy arrays (FleetState), and the largest difference between them.
+
+    python -m benchmarks.fleet [planes]
+"""
+import random
+import sys
+import time
+
+from app.game.config import GameConfig
+from app.game.core.player import Player
+from app.game.fleet import FleetState, ScalarFleet, numpy
+
+
+SIZES = [100, 1000, 5000, 20000]
+REPEAT = 20
+
+
+def create_players(planes: int) -> list:
+    players = []
+    for index in range(planes):
+        player = Player(nickname=f"player{index}", token=str(index), color="#ffffff")
+        player.position = player.position.replace(
+            velocity=random.randint(GameConfig.MIN_VELOCITY, GameConfig.MAX_VELOCITY),
+            timestamp=player.position.timestamp - random.randint(0, 3000),
+        )
+        players.append(player)
+    return players
+
+
+def measure(call) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        call()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    if numpy is None:
+        print("numpy is not installed, the game uses ScalarFleet")
+        return
+    sizes = [int(sys.argv[1])] if len(sys.argv) > 1 else SIZES
+    for planes in sizes:
+        players = create_players(planes)
+        scalar, batched = ScalarFleet(), FleetState()
+        for player in players:
+            scalar.add(player)
+        for player in players:
+            batched.add(player)  # the player's fleet is the last one it was added to, both see the same positions
+        player_ids = [player.id for player in players]
+        now = max(player.position.timestamp for player in players) + 50
+
+        scalar_positions, batched_positions = (
+            measure(lambda: fleet.positions_at(player_ids, timestamp=now, calculate_bearing=True))
+            for fleet in (scalar, batched)
+        )
+        expected = scalar.positions_at(player_ids, timestamp=now, calculate_bearing=True)
+        actual = batched.positions_at(player_ids, timestamp=now, calculate_bearing=True)
+        error = max(
+            max(
+                abs(expected[player_id].coordinates.latitude - actual[player_id].coordinates.latitude),
+                abs(expected[player_id].coordinates.longitude - actual[player_id].coordinates.longitude),
+                abs((expected[player_id].bearing - actual[player_id].bearing + 180) % 360 - 180),
+            )
+            for player_id in player_ids
+        )
+
+        print(
+            f"{planes} planes: positions {scalar_positions:.2f} ms -> {batched_positions:.2f} ms "
+            f"({scalar_positions / batched_positions:.1f}x), max difference {error:.1e} degrees"
+        )
+
+
+if __name__ == "__main__":
+    main()
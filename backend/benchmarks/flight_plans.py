@@ -0,0 +1,156 @@
+"""
+Flights of bots to airports: the steering every 50 ms (as GameSession did before) vs the flight plans
+with a position update at the turn points only. Flights start from the departures (heading to the destination)
+and from random positions and headings (new bots, full airports). Prints the position updates and broadcasts
+per flight, the time spent deciding, and how far apart the planes flown both ways get.
+
+    python -m benchmarks.flight_plans [flights]
+"""
+import random
+import statistics
+import sys
+import time
+import uuid
+
+from app.game.config import GameConfig
+from app.game.core.coordinates import Coordinates
+from app.game.core.flight_plan import FlightPlan
+from app.game.core.position import PlayerPosition
+from app.game.dead_reckoning import DeadReckoning
+from benchmarks.common import BenchmarkGameSession
+
+
+TICK = 50  # ms, decisions are made on the ticks of the game loop
+ARRIVAL_DISTANCE = BenchmarkGameSession.BOT_ARRIVAL_DISTANCE
+TURN_RATE = BenchmarkGameSession.BOT_TURN_RATE
+ACCELERATION = BenchmarkGameSession.BOT_ACCELERATION
+
+
+def steer(start: PlayerPosition, destination: Coordinates) -> (list, int):
+    """
+    the steering replaced by the flight plans, returns the position updates and the arrival
+    """
+    position, now, last_decision = start, start.timestamp, start.timestamp
+    updates = [start]
+    while now - start.timestamp < 600_000:
+        elapsed = min(max(now - last_decision, 50), 3000) / 1000
+        current = position.future_position(timestamp=max(now, position.timestamp + 1), calculate_bearing=True)
+        distance_to_destination = Coordinates.distance_between(current.coordinates, destination)
+        if distance_to_destination <= ARRIVAL_DISTANCE:
+            return updates, now
+        ideal_bearing = Coordinates.bearing_between(current.coordinates, destination)
+        left = (360 - ideal_bearing + current.bearing) % 360
+        right = (360 - current.bearing + ideal_bearing) % 360
+        bearing_diff = min(left, right)
+        bearing_delta = min(TURN_RATE * elapsed, bearing_diff)
+        if left < right:
+            bearing_delta = -bearing_delta
+        velocity_delta = int(ACCELERATION * elapsed)
+        if abs(bearing_diff) > 90:
+            velocity_delta = -velocity_delta
+        velocity = min(max(position.velocity + velocity_delta, GameConfig.FLYING_VELOCITY), GameConfig.MAX_VELOCITY)
+        position = current.replace(bearing=current.bearing + bearing_delta, velocity=velocity)
+        updates.append(position)
+
+        decision_interval = 50
+        if abs(bearing_delta) < 0.01 and velocity == GameConfig.MAX_VELOCITY:
+            decision_interval = (distance_to_destination - ARRIVAL_DISTANCE * 1.1) / velocity * 3_600_000
+            decision_interval = min(max(decision_interval, 50), 3000)
+        last_decision = now
+        now = -(-(now + int(decision_interval)) // TICK) * TICK  # on the next tick
+    return updates, now
+
+
+def plan(start: PlayerPosition, destination: Coordinates) -> (list, int):
+    flight_plan = FlightPlan.plan(
+        player_id=uuid.uuid4(),
+        position=start,
+        destination_id=uuid.uuid4(),
+        destination=destination,
+        arrival_distance=ARRIVAL_DISTANCE,
+        turn_rate=TURN_RATE,
+        acceleration=ACCELERATION,
+        min_velocity=GameConfig.FLYING_VELOCITY,
+        max_velocity=GameConfig.MAX_VELOCITY,
+    )
+    return flight_plan.legs, flight_plan.ends
+
+
+def position_at(updates: list, timestamp: int) -> PlayerPosition:
+    last = max((update for update in updates if update.timestamp <= timestamp), key=lambda update: update.timestamp)
+    return last.future_position(timestamp=timestamp)
+
+
+def broadcasts(updates: list, until: int) -> int:
+    """
+    the broadcasts of the dead reckoning, on every update and on the ticks in between
+    """
+    dead_reckoning = DeadReckoning(GameConfig())
+    player_id = uuid.uuid4()
+    pending = iter(updates)
+    update = next(pending, None)
+    for tick in range(updates[0].timestamp, until + TICK, TICK):
+        while update is not None and update.timestamp <= tick:
+            if dead_reckoning.update(player_id, update):
+                dead_reckoning.broadcasted(player_id, update)
+            update = next(pending, None)
+        current = position_at(updates, tick)
+        for waiting in dead_reckoning.pending({player_id: current}, timestamp=tick):
+            dead_reckoning.broadcasted(waiting, current)
+    return dead_reckoning.stats["broadcasts"]
+
+
+def main():
+    flights = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    airports = list(BenchmarkGameSession(storage=None)._airports.values())
+
+    results = {"steering": [], "flight plan": []}
+    deviations, arrivals = [], []
+    for index in range(flights):
+        origin, destination = random.sample(airports, 2)
+        if index % 2 == 0:  # departure
+            start = PlayerPosition(
+                coordinates=Coordinates(latitude=origin.coordinates.latitude, longitude=origin.coordinates.longitude),
+                bearing=Coordinates.bearing_between(origin.coordinates, destination.coordinates),
+                velocity=500_000,
+                timestamp=0,
+            )
+        else:
+            start = PlayerPosition.random().replace(timestamp=0)
+
+        flown = {}
+        for name, fly in (("steering", steer), ("flight plan", plan)):
+            started = time.perf_counter()
+            updates, arrival = fly(start, destination.coordinates)
+            duration = (time.perf_counter() - started) * 1_000_000
+            flown[name] = updates, arrival
+            results[name].append((len(updates), broadcasts(updates, arrival), duration))
+
+        (steered, steered_arrival), (planned, planned_arrival) = flown["steering"], flown["flight plan"]
+        arrivals.append(abs(steered_arrival - planned_arrival))
+        deviations.append(
+            max(
+                Coordinates.distance_between(
+                    position_at(steered, timestamp).coordinates,
+                    position_at(planned, timestamp).coordinates,
+                )
+                for timestamp in range(0, min(steered_arrival, planned_arrival), TICK)
+            )
+        )
+
+    print(f"{flights} flights, per flight:")
+    for name, flown in results.items():
+        updates, broadcast, duration = zip(*flown)
+        print(
+            f"  {name:>12}: position updates {statistics.mean(updates):6.1f}, "
+            f"broadcasts {statistics.mean(broadcast):5.1f}, deciding {statistics.mean(duration):8.1f} us"
+        )
+    print(
+        f"distance between the planes: median of the largest {statistics.median(deviations):.1f} km, "
+        f"max {max(deviations):.1f} km; arrival difference median {statistics.median(arrivals):.0f} ms, "
+        f"max {max(arrivals)} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
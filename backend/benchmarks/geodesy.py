@@ -0,0 +1,136 @@
+"""
+The n-vector geodesy behind Coordinates against the haversine formulas it replaced: the largest differences
+between them on random coordinates (short and long distances, near the poles, longitudes past ±180),
+then the formulas and the per-plane math of the game (whole positions propagated) with each of them.
+
+    python -m benchmarks.geodesy [samples]
+"""
+import itertools
+import random
+import sys
+
+from app.game.core.coordinates import Coordinates
+from app.game.core.geodesy import Haversine, NVector
+from app.game.core.position import PlayerPosition
+from app.tools.timestamp import timestamp_now
+from benchmarks.common import measure
+
+
+def random_pair() -> (Coordinates, Coordinates):
+    kind = random.randrange(4)
+    origin = Coordinates(latitude=random.uniform(-90, 90), longitude=random.uniform(-180, 180))
+    if kind == 0:  # a landing or a plane close to its destination
+        other = Coordinates(
+            latitude=origin.latitude + random.uniform(-0.01, 0.01),
+            longitude=origin.longitude + random.uniform(-0.01, 0.01),
+        )
+    elif kind == 1:  # near the poles
+        origin.latitude = random.choice((-1, 1)) * random.uniform(89, 90)
+        other = Coordinates(latitude=random.uniform(-90, 90), longitude=random.uniform(-180, 180))
+    elif kind == 2:  # longitudes keep growing past ±180 when flying east or west
+        origin.longitude += random.choice((-1, 1)) * random.randrange(1, 4) * 360
+        other = Coordinates(latitude=random.uniform(-90, 90), longitude=random.uniform(-540, 540))
+    else:
+        other = Coordinates(latitude=random.uniform(-90, 90), longitude=random.uniform(-180, 180))
+    return origin, other
+
+
+def angle_difference(angle1: float, angle2: float) -> float:
+    difference = abs(angle1 - angle2) % 360
+    return min(difference, 360 - difference)
+
+
+def compare(samples: int):
+    radius = Coordinates._earth_radius()
+    distance = bearing = latitude = longitude = turn = 0
+    for _ in range(samples):
+        origin, other = random_pair()
+        expected_distance = Haversine.distance(origin, other, radius)
+        distance = max(distance, abs(expected_distance - NVector.distance(origin, other, radius)))
+        if expected_distance > 1:  # the bearing to a point a few meters away is noise
+            bearing = max(bearing, angle_difference(Haversine.bearing(origin, other), NVector.bearing(origin, other)))
+
+        flown, heading = random.uniform(0, 20_000), random.uniform(0, 360)
+        expected = Coordinates(latitude=0, longitude=0)
+        actual = Coordinates(latitude=0, longitude=0)
+        expected_turn = Haversine.destination(origin, flown, heading, radius, expected, turn=True)
+        actual_turn = NVector.destination(origin, flown, heading, radius, actual, turn=True)
+        latitude = max(latitude, abs(expected.latitude - actual.latitude))
+        if abs(expected.latitude) < 89.9:  # any longitude is the pole
+            longitude = max(longitude, abs(expected.longitude - actual.longitude))
+            turn = max(turn, angle_difference(expected_turn, actual_turn))
+    print(
+        f"{samples} samples, largest differences: distance {distance:.1e} km, bearing {bearing:.1e} degrees, "
+        f"destination latitude {latitude:.1e} longitude {longitude:.1e} degrees, turn on the way {turn:.1e} degrees"
+    )
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    compare(samples)
+
+    airports = [Coordinates(latitude=random.uniform(-60, 60), longitude=random.uniform(-180, 180)) for _ in range(30)]
+    positions = [PlayerPosition.random() for _ in range(1000)]
+    now = timestamp_now()
+    for position in positions:
+        position.timestamp = now - random.randint(50, 1000)
+    plane = itertools.cycle(positions)
+    airport = itertools.cycle(airports)
+
+    def landing_check():
+        # Airport.land_player
+        position = next(plane).future_position(timestamp=now)
+        return Coordinates.distance_between(position.coordinates, next(airport))
+
+    def bot_steering():
+        # the steering of the bots before the flight plans
+        position = next(plane).future_position(timestamp=now)
+        destination = next(airport)
+        return (
+            Coordinates.distance_between(position.coordinates, destination),
+            Coordinates.bearing_between(position.coordinates, destination),
+        )
+
+    def dead_reckoning():
+        # DeadReckoning._diverges, the clients' extrapolation of the last broadcast against the new position
+        last, position = next(plane), next(plane)
+        extrapolated = last.future_position(timestamp=now, calculate_bearing=True)
+        actual = position.future_position(timestamp=now, calculate_bearing=True)
+        return Coordinates.distance_between(actual.coordinates, extrapolated.coordinates)
+
+    # the formulas alone, the coordinates of the airports and of propagated planes keep their vectors
+    radius = Coordinates._earth_radius()
+    scratch = Coordinates(latitude=0, longitude=0)
+
+    def distance():
+        return Coordinates.GEODESY.distance(next(airport), next(plane).coordinates, radius)
+
+    def bearing():
+        return Coordinates.GEODESY.bearing(next(plane).coordinates, next(airport))
+
+    def destination():
+        return Coordinates.GEODESY.destination(next(plane).coordinates, 10, 45, radius, scratch)
+
+    def destination_turn():
+        return Coordinates.GEODESY.destination(next(plane).coordinates, 10, 45, radius, scratch, turn=True)
+
+    print(f"{'per call [us]':>24} {'haversine':>10} {'n-vector':>10} {'speedup':>8}")
+    for name, call in (
+        ("distance", distance),
+        ("bearing", bearing),
+        ("destination", destination),
+        ("destination and turn", destination_turn),
+        ("landing check", landing_check),
+        ("bot steering", bot_steering),
+        ("dead reckoning", dead_reckoning),
+    ):
+        results = []
+        for geodesy in (Haversine, NVector):
+            Coordinates.GEODESY = geodesy
+            results.append(measure(call, repeat=100_000))
+        Coordinates.GEODESY = NVector
+        print(f"{name:>24} {results[0]:>10.2f} {results[1]:>10.2f} {results[0] / results[1]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Memory of the core entities and the allocations of the position updates, on a simulated load of 500 planes
+sending position updates every tick (with the dead reckoning and the pending broadcasts), measured by tracemalloc.
+
+    python -m benchmarks.memory [planes] [ticks]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from app.game.config import GameConfig
+from app.game.core.airport import Airport
+from app.game.core.coordinates import Coordinates
+from app.game.core.player import Player
+from app.game.core.position import PlayerPosition
+from app.game.core.shipment import Shipment
+from app.game.events import Event, EventType
+from app.tools.timestamp import timestamp_now
+from benchmarks.common import BenchmarkGameSession
+
+
+def allocated(create, count: int) -> float:
+    """
+    bytes per object kept alive after creating `count` of them
+    """
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objects = [create(index) for index in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del objects
+    return size / count
+
+
+def main():
+    planes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    airports = [
+        Airport(
+            name=f"airport{index}",
+            full_name="",
+            description="",
+            elevation=0,
+            fuel_price=1,
+            coordinates=Coordinates(latitude=0, longitude=index),
+        )
+        for index in range(2)
+    ]
+    print("bytes per object:")
+    for name, create in (
+        ("Coordinates", lambda index: Coordinates(latitude=index, longitude=index)),
+        ("PlayerPosition", lambda index: PlayerPosition.random()),
+        ("Player (with its position)", lambda index: Player(nickname="player", token=str(index), color="#ffffff")),
+        ("Shipment", lambda index: Shipment(origin=airports[0], destination=airports[1], distance=100)),
+        ("Event", lambda index: Event(type=EventType.PLAYER_UPDATED, data={})),
+    ):
+        print(f"  {name}: {allocated(create, 10_000):.0f}")
+
+    game_session = BenchmarkGameSession(storage=None, config=GameConfig(MAX_PLAYERS=planes))
+    # without sessions, the events aren't delivered (see benchmarks.broadcast), the loop isn't running
+    players = [game_session.add_player(nickname=f"player{index}", token=f"token{index}") for index in range(planes)]
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    peaks = []
+    updates = 0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        tracemalloc.reset_peak()
+        now = timestamp_now()
+        for player in players:
+            if player.position.timestamp >= now:
+                continue
+            game_session.update_player_position(
+                player=player,
+                timestamp=now,
+                velocity=random.randint(GameConfig.FLYING_VELOCITY, GameConfig.MAX_VELOCITY),
+                bearing=player.position.bearing + random.uniform(-1, 1),
+            )
+            updates += 1
+        game_session.broadcast_pending_positions()
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        time.sleep(0.05)
+    duration = time.perf_counter() - start - ticks * 0.05
+    kept = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    print(
+        f"{planes} planes, {ticks} ticks, {updates} updates: {duration / updates * 1_000_000:.1f} us per update "
+        f"(traced), transient peak per tick {max(peaks) / 1024:.0f} KiB ({max(peaks) / planes:.0f} B per plane), "
+        f"kept {kept / 1024:.0f} KiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Lookups made on every join and websocket handshake per number of players in a game:
+the player registry indexes vs the scans of all the players they replaced.
+
+    python -m benchmarks.registry
+"""
+import random
+
+from app.game.config import GameConfig
+from app.game.consts import COLORS
+from benchmarks.common import BenchmarkGameSession, measure
+
+
+SIZES = [10, 100, 1000, 10000]
+
+
+def scan_by_token(game_session: BenchmarkGameSession, token: str):
+    for player in game_session._players.values():
+        if player.token == token:
+            return player
+    return None
+
+
+def scan_color(game_session: BenchmarkGameSession) -> str:
+    available_colors = list(set(COLORS) - set([p.color for p in game_session._players.values()]))
+    return random.choice(available_colors or COLORS)
+
+
+def main():
+    print(f"{'players':>8} {'token scan':>12} {'token index':>12} {'color scan':>12} {'color index':>12} {'join':>8}")
+    for players in SIZES:
+        game_session = BenchmarkGameSession(storage=None, config=GameConfig(MAX_PLAYERS=players + 1000))
+        tokens = [f"token{index}" for index in range(players)]
+        for token in tokens:
+            game_session.add_player(nickname=token, token=token)
+        token = tokens[-1]
+
+        joined = iter(range(1000))
+        results = [
+            measure(lambda: scan_by_token(game_session, token), repeat=200),
+            measure(lambda: game_session.get_player_by_token(token), repeat=200),
+            measure(lambda: scan_color(game_session), repeat=200),
+            measure(lambda: game_session._generate_player_color(), repeat=200),
+            measure(lambda: game_session.add_player(nickname="new", token=f"new{next(joined)}"), repeat=1000),
+        ]
+        print(f"{players:>8} " + " ".join(f"{result:>9.2f} us" for result in results))
+
+
+if __name__ == "__main__":
+    main()
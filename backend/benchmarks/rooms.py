@@ -0,0 +1,54 @@
+"""
+Thousands of connected players placed in rooms by the room manager, all the rooms run by one game loop:
+join time, rooms created, tick timing and the threads of the process.
+
+    python -m benchmarks.rooms [players] [seconds]
+"""
+import sys
+import threading
+import time
+
+from app.game.rooms import RoomManager
+from benchmarks.common import FakeWebSocketSession
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    duration = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    rooms = RoomManager(storage=None)
+    ws_sessions = []
+    start = time.perf_counter()
+    for index in range(players):
+        ws_session = FakeWebSocketSession()
+        room_id, player = rooms.add_player(nickname=f"player{index}", token=ws_session.token)
+        ws_session.player_id = player.id
+        rooms.get_room_by_token(ws_session.token).add_session(player=player, ws_session=ws_session)
+        ws_sessions.append(ws_session)
+    join_duration = (time.perf_counter() - start) * 1000
+
+    ticks = rooms.loop.ticks
+    time.sleep(duration)
+    threads = threading.active_count()
+    rooms.loop.stop()
+
+    stats = rooms.loop.stats
+    ticks = stats["ticks"] - ticks
+    rooms_stats = rooms.stats["rooms"]
+    print(f"{players} players joined in {join_duration:.0f} ms ({join_duration / players * 1000:.0f} us per join)")
+    print(
+        f"rooms: {len(rooms_stats)}, players per room: {min(room['players'] for room in rooms_stats)}"
+        f"-{max(room['players'] for room in rooms_stats)}, bots: {sum(room['bots'] for room in rooms_stats)}, "
+        f"threads: {threads}"
+    )
+    print(
+        f"{duration}s, ticks: {ticks} ({ticks / duration:.1f}/s), overruns: {stats['overruns']}, "
+        f"tick avg {stats['avg_tick_duration']:.2f} ms, max {stats['max_tick_duration']:.2f} ms"
+    )
+    for system in stats["systems"]:
+        print(f"  {system['name']}: avg {system['avg_duration']:.2f} ms, max {system['max_duration']:.2f} ms")
+    print(f"frames per session: {sum(ws.frames for ws in ws_sessions) / players:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+The airport route table against computing the haversine distance and the bearing on every call:
+shipment awards, bot departures (destination and initial bearing) and the table build time.
+
+    python -m benchmarks.routes [calls]
+"""
+import itertools
+import random
+import sys
+import time
+
+from app.game.core.coordinates import Coordinates
+from app.game.core.shipment import Shipment
+from app.game.routes import RouteTable
+from benchmarks.common import BenchmarkGameSession
+
+
+def measure(call, calls: int) -> float:
+    """
+    microseconds per call
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        call()
+    return (time.perf_counter() - start) / calls * 1_000_000
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    game_session = BenchmarkGameSession(storage=None)
+    game_session.loop.stop()
+    airports = list(game_session._airports.values())
+    ids = [airport.id for airport in airports]
+
+    start = time.perf_counter()
+    routes = RouteTable(airports)
+    print(f"{len(routes)} airports, table built in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    pairs = [random.sample(airports, 2) for _ in range(1000)]
+    pair = itertools.cycle(pairs)
+
+    def distance_haversine():
+        origin, destination = next(pair)
+        return Coordinates.distance_between(origin.coordinates, destination.coordinates)
+
+    def distance_table():
+        origin, destination = next(pair)
+        return routes.distance(origin.id, destination.id)
+
+    def departure_haversine():
+        origin, destination = next(pair)
+        return destination, Coordinates.bearing_between(origin.coordinates, destination.coordinates)
+
+    def departure_table():
+        origin, destination = next(pair)
+        return destination, routes.bearing(origin.id, destination.id)
+
+    def award_haversine():
+        origin, destination = next(pair)
+        return Shipment(origin=origin, destination=destination).award
+
+    def award_table():
+        origin, destination = next(pair)
+        return Shipment(origin=origin, destination=destination, distance=routes.distance(origin.id, destination.id))
+
+    for name, scalar, table in (
+        ("distance", distance_haversine, distance_table),
+        ("departure bearing", departure_haversine, departure_table),
+        ("shipment", award_haversine, award_table),
+    ):
+        scalar_us, table_us = measure(scalar, calls), measure(table, calls)
+        print(f"{name}: {scalar_us:.2f} us -> {table_us:.2f} us per call ({scalar_us / table_us:.1f}x)")
+
+    origin = random.choice(ids)
+    print(f"airports within 2000 km: {measure(lambda: routes.within(origin, 2000), calls):.2f} us per call")
+    coordinates = Coordinates(latitude=random.uniform(-90, 90), longitude=random.uniform(-180, 180))
+    print(f"nearest airport to a point: {measure(lambda: routes.nearest(coordinates), calls // 10):.2f} us per call")
+
+
+if __name__ == "__main__":
+    main()
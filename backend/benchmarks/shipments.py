@@ -0,0 +1,67 @@
+"""
+Expiry of thousands of shipments: scanning all the shipments every 200 ms (as remove_expired_shipments used to)
+vs a timer of the game loop per shipment. Prints the cost of a check when nothing expires,
+and the cost of expiring them all.
+
+    python -m benchmarks.shipments [shipments]
+"""
+import sys
+import time
+
+from app.game.config import GameConfig
+from app.tools.timestamp import timestamp_now
+from benchmarks.common import BenchmarkGameSession, measure
+
+
+def scan(game_session: BenchmarkGameSession):
+    """
+    the full scan replaced by the expiry timers
+    """
+    expired = [
+        shipment
+        for shipment in game_session._shipments.values()
+        if shipment.valid_till + game_session.SHIPMENT_EXPIRY_GRACE < timestamp_now()
+    ]
+    for shipment in expired:
+        game_session.remove_expired_shipment(shipment)
+
+
+def create_game(shipments: int) -> BenchmarkGameSession:
+    game_session = BenchmarkGameSession(storage=None, config=GameConfig(MAX_SHIPMENTS_IN_GAME=shipments))
+    for _ in range(shipments):
+        game_session.add_random_airport_shipment()
+    return game_session
+
+
+def main():
+    shipments = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    game_session = create_game(shipments)
+    now = timestamp_now()
+    scan_us = measure(lambda: scan(game_session), repeat=100)
+    timers_us = measure(lambda: game_session.loop._run_timers(now), repeat=100)
+    print(f"{shipments} shipments, nothing expired: scan {scan_us:.1f} us, timers {timers_us:.1f} us per check")
+
+    for name, expire in (
+        ("scan", lambda game_session, now: scan(game_session)),
+        ("timers", lambda game_session, now: game_session.loop._run_timers(now)),
+    ):
+        game_session = create_game(shipments)
+        later = max(shipment.valid_till for shipment in game_session._shipments.values())
+        later += game_session.SHIPMENT_EXPIRY_GRACE + 1
+        # shift the clock of the scan by moving the shipments back instead
+        if name == "scan":
+            for shipment in game_session._shipments.values():
+                shipment.valid_till -= later - timestamp_now()
+        start = time.perf_counter()
+        expire(game_session, later)
+        duration = (time.perf_counter() - start) * 1000
+        airport_shipments = sum(len(airport.shipments) for airport in game_session._airports.values())
+        print(
+            f"{name}: all expired in {duration:.1f} ms, left in the game {len(game_session._shipments)}, "
+            f"on the airports {airport_shipments}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Cost of the player_list and airport_list snapshots sent to every connecting client,
+first one after a change (cold) and the repeated ones (cached).
+
+    python -m benchmarks.snapshot
+"""
+from app.game.core.cache import SerializationCache
+from app.game.event_factory import EventFactory
+from benchmarks.common import game_session_with_players, measure
+
+
+PLAYERS_COUNT = 16
+REPEAT = 1000
+
+
+def snapshot(game_session):
+    EventFactory.player_list_event(player_list=list(game_session._players.values()))
+    EventFactory.airport_list_event(airport_list=list(game_session._airports.values()))
+
+
+def invalidate_all(game_session):
+    for player in game_session._players.values():
+        player.invalidate_serialized()
+        player.position.invalidate_serialized()
+        player.position.coordinates.invalidate_serialized()
+    for airport in game_session._airports.values():
+        airport.invalidate_serialized()
+        for shipment in airport.shipments.values():
+            shipment.invalidate_serialized()
+
+
+def main():
+    game_session, _ = game_session_with_players(PLAYERS_COUNT)
+    for _ in range(game_session.config.MAX_SHIPMENTS_IN_GAME):
+        game_session.add_random_airport_shipment()
+
+    invalidation = measure(lambda: invalidate_all(game_session), repeat=REPEAT)
+    cold = measure(lambda: (invalidate_all(game_session), snapshot(game_session)), repeat=REPEAT) - invalidation
+    cached = measure(lambda: snapshot(game_session), repeat=REPEAT)
+    print(f"snapshot of {PLAYERS_COUNT} players and {len(game_session._airports)} airports")
+    print(f"cold: {cold:.1f} us, cached: {cached:.1f} us")
+
+    # the counters of one cold and one cached snapshot, not counted while timing (like in production)
+    SerializationCache.count_stats = True
+    invalidate_all(game_session)
+    snapshot(game_session)
+    snapshot(game_session)
+    print(SerializationCache.stats_serialized())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Startup and shutdown of the server app: importing it, creating it, the startup hook and the shutdown
+with players in the game, whose games are recorded before the process exits.
+Needs redis, like the server.
+
+    GAME_REDIS_HOST=localhost python -m benchmarks.startup [players]
+"""
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    start = time.perf_counter()
+    from app.api.server import create_app
+    imported = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    app = create_app()
+    created = (time.perf_counter() - start) * 1000
+
+    client = TestClient(app)
+    start = time.perf_counter()
+    client.__enter__()
+    started = (time.perf_counter() - start) * 1000
+
+    storage = app.state.storage
+    nicknames = []
+    for i in range(players):
+        registered = client.post("/api/game/players/", json={"nickname": f"startup{i}"}).json()
+        if client.post("/api/game/join/", headers={"token": registered["token"]}).status_code == 200:
+            nicknames.append(registered["nickname"])
+
+    start = time.perf_counter()
+    client.__exit__(None, None, None)
+    stopped = (time.perf_counter() - start) * 1000
+
+    recorded = sum(1 for nickname in nicknames if storage.get_players_last_games(full_nickname=nickname, amount=1))
+    print(f"import {imported:.1f} ms, create_app {created:.1f} ms, startup hook {started:.1f} ms "
+          f"(reported {app.state.startup_duration:.1f} ms)")
+    print(f"shutdown with {len(nicknames)} players {stopped:.1f} ms, games recorded: {recorded}/{len(nicknames)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,27 @@
 import uvicorn
 
+from app.api.server import close_websockets, create_app
+
 PORT = 9999
+WS_PING_INTERVAL = 10  # seconds, protocol level pings, next to the "ping" messages of the game heartbeat
+WS_PING_TIMEOUT = 10
+
+
+class GameServer(uvicorn.Server):
+    async def shutdown(self, sockets=None):
+        # the clients get a close frame before the connections are dropped, then the game is shut down
+        await close_websockets(self.config.app)
+        await super().shutdown(sockets=sockets)
+
 
 if __name__ == "__main__":
     print(f"SERVER STARTING ON PORT {PORT}...")
-    uvicorn.run("app.api.server:app", host="0.0.0.0", port=PORT, log_level="info", reload=True)
+    config = uvicorn.Config(
+        create_app(),
+        host="0.0.0.0",
+        port=PORT,
+        log_level="info",
+        ws_ping_interval=WS_PING_INTERVAL,
+        ws_ping_timeout=WS_PING_TIMEOUT,
+    )
+    GameServer(config).run()
@@ -0,0 +1,39 @@
+"""
+when the dead reckoning broadcasts a new position
+"""
+import uuid
+
+from app.game.config import GameConfig
+from app.game.core.coordinates import Coordinates
+from app.game.core.position import PlayerPosition
+from app.game.dead_reckoning import DeadReckoning
+
+PLAYER_ID = uuid.uuid4()
+
+
+def broadcast_position(dead_reckoning: DeadReckoning) -> PlayerPosition:
+    position = PlayerPosition(
+        coordinates=Coordinates(latitude=50.0, longitude=20.0),
+        bearing=45,
+        velocity=600_000,
+        timestamp=1_000_000,
+    )
+    assert dead_reckoning.update(PLAYER_ID, position)
+    dead_reckoning.broadcasted(PLAYER_ID, position)
+    return position
+
+
+def test_velocity_change_is_broadcast():
+    dead_reckoning = DeadReckoning(GameConfig())
+    last = broadcast_position(dead_reckoning)
+    # the smallest step of the clients, the positions are still within the distance error
+    position = last.future_position(timestamp=last.timestamp + 50).replace(velocity=last.velocity - 10_000)
+    assert dead_reckoning.update(PLAYER_ID, position)
+
+
+def test_unchanged_flight_is_not_broadcast():
+    dead_reckoning = DeadReckoning(GameConfig())
+    last = broadcast_position(dead_reckoning)
+    position = last.future_position(timestamp=last.timestamp + 50, calculate_bearing=True)
+    assert not dead_reckoning.update(PLAYER_ID, position)
+    assert dead_reckoning.waiting() == [PLAYER_ID]
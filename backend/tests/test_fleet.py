@@ -0,0 +1,102 @@
+"""
+the planes propagated by the numpy arrays (FleetState) against a PlayerPosition at a time (ScalarFleet)
+"""
+import random
+
+import pytest
+
+from app.game.config import GameConfig
+from app.game.core.coordinates import Coordinates
+from app.game.core.player import Player
+from app.game.core.position import PlayerPosition
+from app.game.fleet import FleetState, ScalarFleet, numpy
+
+pytestmark = pytest.mark.skipif(numpy is None, reason="FleetState needs numpy")
+
+PLANES = 500
+NOW = 1_000_000_000
+
+DEGREES_TOLERANCE = 1e-9
+TANK_LEVEL_TOLERANCE = 1e-6  # liters
+
+
+def angle_difference(angle1: float, angle2: float) -> float:
+    difference = abs(angle1 - angle2) % 360
+    return min(difference, 360 - difference)
+
+
+def random_position(rng: random.Random) -> PlayerPosition:
+    return PlayerPosition(
+        coordinates=Coordinates(latitude=rng.uniform(-89.9, 89.9), longitude=rng.uniform(-180, 180)),
+        bearing=rng.uniform(0, 360),
+        velocity=rng.randint(GameConfig.MIN_VELOCITY, GameConfig.MAX_VELOCITY),
+        timestamp=NOW - rng.randint(0, 3000),
+        tank_level=rng.uniform(0, GameConfig.FUEL_TANK_SIZE),
+    )
+
+
+def create_players(rng: random.Random) -> list:
+    players = []
+    for index in range(PLANES):
+        player = Player(nickname=f"player{index}", token=str(index), color="#ffffff")
+        player.position = random_position(rng)
+        players.append(player)
+    return players
+
+
+def assert_same_positions(expected: dict, actual: dict):
+    assert expected.keys() == actual.keys()
+    for player_id, position in expected.items():
+        other = actual[player_id]
+        assert abs(position.coordinates.latitude - other.coordinates.latitude) < DEGREES_TOLERANCE
+        assert angle_difference(position.coordinates.longitude, other.coordinates.longitude) < DEGREES_TOLERANCE
+        assert angle_difference(position.bearing, other.bearing) < DEGREES_TOLERANCE
+        assert abs(position.tank_level - other.tank_level) < TANK_LEVEL_TOLERANCE
+        assert position.velocity == other.velocity
+        assert position.timestamp == other.timestamp
+
+
+@pytest.mark.parametrize("calculate_bearing", [False, True])
+def test_propagation(calculate_bearing):
+    players = create_players(random.Random(1))
+    scalar, batched = ScalarFleet(), FleetState(capacity=8)  # grown on the way
+    for player in players:
+        scalar.add(player)
+    for player in players:
+        batched.add(player)  # the fleet of the player is the last one, both see the same positions
+    player_ids = [player.id for player in players]
+
+    for timestamp in (NOW - 3000, NOW, NOW + 5000):  # the positions newer than timestamp are kept
+        assert_same_positions(
+            scalar.positions_at(player_ids, timestamp=timestamp, calculate_bearing=calculate_bearing),
+            batched.positions_at(player_ids, timestamp=timestamp, calculate_bearing=calculate_bearing),
+        )
+
+
+def test_assigned_positions_are_propagated():
+    rng = random.Random(2)
+    players = create_players(rng)
+    scalar, batched = ScalarFleet(), FleetState()
+    for player in players:
+        scalar.add(player)
+    for player in players:
+        batched.add(player)
+    player_ids = [player.id for player in players]
+    batched.positions_at(player_ids, timestamp=NOW)
+
+    # new positions, removed planes and their rows reused by new ones
+    for player in rng.sample(players, 100):
+        player.position = random_position(rng)
+    for player in players[:50]:
+        batched.remove(player)
+    newcomers = create_players(rng)[:50]
+    for player in newcomers:
+        scalar.add(player)
+    for player in newcomers:
+        batched.add(player)
+    player_ids = [player.id for player in players[50:] + newcomers]
+
+    assert_same_positions(
+        scalar.positions_at(player_ids, timestamp=NOW + 1000, calculate_bearing=True),
+        batched.positions_at(player_ids, timestamp=NOW + 1000, calculate_bearing=True),
+    )
@@ -0,0 +1,113 @@
+"""
+the n-vector geodesy behind Coordinates against the haversine formulas it replaced, on fixed-seed cases
+"""
+import random
+
+import pytest
+
+from app.game.core.coordinates import Coordinates
+from app.game.core.geodesy import Haversine, NVector
+
+RADIUS = Coordinates._earth_radius()
+SAMPLES = 2000
+
+DISTANCE_TOLERANCE = 1e-6  # km
+ANGLE_TOLERANCE = 1e-6  # degrees
+
+
+def angle_difference(angle1: float, angle2: float) -> float:
+    difference = abs(angle1 - angle2) % 360
+    return min(difference, 360 - difference)
+
+
+def short_hop(rng: random.Random) -> (Coordinates, Coordinates):
+    # a landing or a plane close to its destination, 100 m to 1 km
+    origin = Coordinates(latitude=rng.uniform(-80, 80), longitude=rng.uniform(-180, 180))
+    other = Coordinates(
+        latitude=origin.latitude + rng.choice((-1, 1)) * rng.uniform(0.001, 0.01),
+        longitude=origin.longitude + rng.choice((-1, 1)) * rng.uniform(0.001, 0.01),
+    )
+    return origin, other
+
+
+def near_pole(rng: random.Random) -> (Coordinates, Coordinates):
+    origin = Coordinates(latitude=rng.choice((-1, 1)) * rng.uniform(89, 89.99), longitude=rng.uniform(-180, 180))
+    other = Coordinates(latitude=rng.uniform(-90, 90), longitude=rng.uniform(-180, 180))
+    return origin, other
+
+
+def past_antimeridian(rng: random.Random) -> (Coordinates, Coordinates):
+    # longitudes keep growing past ±180 when flying east or west
+    origin = Coordinates(
+        latitude=rng.uniform(-80, 80),
+        longitude=rng.uniform(-180, 180) + rng.choice((-1, 1)) * rng.randrange(1, 4) * 360,
+    )
+    other = Coordinates(latitude=rng.uniform(-80, 80), longitude=rng.uniform(-540, 540))
+    return origin, other
+
+
+def anywhere(rng: random.Random) -> (Coordinates, Coordinates):
+    origin = Coordinates(latitude=rng.uniform(-90, 90), longitude=rng.uniform(-180, 180))
+    other = Coordinates(latitude=rng.uniform(-90, 90), longitude=rng.uniform(-180, 180))
+    return origin, other
+
+
+CASES = [short_hop, near_pole, past_antimeridian, anywhere]
+
+
+def pairs(case):
+    rng = random.Random(case.__name__)
+    return [case(rng) for _ in range(SAMPLES)]
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_distance(case):
+    for origin, other in pairs(case):
+        expected = Haversine.distance(origin, other, RADIUS)
+        assert NVector.distance(origin, other, RADIUS) == pytest.approx(expected, abs=DISTANCE_TOLERANCE)
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_bearing(case):
+    for origin, other in pairs(case):
+        expected = Haversine.bearing(origin, other)
+        assert angle_difference(NVector.bearing(origin, other), expected) < ANGLE_TOLERANCE
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_destination(case):
+    rng = random.Random(f"{case.__name__} destination")
+    for origin, _ in pairs(case):
+        distance, bearing = rng.uniform(0, 20_000), rng.uniform(0, 360)
+        expected = Coordinates(latitude=0, longitude=0)
+        actual = Coordinates(latitude=0, longitude=0)
+        expected_turn = Haversine.destination(origin, distance, bearing, RADIUS, expected, turn=True)
+        actual_turn = NVector.destination(origin, distance, bearing, RADIUS, actual, turn=True)
+
+        assert actual.latitude == pytest.approx(expected.latitude, abs=ANGLE_TOLERANCE)
+        if abs(expected.latitude) < 89.9:  # any longitude and bearing is the pole
+            # both keep moving the longitude from the start, it isn't wrapped to ±180
+            assert actual.longitude == pytest.approx(expected.longitude, abs=ANGLE_TOLERANCE)
+            assert angle_difference(actual_turn, expected_turn) < ANGLE_TOLERANCE
+            assert -180 <= actual_turn <= 180
+
+
+def test_destination_keeps_the_vector():
+    origin = Coordinates(latitude=50.1, longitude=19.9)
+    destination = Coordinates(latitude=0, longitude=0)
+    NVector.destination(origin, 1234, 77, RADIUS, destination)
+    computed = Coordinates(latitude=destination.latitude, longitude=destination.longitude).nvector()
+    assert destination._nvector == pytest.approx(computed, abs=1e-12)
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_zero_distance(case):
+    for origin, _ in pairs(case)[:100]:
+        assert NVector.distance(origin, origin, RADIUS) == pytest.approx(0, abs=DISTANCE_TOLERANCE)
+
+        destination = Coordinates(latitude=0, longitude=0)
+        turn = NVector.destination(origin, 0, 123, RADIUS, destination, turn=True)
+        assert destination.latitude == pytest.approx(origin.latitude, abs=ANGLE_TOLERANCE)
+        if abs(origin.latitude) < 89.9:
+            assert destination.longitude == pytest.approx(origin.longitude, abs=ANGLE_TOLERANCE)
+            assert turn == pytest.approx(0, abs=ANGLE_TOLERANCE)